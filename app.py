@@ -1,11 +1,8 @@
+import shutil
+import tempfile
 import streamlit as st
 import pandas as pd
-from backend.ingestion import DataPreprocessingAgent
-from backend.agents import (
-    RAGRetrievalAgent, BaseDeepAgent, SpendAnalysisAgent, RiskMonitoringAgent,
-    SupplierIntelligenceAgent, ContractIntelligenceAgent, POAutomationAgent,
-    CompliancePolicyAgent
-)
+from backend.agents import RAGRetrievalAgent, BaseDeepAgent, ANALYSIS_TASKS, run_complete_analysis
 from ui.tabs import (
     render_executive_summary, render_dashboard, render_supplier_intelligence,
     render_spend_analysis, render_risk_monitoring, render_contract_intelligence,
@@ -182,13 +179,46 @@ st.markdown("""
 # Initialize Session State
 if "messages" not in st.session_state:
     st.session_state.messages = []
-if "df" not in st.session_state:
-    st.session_state.df = None
+# Name of the loaded file; its frame is read through the shared frame cache on each run
+if "data_file" not in st.session_state:
+    st.session_state.data_file = None
 if "analysis_running" not in st.session_state:
     st.session_state.analysis_running = False
+if "ingest_job_id" not in st.session_state:
+    st.session_state.ingest_job_id = None
+
+from backend.database import get_minio_client
+from backend.jobs import get_job_queue, ACTIVE_STATUSES
+from backend.semantic_cache import cached_answer_stream, get_semantic_cache
+from backend.llm import llm_priority
+from backend.key_index import mentioned_keys
+from backend.frame_cache import read_cached_dataframe
+
+@st.fragment(run_every=1)
+def render_ingestion_progress():
+    """Polls the submitted ingestion job; only rendered while one is active."""
+    job = get_job_queue().get(st.session_state.ingest_job_id)
+    if job is None:
+        st.session_state.ingest_job_id = None
+        return
+
+    if job["status"] in ACTIVE_STATUSES:
+        st.progress(job["progress"], text=f"🔄 {job['file_name']}: {job['message']}")
+        return
+
+    st.session_state.ingest_job_id = None
+    if job["status"] == "succeeded":
+        st.session_state.ingest_result = ("success", job["message"])
+        st.session_state.data_file = job["file_name"]
+    else:
+        st.session_state.ingest_result = ("error", job["message"])
+    st.rerun()
 
-from backend.database import MinioClient
-import io
+loaded_df = read_cached_dataframe(st.session_state.data_file) if st.session_state.data_file else None
+if loaded_df is None:
+    st.session_state.data_file = None
+# Agents only retrieve from (and compute figures over) the loaded file
+data_scope = {"source": st.session_state.data_file} if st.session_state.data_file else None
 
 # ============================================
 # PROFESSIONAL SIDEBAR
@@ -203,12 +233,12 @@ with st.sidebar:
     st.markdown("### 📊 System Status")
     col1, col2 = st.columns(2)
     with col1:
-        if st.session_state.df is not None:
+        if loaded_df is not None:
             st.markdown('<span class="status-badge status-active">● Active</span>', unsafe_allow_html=True)
         else:
             st.markdown('<span class="status-badge status-pending">○ Idle</span>', unsafe_allow_html=True)
     with col2:
-        data_rows = len(st.session_state.df) if st.session_state.df is not None else 0
+        data_rows = len(loaded_df) if loaded_df is not None else 0
         st.metric("Records", f"{data_rows:,}", label_visibility="collapsed")
     
     st.divider()
@@ -226,7 +256,6 @@ with st.sidebar:
     
     st.markdown("")  # Spacer
     
-    selected_file_content = None
     selected_file_name = None
     
     if mode == "📤 Upload New":
@@ -241,38 +270,39 @@ with st.sidebar:
         
         if uploaded_file:
             selected_file_name = uploaded_file.name
-            selected_file_content = uploaded_file.getvalue()
             
             # File Info
-            file_size = len(selected_file_content) / 1024  # KB
+            file_size = uploaded_file.size / 1024  # KB
             st.success(f"✓ **{selected_file_name}**  \n📦 {file_size:.1f} KB")
             
             st.markdown("")
-            if st.button("🚀 Process & Analyze", type="primary", width="stretch"):
-                progress_bar = st.progress(0, text="🔄 Initializing...")
-                def update_progress(p, text):
-                    progress_bar.progress(p, text=f"🔄 {text}")
-
-                with st.spinner("Processing your data..."):
-                    agent = DataPreprocessingAgent()
-                    success, message = agent.process_csv(selected_file_content, selected_file_name, progress_callback=update_progress)
-                    
-                    if success:
-                        st.success(f"✅ {message}")
-                        st.session_state.df = pd.read_csv(io.BytesIO(selected_file_content))
-                        st.balloons()
-                    else:
-                        st.error(f"❌ {message}")
+            if st.button(
+                "🚀 Process & Analyze", type="primary", width="stretch",
+                disabled=st.session_state.ingest_job_id is not None
+            ):
+                # Ingest in the background; render_ingestion_progress polls the job.
+                # The upload is spooled to disk so a queued job holds no copy of it in memory.
+                spool = tempfile.TemporaryFile()
+                uploaded_file.seek(0)
+                shutil.copyfileobj(uploaded_file, spool)
+                spool.seek(0)
+                st.session_state.ingest_job_id = get_job_queue().submit(selected_file_name, content=spool)
 
     else:  # Load Existing
         st.markdown("##### Available Files")
-        minio_client = MinioClient()
-        files = minio_client.list_files()
+        minio_client = get_minio_client()
+        files = {info["name"]: info for info in minio_client.list_files_info()}
         
+        def describe_file(name):
+            info = files[name]
+            rows = f" • {info['row_count']:,} rows" if info["row_count"] is not None else ""
+            return f"{name} ({info['size'] / 1024:.1f} KB{rows})"
+
         if files:
             selected_file_name = st.selectbox(
                 "Choose a file",
-                files,
+                list(files),
+                format_func=describe_file,
                 label_visibility="collapsed",
                 help="Select from previously uploaded files"
             )
@@ -282,9 +312,8 @@ with st.sidebar:
             with col1:
                 if st.button("📥 Load Data", width="stretch", type="primary"):
                     with st.spinner("📂 Loading..."):
-                        content = minio_client.get_file_content(selected_file_name)
-                        if content:
-                            st.session_state.df = pd.read_csv(io.BytesIO(content))
+                        if read_cached_dataframe(selected_file_name) is not None:
+                            st.session_state.data_file = selected_file_name
                             st.success(f"✅ Loaded successfully!")
                             st.rerun()
                         else:
@@ -300,11 +329,18 @@ with st.sidebar:
                             
                             # Delete from ChromaDB
                             try:
-                                import chromadb
-                                from backend.config import Config
-                                client = chromadb.HttpClient(host=Config.CHROMA_HOST, port=Config.CHROMA_PORT)
-                                collection = client.get_collection("procurement_data")
-                                collection.delete(where={"source": selected_file_name})
+                                from backend.database import get_chroma_collection
+                                get_chroma_collection().delete(where={"source": selected_file_name})
+                                from backend.keyword_index import get_keyword_index
+                                keyword_index = get_keyword_index()
+                                if keyword_index is not None:
+                                    keyword_index.delete_source(selected_file_name)
+                                from backend.key_index import get_key_index
+                                key_index = get_key_index()
+                                if key_index is not None:
+                                    key_index.delete_source(selected_file_name)
+                                from backend.checkpoints import get_checkpoint_store
+                                get_checkpoint_store().forget(selected_file_name)
                                 chroma_success = True
                             except Exception as e:
                                 st.error(f"ChromaDB: {e}")
@@ -317,11 +353,40 @@ with st.sidebar:
                                 st.error("❌ Delete failed")
         else:
             st.info("📭 No files available  \nUpload your first file to get started!")
-    
+
+    # Background ingestion status
+    if st.session_state.ingest_job_id:
+        render_ingestion_progress()
+    if "ingest_result" in st.session_state:
+        status, message = st.session_state.pop("ingest_result")
+        if status == "success":
+            st.success(f"✅ {message}")
+            st.balloons()
+        else:
+            st.error(f"❌ {message}")
+
+    # Incomplete ingestion jobs can be resumed from their last checkpoint
+    from backend.checkpoints import get_checkpoint_store
+    active_files = {job["file_name"] for job in get_job_queue().list_jobs() if job["status"] in ACTIVE_STATUSES}
+    incomplete_jobs = [job for job in get_checkpoint_store().incomplete_jobs() if job["source"] not in active_files]
+    if incomplete_jobs:
+        with st.expander(f"⏸️ Incomplete Ingestion ({len(incomplete_jobs)})"):
+            for job in incomplete_jobs:
+                st.caption(
+                    f"**{job['source']}** • {job['committed_rows']:,} rows committed"
+                    + (f"  \n{job['error']}" if job['error'] else "")
+                )
+                if st.button(
+                    "▶️ Resume", key=f"resume_{job['source']}", width="stretch",
+                    disabled=st.session_state.ingest_job_id is not None
+                ):
+                    st.session_state.ingest_job_id = get_job_queue().submit(job['source'], resume=True)
+                    st.rerun()
+
     st.divider()
     
     # Analysis Control Section
-    if st.session_state.df is not None:
+    if loaded_df is not None:
         st.markdown("### 🎯 Analysis Control")
         
         # Big Analysis Button
@@ -331,56 +396,26 @@ with st.sidebar:
             width="stretch",
             help="Execute all 6 AI agents in parallel"
         ):
-            import concurrent.futures
             import time
             
             st.session_state.analysis_running = True
             start_time = time.time()
             
             with st.spinner("🤖 AI Agents Working..."):
-                # Initialize Agents
-                agents = {
-                    "spend": SpendAnalysisAgent(),
-                    "risk": RiskMonitoringAgent(),
-                    "supplier": SupplierIntelligenceAgent(),
-                    "contract": ContractIntelligenceAgent(),
-                    "po": POAutomationAgent(),
-                    "compliance": CompliancePolicyAgent()
-                }
-                
-                # Define tasks
-                tasks = {
-                    "spend": ("Analyze spend patterns, identifying anomalies and opportunities.", agents["spend"]),
-                    "risk": ("Identify high-risk suppliers and potential supply chain disruptions.", agents["risk"]),
-                    "supplier": ("Provide a detailed analysis of top suppliers and their performance.", agents["supplier"]),
-                    "contract": ("Review contracts for expiry and compliance risks.", agents["contract"]),
-                    "po": ("Analyze Purchase Orders for delays and price discrepancies.", agents["po"]),
-                    "compliance": ("Check for policy violations and budget adherence.", agents["compliance"])
-                }
-                
                 results = {}
                 status_text = st.empty()
                 progress_bar = st.progress(0)
                 completed_count = 0
-                total_tasks = len(tasks)
+                total_tasks = len(ANALYSIS_TASKS)
 
-                def run_agent_task(key, query, agent):
-                    return key, agent.run(query)
-
-                # Execute in parallel
-                with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-                    future_to_task = {
-                        executor.submit(run_agent_task, key, query, agent): key 
-                        for key, (query, agent) in tasks.items()
-                    }
-                    
-                    for future in concurrent.futures.as_completed(future_to_task):
-                        key, result = future.result()
-                        results[key] = result
-                        completed_count += 1
-                        progress = completed_count / total_tasks
-                        progress_bar.progress(progress)
-                        status_text.text(f"✓ {completed_count}/{total_tasks} • {key.title()} Complete")
+                # Context is retrieved once for all agents, then they synthesize in parallel
+                # as the shared LLM scheduler allows
+                for key, result in run_complete_analysis(filters=data_scope):
+                    results[key] = result
+                    completed_count += 1
+                    progress = completed_count / total_tasks
+                    progress_bar.progress(progress)
+                    status_text.text(f"✓ {completed_count}/{total_tasks} • {key.title()} Complete")
 
                 # Store results
                 st.session_state.spend_report = results["spend"]
@@ -413,7 +448,7 @@ with st.sidebar:
             st.rerun()
         
         if st.button("🗑️ Clear All", width="stretch", type="secondary"):
-            st.session_state.df = None
+            st.session_state.data_file = None
             st.session_state.messages = []
             keys_to_clear = [
                 "spend_report", "risk_report", "supplier_report", 
@@ -446,7 +481,7 @@ st.markdown("# 🚀 Procurement Assistant AI")
 st.markdown("**Enterprise Analytics Platform** • Real-time Insights • AI-Powered Decision Making")
 st.divider()
 
-if st.session_state.df is not None:
+if loaded_df is not None:
     # Enhanced Tab Interface
     tabs = st.tabs([
         "📊 Executive Summary",
@@ -460,21 +495,21 @@ if st.session_state.df is not None:
     ])
     
     with tabs[0]:
-        render_executive_summary(st.session_state.df)
+        render_executive_summary(loaded_df)
     with tabs[1]:
-        render_dashboard(st.session_state.df)
+        render_dashboard(loaded_df)
     with tabs[2]:
-        render_supplier_intelligence(st.session_state.df)
+        render_supplier_intelligence(loaded_df)
     with tabs[3]:
-        render_spend_analysis(st.session_state.df)
+        render_spend_analysis(loaded_df)
     with tabs[4]:
-        render_risk_monitoring(st.session_state.df)
+        render_risk_monitoring(loaded_df)
     with tabs[5]:
-        render_po_automation(st.session_state.df)
+        render_po_automation(loaded_df)
     with tabs[6]:
-        render_contract_intelligence(st.session_state.df)
+        render_contract_intelligence(loaded_df)
     with tabs[7]:
-        render_compliance_policy(st.session_state.df)
+        render_compliance_policy(loaded_df)
 
 else:
     # Welcome Screen with Better Design
@@ -510,6 +545,10 @@ def render_chat_interface():
     st.divider()
     st.markdown("### 💬 AI Assistant")
     st.caption("Ask questions about your procurement data")
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        stats = semantic_cache.stats()
+        st.caption(f"⚡ Answer cache: {stats['hits']} hits • {stats['misses']} misses • {stats['entries']} stored")
 
     # Chat History
     chat_container = st.container()
@@ -529,10 +568,12 @@ def render_chat_interface():
             with st.chat_message("assistant", avatar="🤖"):
                 with st.spinner("🤔 Analyzing..."):
                     class GeneralAssistant(BaseDeepAgent):
+                        exact_lookup = True
+
                         def __init__(self):
                             super().__init__("General Assistant", "Helpful assistant for procurement queries.")
                         
-                        def run(self, query: str) -> str:
+                        def run(self, query: str, streaming: bool = False) -> str:
                             project_context = "Procurement Assistant Application"
                             try:
                                 with open("README.md", "r", encoding="utf-8") as f:
@@ -551,11 +592,21 @@ def render_chat_interface():
                             
                             User Query: {{query}}
                             """
-                            return self._generate_insight(query, prompt)
+                            return self._generate_insight(query, prompt, streaming)
 
                     agent = GeneralAssistant()
-                    response = agent.run(prompt)
-                    st.write(response)
-                    st.session_state.messages.append({"role": "assistant", "content": response})
+                    # Read from session state: a fragment rerun does not rerun the script
+                    data_file = st.session_state.data_file
+                    agent.set_scope({"source": data_file} if data_file else None)
+
+                # Tokens are rendered as they arrive; near-duplicate questions about
+                # the same file on unchanged data reuse an earlier answer, unless they
+                # name a PO, supplier or contract ID (answered from its rows)
+                with llm_priority("interactive"):
+                    if mentioned_keys(prompt):
+                        response = st.write_stream(agent.stream(prompt))
+                    else:
+                        response = st.write_stream(cached_answer_stream(f"chat:{data_file or ''}", prompt, lambda: agent.stream(prompt)))
+                st.session_state.messages.append({"role": "assistant", "content": response})
 
 render_chat_interface()
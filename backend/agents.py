@@ -1,58 +1,22 @@
-from typing import List, Dict, Any
-from llama_index.core import VectorStoreIndex, PromptTemplate
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from llama_index.core import VectorStoreIndex, PromptTemplate, Settings
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.vector_stores import FilterOperator, MetadataFilter, MetadataFilters
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
 from loguru import logger
-from .database import get_vector_store
-from .llm import init_llm
-
-class Agent:
-    def __init__(self, name: str, role: str):
-        self.name = name
-        self.role = role
-        # Ensure LLM is initialized
-        init_llm()
-
-    def run(self, input_data: Any) -> str:
-        raise NotImplementedError("Agents must implement the run method")
-
-class RAGRetrievalAgent(Agent):
-    """
-    Wrapper for direct retrieval if needed (debugging/testing).
-    """
-    def __init__(self):
-        super().__init__("RAGRetrievalAgent", "Retrieves relevant information from the knowledge base.")
-        vector_store, _ = get_vector_store()
-        self.index = VectorStoreIndex.from_vector_store(vector_store=vector_store)
-
-    def run(self, query: str, n_results: int = 5) -> List[str]:
-        """
-        Retrieves top-k relevant document chunks for a given query.
-        """
-        retriever = self.index.as_retriever(similarity_top_k=n_results)
-        nodes = retriever.retrieve(query)
-        return [node.get_content() for node in nodes]
-
-class BaseDeepAgent(Agent):
-    def __init__(self, name: str, role: str):
-        super().__init__(name, role)
-        vector_store, _ = get_vector_store()
-        self.index = VectorStoreIndex.from_vector_store(vector_store=vector_store)
-
-    def _generate_insight(self, query: str, prompt_template_str: str) -> str:
-        """
-        Uses LlamaIndex Query Engine with a custom prompt to generate insights.
-        """
-        # Adapt prompt to LlamaIndex format (requires {context_str} and {query_str})
-        # We replace user's {context} with {context_str} and {query} with {query_str}
-        llama_prompt_str = prompt_template_str.replace("{context}", "{context_str}").replace("{query}", "{query_str}")
-        
-        # Add system role to the prompt
-        system_msg = f"You are the {self.name}. {self.role}\n"
-        full_prompt_str = system_msg + llama_prompt_str
-from typing import List, Dict, Any
-from llama_index.core import VectorStoreIndex, PromptTemplate
-from loguru import logger
-from .database import get_vector_store
-from .llm import init_llm
+from .database import get_vector_store, get_chroma_collection
+from .llm import init_llm, get_embed_model, llm_priority
+from .facts import get_fact_sheet
+from .keyword_index import get_keyword_index, reciprocal_rank_fusion
+from .key_index import find_rows, mentioned_keys, plain_frame
+from .config import Config
 
 class Agent:
     def __init__(self, name: str, role: str):
@@ -74,13 +38,19 @@ class RAGRetrievalAgent(Agent):
 
     def run(self, query: str, n_results: int = 5) -> List[str]:
         """
-        Retrieves top-k relevant document chunks for a given query.
+        Retrieves top-k relevant document chunks for a given query,
+        fusing vector and keyword matches when hybrid retrieval is enabled.
         """
-        retriever = self.index.as_retriever(similarity_top_k=n_results)
-        nodes = retriever.retrieve(query)
+        retriever = self.index.as_retriever(similarity_top_k=candidate_depth(n_results))
+        nodes = fuse_keyword_results(query, retriever.retrieve(query), n_results)
         return [node.get_content() for node in nodes]
 
 _index_cache = None
+_index_lock = threading.Lock()
+# Engines are keyed by filters too, so keep only the most recently used ones
+_MAX_CACHED_QUERY_ENGINES = 32
+_query_engine_cache = OrderedDict()
+_query_engine_lock = threading.Lock()
 
 def get_index():
     """
@@ -89,47 +59,378 @@ def get_index():
     global _index_cache
     if _index_cache:
         return _index_cache
-    
-    import time
-    start_time = time.time()
-    logger.info("Loading VectorStoreIndex...")
-    vector_store, _ = get_vector_store()
-    _index_cache = VectorStoreIndex.from_vector_store(vector_store=vector_store)
-    logger.info(f"VectorStoreIndex loaded in {time.time() - start_time:.2f}s")
+
+    with _index_lock:
+        if _index_cache is None:
+            start_time = time.time()
+            logger.info("Loading VectorStoreIndex...")
+            init_llm()
+            vector_store, _ = get_vector_store()
+            _index_cache = VectorStoreIndex.from_vector_store(vector_store=vector_store)
+            logger.info(f"VectorStoreIndex loaded in {time.time() - start_time:.2f}s")
     return _index_cache
 
+# Metadata fields retrieval can be filtered on (see ingestion.build_documents)
+FILTER_FIELDS = ("source", "supplier_id", "supplier_name", "item_category", "risk_level")
+
+def merge_filters(*filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Combines filter dicts of {field: value or list of values}; later ones
+    override earlier ones field by field. Unset (None) values are dropped.
+    """
+    merged = {}
+    for extra in filters:
+        for field, value in (extra or {}).items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Cannot filter on '{field}'. Available: {', '.join(FILTER_FIELDS)}")
+            if value is not None:
+                merged[field] = value
+    return merged or None
+
+def filters_key(filters: Optional[Dict[str, Any]]) -> Optional[tuple]:
+    """Hashable form of a filter dict, for cache keys."""
+    if not filters:
+        return None
+    return tuple(sorted((field, tuple(value) if isinstance(value, (list, tuple)) else value) for field, value in filters.items()))
+
+def describe_filters(filters: Optional[Dict[str, Any]]) -> str:
+    """Readable form of a filter dict, e.g. "risk_level in High, Medium; source = po.csv"."""
+    return "; ".join(
+        f"{field} in {', '.join(str(item) for item in value)}" if isinstance(value, (list, tuple)) else f"{field} = {value}"
+        for field, value in (filters or {}).items()
+    )
+
+def metadata_filters(filters: Optional[Dict[str, Any]] = None, doc_levels: Optional[tuple] = None) -> Optional[MetadataFilters]:
+    """LlamaIndex filters matching all of filters (a list matches any of its values) and doc_levels."""
+    clauses = [
+        MetadataFilter(key=field, value=list(value), operator=FilterOperator.IN) if isinstance(value, (list, tuple))
+        else MetadataFilter(key=field, value=value)
+        for field, value in (filters or {}).items()
+    ]
+    if doc_levels:
+        clauses.append(MetadataFilter(key="doc_level", value=list(doc_levels), operator=FilterOperator.IN))
+    return MetadataFilters(filters=clauses) if clauses else None
+
+def chroma_where(filters: Optional[Dict[str, Any]] = None, doc_levels: Optional[tuple] = None) -> Optional[Dict[str, Any]]:
+    """The Chroma where clause equivalent to metadata_filters(filters, doc_levels)."""
+    clauses = [
+        {field: {"$in": list(value)} if isinstance(value, (list, tuple)) else value}
+        for field, value in (filters or {}).items()
+    ]
+    if doc_levels:
+        clauses.append({"doc_level": {"$in": list(doc_levels)}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def matches_filters(metadata: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    for field, value in (filters or {}).items():
+        allowed = value if isinstance(value, (list, tuple)) else [value]
+        if metadata.get(field) not in allowed:
+            return False
+    return True
+
+def candidate_depth(similarity_top_k: int) -> int:
+    """Dense results to fetch for similarity_top_k final results: deeper when they are fused with keyword matches."""
+    if get_keyword_index() is None:
+        return similarity_top_k
+    return max(similarity_top_k, Config.HYBRID_CANDIDATES)
+
+def _nodes_by_id(node_ids: List[str], filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Nodes read back from Chroma, built the same way as the index retriever's; only those matching filters."""
+    if not node_ids:
+        return {}
+    where = chroma_where(filters)
+    where_kwargs = {"where": where} if where else {}
+    result = get_chroma_collection().get(ids=node_ids, include=["documents", "metadatas"], **where_kwargs)
+    return {
+        node_id: metadata_dict_to_node(metadata, text=text)
+        for node_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+    }
+
+def fuse_keyword_results(query: str, dense: List[NodeWithScore], similarity_top_k: int,
+                         doc_levels: Optional[tuple] = None,
+                         filters: Optional[Dict[str, Any]] = None) -> List[NodeWithScore]:
+    """
+    Fuses dense results with BM25 keyword matches for query (see keyword_index.py)
+    by reciprocal rank and returns the top similarity_top_k, scored by fused rank.
+    Keyword matches are read back and checked against filters before fusing, so
+    ones that do not match never take a slot from a dense result. Dense results
+    are returned unchanged when the keyword index is disabled, unavailable or
+    matches nothing.
+    """
+    keyword_index = get_keyword_index()
+    if keyword_index is None:
+        return dense[:similarity_top_k]
+    try:
+        keyword = keyword_index.search(query, Config.HYBRID_CANDIDATES, doc_levels, sources=(filters or {}).get("source"))
+    except Exception as e:
+        logger.warning(f"Keyword search failed, using vector results only: {e}")
+        return dense[:similarity_top_k]
+    if not keyword:
+        return dense[:similarity_top_k]
+
+    nodes = {result.node.node_id: result.node for result in dense}
+    dense_ids = list(nodes)
+    nodes.update(_nodes_by_id([node_id for node_id, _ in keyword if node_id not in nodes], filters))
+    # Keyword matches whose vectors are gone, or that do not match filters, are skipped
+    keyword_ids = [node_id for node_id, _ in keyword if node_id in nodes]
+    # Keyword ranking first: ties go to exact term matches
+    fused = reciprocal_rank_fusion([keyword_ids, dense_ids])[:similarity_top_k]
+    return [NodeWithScore(node=nodes[node_id], score=score) for node_id, score in fused]
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses a dense retriever's results with BM25 keyword matches, so exact IDs
+    such as PO or contract numbers are found even when embeddings miss them.
+    """
+    def __init__(self, dense_retriever: BaseRetriever, similarity_top_k: int, doc_levels: Optional[tuple] = None,
+                 filters: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self._dense = dense_retriever
+        self._similarity_top_k = similarity_top_k
+        self._doc_levels = doc_levels
+        self._filters = filters
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return fuse_keyword_results(
+            query_bundle.query_str, self._dense.retrieve(query_bundle), self._similarity_top_k,
+            self._doc_levels, self._filters
+        )
+
+def exact_nodes(query: str, limit: Optional[int] = None,
+                filters: Optional[Dict[str, Any]] = None) -> List[NodeWithScore]:
+    """
+    Rows of the PO, supplier and contract IDs mentioned in query, read through
+    the key index (see key_index.py) as row document nodes matching filters.
+    Returns [] when the query names no indexed ID or the lookup fails, so
+    callers retrieve as usual.
+    """
+    from .ingestion import build_documents
+    keys = mentioned_keys(query)
+    if not keys:
+        return []
+    limit = limit or Config.KEY_LOOKUP_MAX_ROWS
+    source = (filters or {}).get("source")
+    nodes = []
+    try:
+        for field, key in keys:
+            _, frames = find_rows(field, key, source=source if isinstance(source, str) else None, limit=limit - len(nodes))
+            for row_source, df in frames:
+                nodes.extend(
+                    NodeWithScore(node=doc, score=1.0) for doc in build_documents(plain_frame(df), row_source)
+                    if matches_filters(doc.metadata, filters)
+                )
+            if len(nodes) >= limit:
+                break
+    except Exception as e:
+        logger.warning(f"Exact lookup failed, retrieving instead: {e}")
+        return []
+    logger.info(f"Exact lookup of {keys} found {len(nodes)} rows")
+    return nodes
+
+class LevelPreferringRetriever(BaseRetriever):
+    """
+    Retrieves summary documents of the given levels (see rollups.py), falling
+    back to all documents when none are indexed, e.g. for data ingested before
+    summaries existed, or none match filters.
+    """
+    def __init__(self, index, similarity_top_k: int, doc_levels, filters: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self._preferred = index.as_retriever(
+            similarity_top_k=similarity_top_k, filters=metadata_filters(filters, doc_levels)
+        )
+        self._fallback = index.as_retriever(similarity_top_k=similarity_top_k, filters=metadata_filters(filters))
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        # The query embedding is stored on the bundle, so a fallback does not embed again
+        return self._preferred.retrieve(query_bundle) or self._fallback.retrieve(query_bundle)
+
+def get_query_engine(name: str, prompt_template_str: Optional[str] = None,
+                     similarity_top_k: int = 4, response_mode: str = "compact", streaming: bool = False,
+                     doc_levels: Optional[tuple] = None, filters: Optional[Dict[str, Any]] = None):
+    """
+    Returns the query engine for (name, similarity_top_k, response_mode), building
+    it on first use. Engines hold no per-query state, so one instance is shared by
+    every thread and session. If an agent's prompt changes, its engine is rebuilt.
+    Only the _MAX_CACHED_QUERY_ENGINES most recently used engines are kept.
+    Streaming engines (whose responses yield tokens) are cached separately.
+    With doc_levels, the engine retrieves summary documents of those levels first.
+    With filters ({metadata field: value or list of values}), it only retrieves
+    matching documents. When hybrid retrieval is enabled, results are fused with
+    keyword matches.
+    """
+    hybrid = get_keyword_index() is not None
+    key = (name, similarity_top_k, response_mode, streaming, doc_levels, filters_key(filters), hybrid)
+    with _query_engine_lock:
+        cached = _query_engine_cache.get(key)
+        if cached and cached[0] == prompt_template_str:
+            _query_engine_cache.move_to_end(key)
+            return cached[1]
+
+        kwargs = {"response_mode": response_mode, "streaming": streaming}
+        if prompt_template_str is not None:
+            kwargs["text_qa_template"] = PromptTemplate(prompt_template_str)
+        if filters:
+            kwargs["filters"] = metadata_filters(filters)
+        depth = candidate_depth(similarity_top_k)
+        if doc_levels:
+            retriever = LevelPreferringRetriever(get_index(), depth, doc_levels, filters)
+        elif hybrid:
+            retriever = get_index().as_retriever(similarity_top_k=depth, filters=kwargs.pop("filters", None))
+        else:
+            retriever = None
+        if hybrid:
+            retriever = HybridRetriever(retriever, similarity_top_k, doc_levels, filters)
+
+        if retriever is not None:
+            kwargs.pop("filters", None)
+            query_engine = RetrieverQueryEngine.from_args(retriever, llm=Settings.llm, **kwargs)
+        else:
+            query_engine = get_index().as_query_engine(similarity_top_k=similarity_top_k, **kwargs)
+        _query_engine_cache[key] = (prompt_template_str, query_engine)
+        _query_engine_cache.move_to_end(key)
+        while len(_query_engine_cache) > _MAX_CACHED_QUERY_ENGINES:
+            _query_engine_cache.popitem(last=False)
+        logger.info(f"Built query engine for {name} (top_k={similarity_top_k}, mode={response_mode}, filters={filters})")
+        return query_engine
+
+def embed_queries(queries: List[str]) -> List[List[float]]:
+    """
+    Query embeddings for several queries, sent to the embedding model as one batch
+    when it supports that. Embeddings are the same as get_query_embedding's.
+    """
+    embed_model = get_embed_model()
+    if hasattr(embed_model, "get_general_text_embeddings") and hasattr(embed_model, "_format_query"):
+        return embed_model.get_general_text_embeddings([embed_model._format_query(query) for query in queries])
+    return [embed_model.get_query_embedding(query) for query in queries]
+
+def _result_nodes(results, i) -> List[NodeWithScore]:
+    return [
+        # Same scoring as ChromaVectorStore.query
+        NodeWithScore(node=metadata_dict_to_node(metadata, text=text), score=math.exp(-distance))
+        for text, metadata, distance in zip(results["documents"][i], results["metadatas"][i], results["distances"][i])
+    ]
+
+def retrieve_many(queries: List[str], similarity_top_k: int = 4, doc_levels: Optional[tuple] = None,
+                  filters: Optional[Dict[str, Any]] = None,
+                  embeddings: Optional[Dict[str, List[float]]] = None) -> Dict[str, List[NodeWithScore]]:
+    """
+    Retrieves the top-k nodes for each query with one embedding batch and one
+    Chroma query, instead of a round-trip of each per query. Nodes and scores are
+    built the same way as the index retriever's, so results are identical.
+    With doc_levels and filters, retrieves like LevelPreferringRetriever; results
+    are fused with keyword matches like HybridRetriever's. embeddings
+    ({query: embedding}) supplies query embeddings already computed, e.g. in
+    one batch for several calls; queries without one are embedded here.
+    """
+    queries = list(dict.fromkeys(queries))
+    known = embeddings or {}
+    missing_embeddings = [query for query in queries if query not in known]
+    known = {**known, **dict(zip(missing_embeddings, embed_queries(missing_embeddings)))} if missing_embeddings else known
+    embeddings = [known[query] for query in queries]
+    collection = get_chroma_collection()
+    depth = candidate_depth(similarity_top_k)
+    where = chroma_where(filters, doc_levels)
+    results = collection.query(query_embeddings=embeddings, n_results=depth, **({"where": where} if where else {}))
+    retrieved = {query: _result_nodes(results, i) for i, query in enumerate(queries)}
+
+    missing = [i for i, query in enumerate(queries) if not retrieved[query]]
+    if doc_levels and missing:
+        # No summaries of these levels are indexed or match: fall back to all documents
+        where = chroma_where(filters)
+        results = collection.query(
+            query_embeddings=[embeddings[i] for i in missing], n_results=depth, **({"where": where} if where else {})
+        )
+        for j, i in enumerate(missing):
+            retrieved[queries[i]] = _result_nodes(results, j)
+    return {
+        query: fuse_keyword_results(query, nodes, similarity_top_k, doc_levels, filters)
+        for query, nodes in retrieved.items()
+    }
+
 class BaseDeepAgent(Agent):
+    # Sections of the precomputed fact sheet (see facts.py) added to this agent's prompt
+    fact_sections = ()
+    # Summary document levels (see rollups.py) retrieved in preference to rows; None retrieves any document
+    doc_levels = None
+    # Metadata filters ({field: value or list of values}) this agent always retrieves with
+    filters = None
+    # Whether queries naming a PO, supplier or contract ID are answered from its rows
+    # (see exact_nodes); for free-form questions, not the fixed analysis prompts
+    exact_lookup = False
+
     def __init__(self, name: str, role: str):
         super().__init__(name, role)
         self.index = get_index()
+        self.last_timings = {}
+        self._retrieved = {}
+        self._scope = None
+
+    def set_scope(self, filters: Optional[Dict[str, Any]]):
+        """
+        Restricts retrieval of later runs to documents matching filters, e.g.
+        {"source": "po.csv"}, on top of the agent's own filters.
+        """
+        self._scope = filters
 
-    def _generate_insight(self, query: str, prompt_template_str: str) -> str:
+    def retrieval_filters(self) -> Optional[Dict[str, Any]]:
+        return merge_filters(self.filters, self._scope)
+
+    def use_retrieved(self, query: str, nodes: List[NodeWithScore]):
+        """Answers the next run of query from these nodes instead of retrieving them again."""
+        self._retrieved[query] = nodes
+
+    def stream(self, query: str) -> Iterator[str]:
+        """
+        Runs the agent like run() but returns a generator that yields the answer's
+        tokens as the LLM produces them.
+        """
+        return self.run(query, streaming=True)
+
+    def _generate_insight(self, query: str, prompt_template_str: str, streaming: bool = False) -> str:
         """
         Uses LlamaIndex Query Engine with a custom prompt to generate insights.
+        With streaming (see stream()), returns a token generator instead of a string.
         """
+        setup_start = time.time()
         # Adapt prompt to LlamaIndex format (requires {context_str} and {query_str})
         # We replace user's {context} with {context_str} and {query} with {query_str}
         llama_prompt_str = prompt_template_str.replace("{context}", "{context_str}").replace("{query}", "{query_str}")
         
         # Add system role to the prompt
         system_msg = f"You are the {self.name}. {self.role}\n"
+        filters = self.retrieval_filters()
+        # Figures cover the same files and rows the context is retrieved from
+        facts = get_fact_sheet(self.fact_sections, filters) if self.fact_sections else ""
+        if facts:
+            scope = f"the data where {describe_filters(filters)}" if filters else "the full data set"
+            system_msg += (
+                f"Key figures computed over {scope} (use them for totals, trends and rankings; "
+                f"the context rows below are individual examples):\n{facts}\n"
+            )
         full_prompt_str = system_msg + llama_prompt_str
         
-        qa_template = PromptTemplate(full_prompt_str)
-        
-        # Configure Query Engine
-        query_engine = self.index.as_query_engine(
-            text_qa_template=qa_template,
-            similarity_top_k=4,
-            response_mode="compact"
+        # Reuse the agent's query engine instead of rebuilding it per query
+        query_engine = get_query_engine(
+            self.name, full_prompt_str, similarity_top_k=4, response_mode="compact", streaming=streaming,
+            doc_levels=self.doc_levels, filters=filters
         )
+        setup_duration = time.time() - setup_start
         
         logger.info(f"Agent {self.name} starting query: {query}")
-        import time
         q_start = time.time()
-        response = query_engine.query(query)
+        # Questions naming a PO, supplier or contract ID answer from its rows without a vector search
+        nodes = self._retrieved.pop(query, None) or (self.exact_lookup and exact_nodes(query, filters=filters)) or None
+        if nodes is not None:
+            response = query_engine.synthesize(QueryBundle(query), nodes)
+        else:
+            response = query_engine.query(query)
+        if streaming:
+            return self._stream_tokens(response, setup_duration, q_start)
         q_duration = time.time() - q_start
-        logger.info(f"Agent {self.name} query finished in {q_duration:.2f}s")
+        self.last_timings = {"setup": setup_duration, "query": q_duration}
+        logger.info(f"Agent {self.name} query finished in {q_duration:.2f}s (setup {setup_duration * 1000:.1f}ms)")
         
         logger.info(f"Agent {self.name} Response: {response}")
         if hasattr(response, 'source_nodes'):
@@ -139,13 +440,39 @@ class BaseDeepAgent(Agent):
         
         return str(response)
 
+    def _stream_tokens(self, response, setup_duration: float, q_start: float) -> Iterator[str]:
+        first_token = None
+        # Without retrieved context the synthesizer returns a plain response
+        tokens = getattr(response, "response_gen", None) or iter([str(response)])
+        try:
+            for token in tokens:
+                if not token:
+                    continue
+                if first_token is None:
+                    first_token = time.time() - q_start
+                    logger.info(f"Agent {self.name} first token after {first_token:.2f}s")
+                yield token
+        finally:
+            # Also on GeneratorExit: closing the LLM stream and dropping it releases
+            # its scheduler slot now rather than when the abandoned stream is collected
+            close = getattr(tokens, "close", None)
+            if close is not None:
+                close()
+            del tokens, response
+        q_duration = time.time() - q_start
+        self.last_timings = {"setup": setup_duration, "first_token": first_token, "query": q_duration}
+        logger.info(f"Agent {self.name} stream finished in {q_duration:.2f}s (setup {setup_duration * 1000:.1f}ms)")
+
 # --- Functional Agents ---
 
 class SupplierIntelligenceAgent(BaseDeepAgent):
+    fact_sections = ("overview", "suppliers")
+    doc_levels = ("supplier",)
+
     def __init__(self):
         super().__init__("Supplier Intelligence Agent", "Evaluates supplier performance and rankings.")
 
-    def run(self, query: str) -> str:
+    def run(self, query: str, streaming: bool = False) -> str:
         prompt_template = (
             "Context information is below.\n"
             "---------------------\n"
@@ -157,13 +484,16 @@ class SupplierIntelligenceAgent(BaseDeepAgent):
             "Query: {query_str}\n"
             "Answer: "
         )
-        return self._generate_insight(query, prompt_template)
+        return self._generate_insight(query, prompt_template, streaming)
 
 class SpendAnalysisAgent(BaseDeepAgent):
+    fact_sections = ("overview", "spend")
+    doc_levels = ("category", "month")
+
     def __init__(self):
         super().__init__("Spend Analysis Agent", "Analyzes spend patterns and identifies cost-saving opportunities.")
 
-    def run(self, query: str) -> str:
+    def run(self, query: str, streaming: bool = False) -> str:
         prompt_template = (
             "Context information is below.\n"
             "---------------------\n"
@@ -175,13 +505,18 @@ class SpendAnalysisAgent(BaseDeepAgent):
             "Query: {query_str}\n"
             "Answer: "
         )
-        return self._generate_insight(query, prompt_template)
+        return self._generate_insight(query, prompt_template, streaming)
 
 class RiskMonitoringAgent(BaseDeepAgent):
+    fact_sections = ("overview", "risk")
+    doc_levels = ("supplier",)
+    # Low-risk rows only dilute the context
+    filters = {"risk_level": ["High", "Medium"]}
+
     def __init__(self):
         super().__init__("Risk Monitoring Agent", "Identifies supplier risks and supply chain disruptions.")
 
-    def run(self, query: str) -> str:
+    def run(self, query: str, streaming: bool = False) -> str:
         prompt_template = (
             "Context information is below.\n"
             "---------------------\n"
@@ -193,13 +528,16 @@ class RiskMonitoringAgent(BaseDeepAgent):
             "Query: {query_str}\n"
             "Answer: "
         )
-        return self._generate_insight(query, prompt_template)
+        return self._generate_insight(query, prompt_template, streaming)
 
 class ContractIntelligenceAgent(BaseDeepAgent):
+    fact_sections = ("contracts",)
+    doc_levels = ("contract",)
+
     def __init__(self):
         super().__init__("Contract Intelligence Agent", "Reviews contracts for expiry, clauses, and compliance.")
 
-    def run(self, query: str) -> str:
+    def run(self, query: str, streaming: bool = False) -> str:
         prompt_template = (
             "Context information is below.\n"
             "---------------------\n"
@@ -211,13 +549,15 @@ class ContractIntelligenceAgent(BaseDeepAgent):
             "Query: {query_str}\n"
             "Answer: "
         )
-        return self._generate_insight(query, prompt_template)
+        return self._generate_insight(query, prompt_template, streaming)
 
 class POAutomationAgent(BaseDeepAgent):
+    fact_sections = ("overview", "suppliers")
+
     def __init__(self):
         super().__init__("PO Automation Agent", "Automates PO creation and tracks delivery status.")
 
-    def run(self, query: str) -> str:
+    def run(self, query: str, streaming: bool = False) -> str:
         prompt_template = (
             "Context information is below.\n"
             "---------------------\n"
@@ -229,13 +569,16 @@ class POAutomationAgent(BaseDeepAgent):
             "Query: {query_str}\n"
             "Answer: "
         )
-        return self._generate_insight(query, prompt_template)
+        return self._generate_insight(query, prompt_template, streaming)
 
 class CompliancePolicyAgent(BaseDeepAgent):
+    fact_sections = ("overview", "compliance")
+    doc_levels = ("supplier", "category")
+
     def __init__(self):
         super().__init__("Compliance & Policy Agent", "Ensures adherence to procurement policies and regulations.")
 
-    def run(self, query: str) -> str:
+    def run(self, query: str, streaming: bool = False) -> str:
         prompt_template = (
             "Context information is below.\n"
             "---------------------\n"
@@ -247,4 +590,67 @@ class CompliancePolicyAgent(BaseDeepAgent):
             "Query: {query_str}\n"
             "Answer: "
         )
-        return self._generate_insight(query, prompt_template)
+        return self._generate_insight(query, prompt_template, streaming)
+
+# --- Complete Analysis ---
+
+# key -> (query, agent class) for the agents run by "Run Complete Analysis"
+ANALYSIS_TASKS = {
+    "spend": ("Analyze spend patterns, identifying anomalies and opportunities.", SpendAnalysisAgent),
+    "risk": ("Identify high-risk suppliers and potential supply chain disruptions.", RiskMonitoringAgent),
+    "supplier": ("Provide a detailed analysis of top suppliers and their performance.", SupplierIntelligenceAgent),
+    "contract": ("Review contracts for expiry and compliance risks.", ContractIntelligenceAgent),
+    "po": ("Analyze Purchase Orders for delays and price discrepancies.", POAutomationAgent),
+    "compliance": ("Check for policy violations and budget adherence.", CompliancePolicyAgent)
+}
+
+def run_complete_analysis(tasks=None, max_workers: Optional[int] = None, filters: Optional[Dict[str, Any]] = None):
+    """
+    Runs every analysis agent and yields (key, report) as each one finishes.
+    With filters, e.g. {"source": "po.csv"}, every agent only retrieves matching
+    documents. Context for all queries is retrieved up front in one shared step; the agents
+    then only synthesize. Their LLM calls run at batch priority, so the shared
+    LLM scheduler limits how many generate at once and serves interactive calls
+    first. A failing agent yields an "Error: ..." report instead of stopping the others.
+    """
+    tasks = tasks or ANALYSIS_TASKS
+    max_workers = max_workers or len(tasks)
+    agents = {key: agent_class() for key, (_, agent_class) in tasks.items()}
+    if filters:
+        for agent in agents.values():
+            agent.set_scope(filters)
+
+    start = time.time()
+    try:
+        # Every query is embedded in one batch; then one search runs per set of
+        # preferred summary levels and filters
+        queries = list(dict.fromkeys(query for query, _ in tasks.values()))
+        embeddings = dict(zip(queries, embed_queries(queries)))
+        groups = {}
+        for key, (query, agent_class) in tasks.items():
+            agent_filters = merge_filters(getattr(agent_class, "filters", None), filters)
+            group = (getattr(agent_class, "doc_levels", None), filters_key(agent_filters))
+            groups.setdefault(group, (agent_filters, []))[1].append(key)
+        for (doc_levels, _), (group_filters, keys) in groups.items():
+            retrieved = retrieve_many(
+                [tasks[key][0] for key in keys], doc_levels=doc_levels, filters=group_filters, embeddings=embeddings
+            )
+            for key in keys:
+                agents[key].use_retrieved(tasks[key][0], retrieved[tasks[key][0]])
+        logger.info(f"Shared retrieval for {len(tasks)} agents finished in {time.time() - start:.2f}s")
+    except Exception as e:
+        # Each agent falls back to its own retrieval
+        logger.warning(f"Shared retrieval failed, agents will retrieve individually: {e}")
+
+    def run_agent(key):
+        try:
+            with llm_priority("batch"):
+                return key, agents[key].run(tasks[key][0])
+        except Exception as e:
+            logger.error(f"Error in {key} analysis: {e}")
+            return key, f"Error: {str(e)}"
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_agent, key) for key in tasks]
+        for future in as_completed(futures):
+            yield future.result()
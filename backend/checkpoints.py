@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import threading
+import time
+from .config import Config
+
+class CheckpointStore:
+    """
+    Local SQLite record of ingestion jobs and the chunks each has committed.
+
+    A chunk is recorded once its vectors are written, together with a digest of
+    its document IDs. A retried job skips embedding and writing for chunks whose
+    digest still matches, so it resumes from the last committed chunk.
+    """
+    def __init__(self, path=None):
+        self.path = path or Config.INGEST_STATE_PATH
+        self._lock = threading.Lock()
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_jobs ("
+            "source TEXT PRIMARY KEY, status TEXT NOT NULL, chunk_rows INTEGER NOT NULL, "
+            "total_bytes INTEGER, committed_chunk INTEGER NOT NULL DEFAULT 0, "
+            "committed_rows INTEGER NOT NULL DEFAULT 0, error TEXT, started_at REAL, updated_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_chunks ("
+            "source TEXT NOT NULL, chunk INTEGER NOT NULL, digest TEXT NOT NULL, PRIMARY KEY (source, chunk))"
+        )
+        self._conn.commit()
+
+    def start(self, source, chunk_rows, total_bytes=None):
+        """
+        Marks a job for source as running and returns {chunk: digest} of the chunks
+        a previous incomplete run committed (empty when starting from scratch).
+        """
+        with self._lock:
+            job = self._conn.execute("SELECT * FROM ingest_jobs WHERE source = ?", (source,)).fetchone()
+            resumable = job is not None and job["status"] != "completed" and job["chunk_rows"] == chunk_rows
+            if not resumable:
+                self._conn.execute("DELETE FROM ingest_chunks WHERE source = ?", (source,))
+            now = time.time()
+            self._conn.execute(
+                "INSERT INTO ingest_jobs (source, status, chunk_rows, total_bytes, started_at, updated_at) "
+                "VALUES (?, 'running', ?, ?, ?, ?) "
+                "ON CONFLICT(source) DO UPDATE SET status = 'running', chunk_rows = excluded.chunk_rows, "
+                "total_bytes = excluded.total_bytes, error = NULL, updated_at = excluded.updated_at"
+                + ("" if resumable else ", committed_chunk = 0, committed_rows = 0, started_at = excluded.started_at"),
+                (source, chunk_rows, total_bytes, now, now)
+            )
+            committed = {
+                row["chunk"]: row["digest"]
+                for row in self._conn.execute("SELECT chunk, digest FROM ingest_chunks WHERE source = ?", (source,))
+            }
+            self._conn.commit()
+            return committed
+
+    def commit_chunk(self, source, chunk, digest, rows):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingest_chunks (source, chunk, digest) VALUES (?, ?, ?)",
+                (source, chunk, digest)
+            )
+            self._conn.execute(
+                "UPDATE ingest_jobs SET committed_chunk = ?, committed_rows = ?, updated_at = ? WHERE source = ?",
+                (chunk, rows, time.time(), source)
+            )
+            self._conn.commit()
+
+    def fail(self, source, error):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingest_jobs SET status = 'failed', error = ?, updated_at = ? WHERE source = ?",
+                (error, time.time(), source)
+            )
+            self._conn.commit()
+
+    def finish(self, source):
+        with self._lock:
+            self._conn.execute("DELETE FROM ingest_chunks WHERE source = ?", (source,))
+            self._conn.execute(
+                "UPDATE ingest_jobs SET status = 'completed', error = NULL, updated_at = ? WHERE source = ?",
+                (time.time(), source)
+            )
+            self._conn.commit()
+
+    def forget(self, source):
+        with self._lock:
+            self._conn.execute("DELETE FROM ingest_chunks WHERE source = ?", (source,))
+            self._conn.execute("DELETE FROM ingest_jobs WHERE source = ?", (source,))
+            self._conn.commit()
+
+    def get_job(self, source):
+        with self._lock:
+            job = self._conn.execute("SELECT * FROM ingest_jobs WHERE source = ?", (source,)).fetchone()
+        return dict(job) if job else None
+
+    def data_version(self):
+        """Changes whenever any job starts, commits, finishes, fails or is forgotten."""
+        with self._lock:
+            count, updated_at = self._conn.execute("SELECT COUNT(*), MAX(updated_at) FROM ingest_jobs").fetchone()
+        return f"{count}:{updated_at or 0}"
+
+    def incomplete_jobs(self):
+        """Jobs that failed or were interrupted, most recently updated first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM ingest_jobs WHERE status != 'completed' ORDER BY updated_at DESC"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+_checkpoint_store = None
+
+def get_checkpoint_store():
+    """Returns the process-wide ingestion checkpoint store."""
+    global _checkpoint_store
+    if _checkpoint_store is None:
+        _checkpoint_store = CheckpointStore()
+    return _checkpoint_store
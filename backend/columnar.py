@@ -0,0 +1,316 @@
+import io
+import json
+import shutil
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from loguru import logger
+from .config import Config
+
+# Low-cardinality text columns stored as categoricals (dictionary-encoded in Parquet)
+CATEGORICAL_COLUMNS = ("ItemCategory", "SupplierRiskLevel", "ComplianceStatus", "Unit")
+
+# S3 limits user metadata to 2 KB per object; wider schemas are read from the Parquet footer
+_MAX_SCHEMA_METADATA = 1500
+
+def parquet_object_name(object_name):
+    """Object name of the typed Parquet copy of an uploaded CSV."""
+    return f"{Config.MINIO_PARQUET_PREFIX}{object_name}.parquet"
+
+def manifest_metadata(rows, columns):
+    """
+    Object user metadata recording a file's row count and [name, dtype] column schema.
+    """
+    metadata = {"row-count": str(rows)}
+    schema = json.dumps(columns, separators=(",", ":"))
+    if len(schema) <= _MAX_SCHEMA_METADATA:
+        metadata["columns"] = schema
+    return metadata
+
+def parse_manifest_metadata(metadata):
+    """
+    Reads manifest_metadata back from stat or listing metadata, whose keys may
+    carry the x-amz-meta- prefix in any case. Missing values are None.
+    """
+    values = {}
+    for key, value in (metadata or {}).items():
+        key = key.lower()
+        if key.startswith("x-amz-meta-"):
+            key = key[len("x-amz-meta-"):]
+        values[key] = value
+    row_count = values.get("row-count")
+    columns = values.get("columns")
+    return {
+        "row_count": int(row_count) if row_count is not None else None,
+        "columns": json.loads(columns) if columns is not None else None,
+    }
+
+# Date formats accepted in CSVs, tried in order on the first word of each value
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y")
+
+def is_date_column(column):
+    return str(column).endswith("Date")
+
+def parse_dates(values):
+    """
+    Parses a Series of dates written in any of DATE_FORMATS, value by value,
+    ignoring a time after the date. Values that match no format become NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    text = values.astype("string").str.strip().str.split().str[0]
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    for fmt in DATE_FORMATS:
+        missing = parsed.isna() & text.notna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(text[missing], format=fmt, errors="coerce")
+    return parsed
+
+def typed_frame(df):
+    """
+    Returns df with date columns (names ending in "Date") parsed as datetimes
+    and the known categorical columns as categories. A date column with any
+    value that does not parse keeps its raw strings.
+    """
+    df = df.copy()
+    for column in df.columns:
+        if is_date_column(column):
+            dates = parse_dates(df[column])
+            if not (dates.isna() & df[column].notna()).any():
+                df[column] = dates
+        elif column in CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype("category")
+    return df
+
+def numeric_columns(df):
+    """
+    Returns df with the text columns whose values all parse as numbers converted
+    to numbers, as read_csv would infer them. Dates and categoricals are left to
+    typed_frame.
+    """
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype != object or is_date_column(column) or column in CATEGORICAL_COLUMNS:
+            continue
+        try:
+            df[column] = pd.to_numeric(df[column])
+        except (ValueError, TypeError):
+            pass
+    return df
+
+def _common_type(current, new):
+    """The narrowest Arrow type that holds values of both types."""
+    if current == new:
+        return current
+    if pa.types.is_dictionary(current) and pa.types.is_dictionary(new):
+        return pa.dictionary(pa.int32(), _common_type(current.value_type, new.value_type))
+    numeric = (pa.types.is_integer, pa.types.is_floating)
+    if any(check(current) for check in numeric) and any(check(new) for check in numeric):
+        if pa.types.is_integer(current) and pa.types.is_integer(new):
+            return pa.int64()
+        return pa.float64()
+    return pa.string()
+
+def _cast_column(column, target):
+    if column.type == target:
+        return column
+    if column.null_count == len(column):
+        return pa.nulls(len(column), type=target)
+    if pa.types.is_dictionary(column.type) and not pa.types.is_dictionary(target):
+        column = column.cast(column.type.value_type)
+    if pa.types.is_timestamp(column.type) and pa.types.is_string(target):
+        # Back to the CSV's date form rather than Arrow's timestamp text
+        return pc.strftime(column, format="%Y-%m-%d")
+    return column.cast(target)
+
+def _cast_table(table, schema):
+    return pa.Table.from_arrays(
+        [_cast_column(table.column(field.name), field.type) for field in schema], schema=schema
+    )
+
+class ParquetCopyWriter:
+    """
+    Writes CSV chunks to a Parquet file, grouping them into row groups of about
+    row_group_rows rows so column reads need few requests.
+
+    Chunks are parsed separately, so a column's dtype can drift between them:
+    empty in one chunk and text in the next, whole numbers then decimals, or
+    dates then an unparseable date. Each column takes the narrowest type that
+    holds every chunk so far (see _common_type); a column that has only been
+    empty adopts the type of its first values. When a type widens, pending
+    chunks are cast and the row groups already written are rewritten, which
+    happens at most a few times per column.
+    """
+    def __init__(self, sink, row_group_rows=100_000):
+        self.sink = sink
+        self.row_group_rows = row_group_rows
+        self.rows = 0
+        self.columns = None
+        self._start = sink.tell()
+        self._schema = None
+        self._seen = set()
+        self._writer = None
+        self._pending = []
+        self._pending_rows = 0
+
+    def write(self, df):
+        table = pa.Table.from_pandas(typed_frame(df), preserve_index=False)
+        schema = self._unify(table)
+        if schema != self._schema:
+            if self._schema is not None:
+                self._pending = [_cast_table(pending, schema) for pending in self._pending]
+                if self._writer is not None:
+                    self._rewrite(schema)
+            self._schema = schema
+            self.columns = [
+                [str(column), str(dtype)] for column, dtype in schema.empty_table().to_pandas().dtypes.items()
+            ]
+        self._pending.append(_cast_table(table, schema))
+        self._pending_rows += len(df)
+        self.rows += len(df)
+        if self._pending_rows >= self.row_group_rows:
+            self._flush()
+
+    def _unify(self, table):
+        """The file schema widened to hold table's columns."""
+        fields = []
+        for field in table.schema:
+            column = table.column(field.name)
+            new = field.type
+            # Categories differ per chunk: use an index type wide enough for any of them
+            if pa.types.is_dictionary(new):
+                new = pa.dictionary(pa.int32(), new.value_type)
+            has_values = column.null_count < len(column) and not pa.types.is_null(new)
+            if self._schema is None or field.name not in self._schema.names:
+                fields.append(pa.field(field.name, new))
+            else:
+                current = self._schema.field(field.name).type
+                if not has_values:
+                    fields.append(pa.field(field.name, current))
+                elif field.name not in self._seen:
+                    fields.append(pa.field(field.name, new))
+                else:
+                    fields.append(pa.field(field.name, _common_type(current, new)))
+            if has_values:
+                self._seen.add(field.name)
+        return pa.schema(fields)
+
+    def _rewrite(self, schema):
+        """Rewrites the row groups written so far with schema."""
+        self._writer.close()
+        with tempfile.TemporaryFile() as written:
+            self.sink.seek(self._start)
+            shutil.copyfileobj(self.sink, written)
+            written.seek(0)
+            self.sink.seek(self._start)
+            self.sink.truncate()
+            self._writer = pq.ParquetWriter(self.sink, schema, compression="zstd")
+            parquet_file = pq.ParquetFile(written)
+            for group in range(parquet_file.num_row_groups):
+                self._writer.write_table(_cast_table(parquet_file.read_row_group(group), schema))
+
+    def _flush(self):
+        if self._pending:
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.sink, self._schema, compression="zstd")
+            self._writer.write_table(pa.concat_tables(self._pending), row_group_size=self._pending_rows)
+            self._pending = []
+            self._pending_rows = 0
+
+    def close(self):
+        if self._schema is not None:
+            self._flush()
+            self._writer.close()
+
+class _ObjectRangeReader(io.RawIOBase):
+    """
+    Seekable read-only view of a MinIO object that fetches byte ranges on
+    demand, so Parquet readers download the footer and requested columns only.
+    """
+    def __init__(self, client, bucket, object_name):
+        self._client = client
+        self._bucket = bucket
+        self._object_name = object_name
+        self.size = client.stat_object(bucket, object_name).size
+        self._position = 0
+        self.bytes_fetched = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        else:
+            self._position = self.size + offset
+        return self._position
+
+    def readinto(self, b):
+        length = min(len(b), self.size - self._position)
+        if length <= 0:
+            return 0
+        response = self._client.get_object(self._bucket, self._object_name, offset=self._position, length=length)
+        try:
+            data = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+        b[:len(data)] = data
+        self._position += len(data)
+        self.bytes_fetched += len(data)
+        return len(data)
+
+def read_parquet_copy(client, bucket, object_name, columns=None):
+    """
+    Reads the Parquet copy of object_name, fetching only the given columns.
+    Columns that the file does not have are ignored.
+    """
+    raw = _ObjectRangeReader(client, bucket, parquet_object_name(object_name))
+    # pre_buffer coalesces the byte ranges of the requested column chunks into few requests
+    parquet_file = pq.ParquetFile(raw, pre_buffer=True)
+    if columns is not None:
+        available = set(parquet_file.schema_arrow.names)
+        columns = [column for column in columns if column in available]
+    df = parquet_file.read(columns=columns).to_pandas()
+    logger.debug(f"Read {parquet_object_name(object_name)}: {raw.bytes_fetched} of {raw.size} bytes")
+    return df
+
+def read_parquet_rows(client, bucket, object_name, offsets):
+    """
+    Reads the rows at the given 0-based offsets from the Parquet copy of
+    object_name, fetching only the row groups that hold them. The returned
+    frame is indexed by offset, in ascending order.
+    """
+    raw = _ObjectRangeReader(client, bucket, parquet_object_name(object_name))
+    parquet_file = pq.ParquetFile(raw, pre_buffer=True)
+    offsets = sorted(set(offsets))
+    frames = []
+    start = 0
+    for group in range(parquet_file.num_row_groups):
+        end = start + parquet_file.metadata.row_group(group).num_rows
+        wanted = [offset for offset in offsets if start <= offset < end]
+        if wanted:
+            table = parquet_file.read_row_group(group).take([offset - start for offset in wanted])
+            frames.append(table.to_pandas().set_axis(wanted))
+        start = end
+    logger.debug(f"Read {len(offsets)} rows of {parquet_object_name(object_name)}: {raw.bytes_fetched} of {raw.size} bytes")
+    if not frames:
+        return parquet_file.schema_arrow.empty_table().to_pandas()
+    return pd.concat(frames)
+
+def read_parquet_schema(client, bucket, object_name):
+    """[name, dtype] columns of the Parquet copy of object_name, read from its footer."""
+    raw = _ObjectRangeReader(client, bucket, parquet_object_name(object_name))
+    dtypes = pq.ParquetFile(raw).schema_arrow.empty_table().to_pandas().dtypes
+    return [[str(column), str(dtype)] for column, dtype in dtypes.items()]
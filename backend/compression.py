@@ -0,0 +1,123 @@
+import io
+import zlib
+from loguru import logger
+from .config import Config
+
+# Codec names as recorded in the object's content-encoding metadata
+CODECS = ("none", "gzip", "zstd")
+
+# Stored as user metadata rather than the Content-Encoding header: HTTP clients
+# decode that header on the fly, which would break ranged reads and size checks
+ENCODING_METADATA_KEY = "x-amz-meta-content-encoding"
+
+# Levels used when MINIO_COMPRESSION_LEVEL is not set: fast, and close to the best ratio on CSV
+_DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+
+_READ_BLOCK_BYTES = 1024 * 1024
+
+def _zstandard():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+def resolve_codec(codec=None):
+    """
+    Returns the codec to store new objects with: codec, or Config.MINIO_COMPRESSION
+    when None. zstd falls back to gzip when the zstandard package is not installed.
+    """
+    codec = (codec or Config.MINIO_COMPRESSION or "none").lower()
+    if codec not in CODECS:
+        raise ValueError(f"Unknown compression codec '{codec}', expected one of {', '.join(CODECS)}")
+    if codec == "zstd" and _zstandard() is None:
+        logger.warning("zstandard is not installed, compressing with gzip instead")
+        return "gzip"
+    return codec
+
+def compress_stream(stream, codec, level=None):
+    """Yields the compressed bytes of a binary file-like object, one block at a time."""
+    level = level or Config.MINIO_COMPRESSION_LEVEL or _DEFAULT_LEVELS[codec]
+    if codec == "gzip":
+        # wbits=31 writes a gzip header, so objects can be downloaded and gunzipped as-is
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    else:
+        compressor = _zstandard().ZstdCompressor(level=level).compressobj()
+    while True:
+        block = stream.read(_READ_BLOCK_BYTES)
+        if not block:
+            break
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def decompress(data, codec):
+    """Decompresses a whole object stored with codec ("none" or None returns data unchanged)."""
+    if not codec or codec == "none":
+        return data
+    if codec == "gzip":
+        return zlib.decompress(data, 31)
+    if codec == "zstd":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise RuntimeError("Object is zstd-compressed but the zstandard package is not installed")
+        # Streamed frames carry no content size, so decompress without a size hint
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise ValueError(f"Unknown content encoding '{codec}'")
+
+class _DecompressingReader(io.RawIOBase):
+    """Read-only binary stream over a compressed stream, decompressed one block at a time."""
+
+    def __init__(self, stream, decompressor):
+        self._stream = stream
+        self._decompressor = decompressor
+        self._buffer = b""
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer and not self._eof:
+            block = self._stream.read(_READ_BLOCK_BYTES)
+            if block:
+                self._buffer = self._decompressor.decompress(block)
+            else:
+                self._buffer = self._decompressor.flush()
+                self._eof = True
+        count = min(len(b), len(self._buffer))
+        b[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+        super().close()
+
+def decompress_stream(stream, codec):
+    """
+    Wraps a binary file-like object holding an object stored with codec in a
+    reader that decompresses it on the fly, so memory stays bounded whatever
+    the object size. Closing the reader closes stream.
+    """
+    if not codec or codec == "none":
+        return stream
+    if codec == "gzip":
+        decompressor = zlib.decompressobj(31)
+    elif codec == "zstd":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise RuntimeError("Object is zstd-compressed but the zstandard package is not installed")
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        raise ValueError(f"Unknown content encoding '{codec}'")
+    return io.BufferedReader(_DecompressingReader(stream, decompressor), _READ_BLOCK_BYTES)
+
+def object_encoding(headers):
+    """Codec an object was stored with, from its response or stat headers."""
+    for key, value in (headers or {}).items():
+        if key.lower() == ENCODING_METADATA_KEY:
+            return value.lower()
+    return "none"
@@ -7,6 +7,16 @@ class Config:
     MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
     MINIO_BUCKET_NAME = "procurement-data"
     MINIO_SECURE = False
+    MINIO_POOL_SIZE = int(os.getenv("MINIO_POOL_SIZE", 32))
+    MINIO_CONNECT_TIMEOUT = float(os.getenv("MINIO_CONNECT_TIMEOUT", 5))
+    MINIO_READ_TIMEOUT = float(os.getenv("MINIO_READ_TIMEOUT", 120))
+    MINIO_PART_SIZE_MB = int(os.getenv("MINIO_PART_SIZE_MB", 16))
+    MINIO_UPLOAD_CONCURRENCY = int(os.getenv("MINIO_UPLOAD_CONCURRENCY", 4))
+    # Compression of stored uploads: "none", "gzip" or "zstd" (needs the zstandard package)
+    MINIO_COMPRESSION = os.getenv("MINIO_COMPRESSION", "none")
+    MINIO_COMPRESSION_LEVEL = int(os.getenv("MINIO_COMPRESSION_LEVEL", 0)) or None
+    # Derived objects (e.g. Parquet copies) live under this prefix and are hidden from file listings
+    MINIO_PARQUET_PREFIX = os.getenv("MINIO_PARQUET_PREFIX", "_parquet/")
 
     # ChromaDB
     CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
@@ -17,3 +27,43 @@ class Config:
     OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     LLM_MODEL = "llama3.2:3b"  # User specified model
     EMBEDDING_MODEL = "bge-m3:567m" # User specified model
+    # Generations sent to Ollama at once across the whole process; more calls queue by priority
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 2))
+    # Add precomputed aggregates (spend, suppliers, risk, contracts, compliance) to agent prompts
+    AGENT_FACTS_ENABLED = os.getenv("AGENT_FACTS_ENABLED", "true").lower() == "true"
+    EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 32))
+    EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", 4))
+
+    # Local caches and state
+    CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+    EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+    EMBED_CACHE_PATH = os.path.join(CACHE_DIR, "embeddings.sqlite3")
+    EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", 2048))
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_PATH = os.path.join(CACHE_DIR, "llm_responses.sqlite3")
+    LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", 24))
+    LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", 256))
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_PATH = os.path.join(CACHE_DIR, "semantic_cache.sqlite3")
+    # Minimum cosine similarity between two queries for one to reuse the other's answer
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 1000))
+    # BM25 keyword index fused with vector search by reciprocal rank
+    HYBRID_RETRIEVAL_ENABLED = os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() == "true"
+    KEYWORD_INDEX_PATH = os.path.join(CACHE_DIR, "keyword_index.sqlite3")
+    # Candidates taken from each of the vector and keyword results before fusion
+    HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))
+    # Exact PO/supplier/contract lookups; questions naming an ID answer from its rows
+    KEY_INDEX_ENABLED = os.getenv("KEY_INDEX_ENABLED", "true").lower() == "true"
+    KEY_INDEX_PATH = os.path.join(CACHE_DIR, "key_index.sqlite3")
+    KEY_LOOKUP_MAX_ROWS = int(os.getenv("KEY_LOOKUP_MAX_ROWS", 20))
+    DATAFRAME_CACHE_MAX_MB = int(os.getenv("DATAFRAME_CACHE_MAX_MB", 512))
+    INGEST_STATE_PATH = os.path.join(CACHE_DIR, "ingestion_state.sqlite3")
+
+    # Ingestion
+    INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", 5000))
+    INGEST_MAX_JOBS = int(os.getenv("INGEST_MAX_JOBS", 2))
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 2))
+    # Also index one summary document per supplier, category, contract and month
+    INGEST_ROLLUPS_ENABLED = os.getenv("INGEST_ROLLUPS_ENABLED", "true").lower() == "true"
+    INGEST_READ_BLOCK_BYTES = int(os.getenv("INGEST_READ_BLOCK_BYTES", 1024 * 1024))
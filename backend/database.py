@@ -1,10 +1,21 @@
+import io
+import threading
 import chromadb
+import pandas as pd
 from llama_index.vector_stores.chroma import ChromaVectorStore
 from llama_index.core import StorageContext
 from loguru import logger
+from .compression import ENCODING_METADATA_KEY, compress_stream, decompress, decompress_stream, object_encoding, resolve_codec
+from .columnar import (
+    parquet_object_name, parse_manifest_metadata, read_parquet_copy, read_parquet_rows, read_parquet_schema, typed_frame
+)
+from .frame_cache import get_dataframe_cache
 from .config import Config
 
 _vector_store_cache = None
+_minio_client_cache = None
+_minio_client_lock = threading.Lock()
+_ensured_buckets = set()
 _storage_context_cache = None
 
 def get_vector_store():
@@ -39,9 +50,102 @@ def get_vector_store():
         logger.error(f"Failed to initialize Vector Store: {e}")
         raise e
 
+def get_chroma_collection():
+    """Returns the underlying Chroma collection of the cached vector store."""
+    vector_store, _ = get_vector_store()
+    return vector_store.client
+
+def get_source_rows(source, page_size=10000):
+    """
+    Returns {node_id: row_index} for every vector stored for a source file.
+    Only metadata is fetched, never embeddings or documents.
+    """
+    collection = get_chroma_collection()
+    rows = {}
+    offset = 0
+    while True:
+        result = collection.get(where={"source": source}, include=["metadatas"], limit=page_size, offset=offset)
+        for node_id, metadata in zip(result["ids"], result["metadatas"]):
+            rows[node_id] = (metadata or {}).get("row_index")
+        if len(result["ids"]) < page_size:
+            return rows
+        offset += page_size
+
+def upsert_documents(documents):
+    """
+    Writes embedded documents, replacing any vectors that already use the same IDs.
+    """
+    if not documents:
+        return
+    vector_store, _ = get_vector_store()
+    vector_store.client.delete(ids=[doc.id_ for doc in documents])
+    vector_store.add(documents)
+
+def delete_documents(node_ids):
+    if node_ids:
+        get_chroma_collection().delete(ids=list(node_ids))
+
+def get_minio_client():
+    """
+    Returns the process-wide MinioClient.
+    Its urllib3 pool keeps connections alive and shares them across threads.
+    """
+    global _minio_client_cache
+    if _minio_client_cache is None:
+        with _minio_client_lock:
+            if _minio_client_cache is None:
+                _minio_client_cache = MinioClient()
+    return _minio_client_cache
+
+class _IterableReader(io.RawIOBase):
+    """File-like view of an iterable of bytes chunks, for put_object."""
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b""
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+class _UploadProgress:
+    """Adapts put_object's progress protocol to a (bytes_read, total) callback."""
+    def __init__(self, callback):
+        self._callback = callback
+        self._total = None
+        self._done = 0
+
+    def set_meta(self, object_name, total_length):
+        self._total = total_length if total_length and total_length > 0 else None
+
+    def update(self, size):
+        self._done += size
+        self._callback(self._done, self._total)
+
+def _minio_http_client():
+    import urllib3
+    return urllib3.PoolManager(
+        # One pool per host; maxsize connections are kept alive for reuse
+        num_pools=4,
+        maxsize=Config.MINIO_POOL_SIZE,
+        block=False,
+        timeout=urllib3.Timeout(connect=Config.MINIO_CONNECT_TIMEOUT, read=Config.MINIO_READ_TIMEOUT),
+        retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+    )
+
 class MinioClient:
     """
     Kept for file storage (PDFs/CSVs) before processing.
+    Prefer get_minio_client() over creating instances.
     """
     def __init__(self):
         from minio import Minio
@@ -49,17 +153,53 @@ class MinioClient:
             Config.MINIO_ENDPOINT,
             access_key=Config.MINIO_ACCESS_KEY,
             secret_key=Config.MINIO_SECRET_KEY,
-            secure=False
+            secure=False,
+            http_client=_minio_http_client()
         )
         self.bucket = Config.MINIO_BUCKET_NAME
         self._ensure_bucket()
 
     def _ensure_bucket(self):
+        # Checked once per process and bucket
+        key = (Config.MINIO_ENDPOINT, self.bucket)
+        if key in _ensured_buckets:
+            return
         if not self.client.bucket_exists(self.bucket):
             self.client.make_bucket(self.bucket)
+        _ensured_buckets.add(key)
+
+    def upload_file(self, object_name, data, length=-1, metadata=None,
+                    part_size=None, parallel_uploads=None, progress_callback=None, compression=None):
+        """
+        Streams data (bytes, a binary file-like object or an iterable of bytes
+        chunks) to the bucket. Files larger than part_size, or of unknown length
+        (-1), are sent as a multipart upload with up to parallel_uploads parts in
+        flight, so memory use is about (parallel_uploads + 1) * part_size
+        whatever the file size. progress_callback(bytes_read, total_bytes or None)
+        is called as data is consumed.
 
-    def upload_file(self, object_name, data, length):
-        self.client.put_object(self.bucket, object_name, data, length)
+        compression ("none", "gzip" or "zstd"; Config.MINIO_COMPRESSION by default)
+        compresses the data on the way out and records the codec in the object's
+        metadata, so get_file_content returns the original bytes. Progress then
+        counts compressed bytes. Data that is already compressed (e.g. Parquet)
+        should be uploaded with compression="none".
+        """
+        if isinstance(data, (bytes, bytearray)):
+            data = io.BytesIO(data)
+        elif not hasattr(data, "read"):
+            data = _IterableReader(data)
+        codec = resolve_codec(compression)
+        if codec != "none":
+            data = _IterableReader(compress_stream(data, codec))
+            length = -1
+            metadata = {**(metadata or {}), ENCODING_METADATA_KEY: codec}
+        part_size = part_size or Config.MINIO_PART_SIZE_MB * 1024 * 1024
+        parallel_uploads = parallel_uploads or Config.MINIO_UPLOAD_CONCURRENCY
+        progress = _UploadProgress(progress_callback) if progress_callback else None
+        self.client.put_object(
+            self.bucket, object_name, data, length, part_size=part_size, metadata=metadata,
+            num_parallel_uploads=parallel_uploads, progress=progress
+        )
 
     def list_files(self):
         """
@@ -67,18 +207,87 @@ class MinioClient:
         """
         try:
             objects = self.client.list_objects(self.bucket)
-            return [obj.object_name for obj in objects]
+            return [
+                obj.object_name for obj in objects
+                if not obj.object_name.startswith(Config.MINIO_PARQUET_PREFIX)
+            ]
         except Exception as e:
             logger.error(f"Error listing files: {e}")
             return []
 
+    def list_files_info(self):
+        """
+        Lists files with their size, ETag and last-modified time, plus row count
+        and column schema when the file has been ingested, using one listing call.
+        Row count and columns are None when unknown (e.g. the server does not
+        return user metadata in listings).
+        """
+        try:
+            objects = list(self.client.list_objects(self.bucket, recursive=True, include_user_meta=True))
+        except Exception as e:
+            logger.error(f"Error listing files: {e}")
+            return []
+
+        manifests = {
+            obj.object_name: parse_manifest_metadata(obj.metadata)
+            for obj in objects if obj.object_name.startswith(Config.MINIO_PARQUET_PREFIX)
+        }
+        return [
+            self._file_info(obj, manifests.get(parquet_object_name(obj.object_name)))
+            for obj in objects if not obj.object_name.startswith(Config.MINIO_PARQUET_PREFIX)
+        ]
+
+    def get_file_info(self, object_name):
+        """
+        Returns metadata for one file (see list_files_info) without downloading
+        it, or None if it does not exist.
+        """
+        try:
+            stat = self.client.stat_object(self.bucket, object_name)
+        except Exception as e:
+            logger.debug(f"Error getting file stat: {e}")
+            return None
+        try:
+            manifest = parse_manifest_metadata(
+                self.client.stat_object(self.bucket, parquet_object_name(object_name)).metadata
+            )
+            if manifest["columns"] is None:
+                manifest["columns"] = read_parquet_schema(self.client, self.bucket, object_name)
+        except Exception:
+            manifest = None
+        return self._file_info(stat, manifest)
+
+    @staticmethod
+    def _file_info(obj, manifest):
+        manifest = manifest or {}
+        return {
+            "name": obj.object_name,
+            "size": obj.size,
+            "etag": obj.etag,
+            "last_modified": obj.last_modified,
+            "row_count": manifest.get("row_count"),
+            "columns": manifest.get("columns"),
+        }
+
+    def get_etag(self, object_name):
+        """
+        Returns the object's ETag (changes whenever the object is rewritten),
+        or None if it does not exist.
+        """
+        try:
+            return self.client.stat_object(self.bucket, object_name).etag
+        except Exception as e:
+            logger.debug(f"Error getting file stat: {e}")
+            return None
+
     def get_file_content(self, object_name):
         """
-        Retrieves the content of a file as bytes.
+        Retrieves the content of a file as bytes, decompressed if it was
+        uploaded with compression.
         """
         try:
             response = self.client.get_object(self.bucket, object_name)
-            return response.read()
+            return decompress(response.read(), object_encoding(response.headers))
         except Exception as e:
             logger.error(f"Error getting file content: {e}")
             return None
@@ -86,12 +295,74 @@ class MinioClient:
             if 'response' in locals():
                 response.close()
                 
+    def open_file(self, object_name):
+        """
+        Opens a stored file as a binary stream, decompressed on the fly if it
+        was uploaded with compression, or returns None if it cannot be read.
+        The caller must close the stream.
+        """
+        try:
+            response = self.client.get_object(self.bucket, object_name)
+        except Exception as e:
+            logger.error(f"Error opening file: {e}")
+            return None
+        try:
+            return decompress_stream(response, object_encoding(response.headers))
+        except Exception as e:
+            logger.error(f"Error opening file: {e}")
+            response.close()
+            return None
+
+    def read_dataframe(self, object_name, columns=None):
+        """
+        Loads a stored CSV as a typed DataFrame (see columnar.typed_frame), reading
+        only the given columns. Prefers the Parquet copy written at ingestion and
+        falls back to parsing the CSV. Returns None if the file does not exist.
+        """
+        from minio.error import S3Error
+        try:
+            return read_parquet_copy(self.client, self.bucket, object_name, columns)
+        except S3Error as e:
+            if e.code != "NoSuchKey":
+                logger.warning(f"Error reading Parquet copy of {object_name}: {e}")
+        except Exception as e:
+            logger.warning(f"Error reading Parquet copy of {object_name}: {e}")
+
+        content = self.get_file_content(object_name)
+        if content is None:
+            return None
+        usecols = None if columns is None else (lambda column: column in columns)
+        return typed_frame(pd.read_csv(io.BytesIO(content), usecols=usecols))
+
+    def read_rows(self, object_name, offsets):
+        """
+        Loads the rows at the given 0-based offsets of a stored CSV as a typed
+        DataFrame indexed by offset. Reads only the Parquet row groups holding
+        them, falling back to the whole file. Returns None if the file does not exist.
+        """
+        from minio.error import S3Error
+        try:
+            return read_parquet_rows(self.client, self.bucket, object_name, offsets)
+        except S3Error as e:
+            if e.code != "NoSuchKey":
+                logger.warning(f"Error reading Parquet copy of {object_name}: {e}")
+        except Exception as e:
+            logger.warning(f"Error reading Parquet copy of {object_name}: {e}")
+
+        df = self.read_dataframe(object_name)
+        if df is None:
+            return None
+        return df.loc[[offset for offset in sorted(set(offsets)) if offset < len(df)]]
+
     def delete_file(self, object_name):
         """
-        Deletes a file from the bucket.
+        Deletes a file, and its derived Parquet copy, from the bucket and drops
+        its cached DataFrames.
         """
         try:
             self.client.remove_object(self.bucket, object_name)
+            self.client.remove_object(self.bucket, parquet_object_name(object_name))
+            get_dataframe_cache().invalidate(object_name)
             return True
         except Exception as e:
             logger.error(f"Error deleting file: {e}")
@@ -0,0 +1,226 @@
+import os
+import sqlite3
+import hashlib
+import math
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from .config import Config
+from .llm import get_embed_model
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding store backed by SQLite.
+
+    Entries are keyed by sha256(model, text) and stored as float32 blobs.
+    When the total stored size exceeds max_bytes, least recently used
+    entries are evicted.
+    """
+    _LOOKUP_CHUNK = 500
+
+    def __init__(self, path=None, model_name=None, max_bytes=None):
+        self.path = path or Config.EMBED_CACHE_PATH
+        self.model_name = model_name or Config.EMBEDDING_MODEL
+        self.max_bytes = max_bytes if max_bytes is not None else Config.EMBED_CACHE_MAX_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        self._clock = 0
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        row = self._conn.execute("SELECT MAX(last_used) FROM embeddings").fetchone()
+        self._clock = row[0] or 0
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def get_many(self, texts):
+        """Returns {text: embedding} for every text already in the cache."""
+        keys = {self.key(text): text for text in texts}
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            for i in range(0, len(key_list), self._LOOKUP_CHUNK):
+                chunk = key_list[i:i + self._LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[keys[key]] = array("f", blob).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                        [self._tick()] + [key for key, _ in rows]
+                    )
+            self._conn.commit()
+        return found
+
+    def put_many(self, texts, embeddings):
+        with self._lock:
+            now = self._tick()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(self.key(text), array("f", embedding).tobytes(), now) for text, embedding in zip(texts, embeddings)]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total, count = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0), COUNT(*) FROM embeddings").fetchone()
+        if total <= self.max_bytes or count == 0:
+            return
+        excess_rows = math.ceil((total - self.max_bytes) / (total / count))
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess_rows,)
+        )
+        logger.info(f"Embedding cache evicted {excess_rows} least recently used entries")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+_embedding_cache = None
+
+def get_embedding_cache():
+    """
+    Returns the process-wide embedding cache, or None when caching is disabled.
+    """
+    global _embedding_cache
+    if not Config.EMBED_CACHE_ENABLED:
+        return None
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+class BatchedEmbedder:
+    """
+    Embeds texts in fixed-size batches with a bounded number of concurrent requests.
+
+    The in-flight limit adapts to the embedding server (AIMD): it grows by one
+    after each healthy batch and is halved when a batch is much slower than the
+    best observed latency or fails, so a struggling Ollama gets fewer requests.
+    """
+    def __init__(self, embed_model=None, batch_size=None, max_concurrency=None,
+                 slowdown_factor=3.0, max_retries=3, retry_delay=1.0, cache=None):
+        self.embed_model = embed_model or get_embed_model()
+        self.cache = cache
+        self.batch_size = batch_size or Config.EMBED_BATCH_SIZE
+        self.max_concurrency = max_concurrency or Config.EMBED_MAX_CONCURRENCY
+        self.slowdown_factor = slowdown_factor
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._limit = self.max_concurrency
+        self._in_flight = 0
+        self._baseline_per_doc = None
+        self._cond = threading.Condition()
+
+    @property
+    def concurrency_limit(self):
+        return self._limit
+
+    def _acquire_slot(self):
+        with self._cond:
+            while self._in_flight >= self._limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def _release_slot(self, latency_per_doc=None, failed=False):
+        with self._cond:
+            self._in_flight -= 1
+            if failed:
+                self._limit = max(1, self._limit // 2)
+                logger.warning(f"Embedding request failed, concurrency limit -> {self._limit}")
+            elif latency_per_doc is not None:
+                if self._baseline_per_doc is None or latency_per_doc < self._baseline_per_doc:
+                    self._baseline_per_doc = latency_per_doc
+                if latency_per_doc > self._baseline_per_doc * self.slowdown_factor:
+                    self._limit = max(1, self._limit // 2)
+                    logger.info(f"Embedding server slowed down, concurrency limit -> {self._limit}")
+                elif self._limit < self.max_concurrency:
+                    self._limit += 1
+            self._cond.notify_all()
+
+    def _embed_batch(self, texts):
+        for attempt in range(self.max_retries + 1):
+            self._acquire_slot()
+            start = time.perf_counter()
+            try:
+                embeddings = self.embed_model.get_text_embedding_batch(texts)
+            except Exception as e:
+                self._release_slot(failed=True)
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_delay * (2 ** attempt)
+                logger.warning(f"Embedding batch failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            self._release_slot(latency_per_doc=(time.perf_counter() - start) / len(texts))
+            return embeddings
+
+    def embed(self, texts, progress_callback=None):
+        """
+        Returns one embedding per text, in input order.
+        Texts found in the cache are not sent to the embedding model.
+        progress_callback(done, total, docs_per_sec, tokens_per_sec) is called after each batch.
+        """
+        total = len(texts)
+        if total == 0:
+            return []
+
+        cached = self.cache.get_many(texts) if self.cache is not None else {}
+        missing = list(dict.fromkeys(text for text in texts if text not in cached))
+        hits = sum(1 for text in texts if text in cached)
+        if self.cache is not None:
+            logger.info(f"Embedding cache: {hits}/{total} hits, {len(missing)} texts to embed")
+
+        def report(done, n_missing, docs_per_sec, tokens_per_sec):
+            if progress_callback:
+                progress_callback(hits + (total - hits) * done // n_missing, total, docs_per_sec, tokens_per_sec)
+
+        if missing:
+            embeddings = self._embed_uncached(missing, report)
+            if self.cache is not None:
+                self.cache.put_many(missing, embeddings)
+            cached.update(zip(missing, embeddings))
+        elif progress_callback:
+            progress_callback(total, total, 0.0, 0.0)
+
+        return [cached[text] for text in texts]
+
+    def _embed_uncached(self, texts, progress_callback=None):
+        total = len(texts)
+        batches = [texts[i:i + self.batch_size] for i in range(0, total, self.batch_size)]
+        results = [None] * len(batches)
+        done_docs = 0
+        done_tokens = 0
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {executor.submit(self._embed_batch, batch): i for i, batch in enumerate(batches)}
+            for future, i in futures.items():
+                results[i] = future.result()
+                done_docs += len(batches[i])
+                # Rough token estimate (~4 characters per token) for throughput reporting
+                done_tokens += sum(len(text) for text in batches[i]) // 4
+                if progress_callback:
+                    elapsed = max(time.perf_counter() - start, 1e-9)
+                    progress_callback(done_docs, total, done_docs / elapsed, done_tokens / elapsed)
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Embedded {total} texts in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.1f} docs/s)")
+        return [embedding for batch in results for embedding in batch]
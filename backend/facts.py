@@ -0,0 +1,379 @@
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+from loguru import logger
+from .config import Config
+from .columnar import parse_dates
+
+# Columns the facts are computed from; missing columns only drop the sections that need them
+FACT_COLUMNS = [
+    "POID", "PODate", "SupplierID", "SupplierName", "ItemCategory", "TotalAmount", "OnTimeDelivery%", "QualityScore",
+    "SupplierRiskLevel", "ContractID", "ContractEndDate", "ComplianceStatus",
+]
+
+# Higher is riskier; a supplier's level is the worst one on any of its rows
+_RISK_RANK = {"Low": 1, "Medium": 2, "High": 3}
+
+def _records(df):
+    """DataFrame rows as plain dicts of Python scalars, NaN as None."""
+    return [
+        {key: (None if pd.isna(value) else value.item() if hasattr(value, "item") else value) for key, value in row.items()}
+        for row in df.to_dict("records")
+    ]
+
+def _overview(df, amount, dates):
+    overview = {"rows": len(df)}
+    if amount is not None:
+        overview["total_spend"] = float(amount.sum())
+    if "POID" in df.columns:
+        overview["purchase_orders"] = int(df["POID"].nunique())
+    if "SupplierName" in df.columns:
+        overview["suppliers"] = int(df["SupplierName"].nunique())
+    if dates is not None and dates.notna().any():
+        overview["first_po"] = dates.min().strftime("%Y-%m-%d")
+        overview["last_po"] = dates.max().strftime("%Y-%m-%d")
+    return overview
+
+def _spend_by_category(df, amount):
+    grouped = amount.groupby(df["ItemCategory"].astype(str)).agg(spend="sum", orders="count")
+    grouped = grouped.sort_values("spend", ascending=False).reset_index()
+    grouped = grouped.rename(columns={"ItemCategory": "category"})
+    total = grouped["spend"].sum()
+    grouped["share"] = grouped["spend"] / total if total else 0.0
+    return _records(grouped)
+
+def _spend_by_period(amount, dates, freq):
+    periods = dates.dt.to_period(freq)
+    grouped = amount.groupby(periods).agg(spend="sum", orders="count").sort_index()
+    grouped.index = grouped.index.astype(str)
+    return _records(grouped.rename_axis("period").reset_index())
+
+def _supplier_scorecards(df, amount):
+    """One row per supplier with spend, order count, mean delivery/quality and worst risk level."""
+    frame = pd.DataFrame({"supplier": df["SupplierName"].astype(str)})
+    aggregations = {"orders": ("supplier", "size")}
+    if amount is not None:
+        frame["spend"] = amount
+        aggregations["spend"] = ("spend", "sum")
+    for column, name in (("OnTimeDelivery%", "on_time"), ("QualityScore", "quality")):
+        if column in df.columns:
+            frame[name] = pd.to_numeric(df[column], errors="coerce")
+            aggregations[name] = (name, "mean")
+    if "SupplierRiskLevel" in df.columns:
+        frame["risk_rank"] = df["SupplierRiskLevel"].astype(str).map(_RISK_RANK)
+        aggregations["risk_rank"] = ("risk_rank", "max")
+    scorecards = frame.groupby("supplier").agg(**aggregations)
+    if "risk_rank" in scorecards.columns:
+        levels = {rank: level for level, rank in _RISK_RANK.items()}
+        scorecards["risk"] = scorecards.pop("risk_rank").map(levels)
+    return scorecards.sort_values("spend" if "spend" in scorecards.columns else "orders", ascending=False)
+
+def _risk(df, amount, scorecards, top_n):
+    levels = df["SupplierRiskLevel"].astype(str)
+    risk = {
+        "rows_by_level": {level: int(count) for level, count in levels.value_counts().items()},
+        "suppliers_by_level": {},
+        "high_risk_suppliers": [],
+    }
+    if scorecards is not None and "risk" in scorecards.columns:
+        risk["suppliers_by_level"] = {level: int(count) for level, count in scorecards["risk"].value_counts().items()}
+        high = scorecards[scorecards["risk"] == "High"].head(top_n)
+        risk["high_risk_suppliers"] = _records(high.reset_index())
+    if amount is not None:
+        risk["spend_by_level"] = {level: float(spend) for level, spend in amount.groupby(levels).sum().items()}
+    return risk
+
+def _contracts(df, today, top_n):
+    ends = pd.DataFrame({
+        "contract": df["ContractID"].astype(str),
+        "end": parse_dates(df["ContractEndDate"]),
+    })
+    if "SupplierName" in df.columns:
+        ends["supplier"] = df["SupplierName"].astype(str)
+    # One row per contract: its latest end date
+    ends = ends.dropna(subset=["end"]).sort_values("end").drop_duplicates("contract", keep="last")
+    days = (ends["end"] - today).dt.days
+    ends = ends.assign(days_left=days, end=ends["end"].dt.strftime("%Y-%m-%d"))
+    upcoming = ends[ends["days_left"] >= 0].sort_values("days_left")
+    return {
+        "contracts": len(ends),
+        "expired": int((days < 0).sum()),
+        "expiring_30_days": int(((days >= 0) & (days <= 30)).sum()),
+        "expiring_90_days": int(((days >= 0) & (days <= 90)).sum()),
+        "next_expiring": _records(upcoming.head(top_n)),
+    }
+
+def _compliance(df, amount, top_n):
+    status = df["ComplianceStatus"].astype(str)
+    compliance = {"rows_by_status": {key: int(count) for key, count in status.value_counts().items()}}
+    violations = status.str.lower() != "compliant"
+    if amount is not None:
+        compliance["non_compliant_spend"] = float(amount[violations].sum())
+    if "SupplierName" in df.columns:
+        counts = df.loc[violations, "SupplierName"].astype(str).value_counts().head(top_n)
+        compliance["most_non_compliant_suppliers"] = [
+            {"supplier": supplier, "rows": int(count)} for supplier, count in counts.items()
+        ]
+    return compliance
+
+def compute_facts(df, today=None, top_n=10):
+    """
+    Computes aggregate facts over a procurement DataFrame with vectorized pandas
+    operations: overview, spend by category, month and year, supplier scorecards,
+    risk counts, contract expiries and compliance counts. Sections whose
+    columns are missing are left out. Returns plain dicts and lists; long lists
+    are cut to top_n entries.
+    """
+    today = pd.Timestamp(today if today is not None else pd.Timestamp.now()).normalize()
+    columns = set(df.columns)
+    amount = pd.to_numeric(df["TotalAmount"], errors="coerce").fillna(0.0) if "TotalAmount" in columns else None
+    dates = parse_dates(df["PODate"]) if "PODate" in columns else None
+
+    facts = {"overview": _overview(df, amount, dates)}
+    if amount is not None and "ItemCategory" in columns:
+        facts["spend_by_category"] = _spend_by_category(df, amount)[:top_n]
+    if amount is not None and dates is not None:
+        facts["spend_by_month"] = _spend_by_period(amount, dates, "M")
+        facts["spend_by_year"] = _spend_by_period(amount, dates, "Y")
+    scorecards = None
+    if "SupplierName" in columns:
+        scorecards = _supplier_scorecards(df, amount)
+        facts["top_suppliers"] = _records(scorecards.head(top_n).reset_index())
+        if "on_time" in scorecards.columns:
+            worst = scorecards.dropna(subset=["on_time"]).sort_values("on_time").head(top_n)
+            facts["least_on_time_suppliers"] = _records(worst.reset_index())
+    if "SupplierRiskLevel" in columns:
+        facts["risk"] = _risk(df, amount, scorecards, top_n)
+    if "ContractID" in columns and "ContractEndDate" in columns:
+        facts["contracts"] = _contracts(df, today, top_n)
+    if "ComplianceStatus" in columns:
+        facts["compliance"] = _compliance(df, amount, top_n)
+    facts["as_of"] = today.strftime("%Y-%m-%d")
+    return facts
+
+# --- Fact sheets ---
+
+def _money(value):
+    return f"${value:,.2f}"
+
+def _supplier_line(card):
+    parts = [card["supplier"]]
+    if card.get("spend") is not None:
+        parts.append(_money(card["spend"]))
+    parts.append(f"{card['orders']} orders")
+    if card.get("on_time") is not None:
+        parts.append(f"on-time {card['on_time']:.1f}%")
+    if card.get("quality") is not None:
+        parts.append(f"quality {card['quality']:.1f}")
+    if card.get("risk"):
+        parts.append(f"risk {card['risk']}")
+    return "- " + ", ".join(parts)
+
+def _render_overview(facts):
+    overview = facts["overview"]
+    parts = [f"{overview['rows']:,} rows"]
+    if "purchase_orders" in overview:
+        parts.append(f"{overview['purchase_orders']:,} POs")
+    if "suppliers" in overview:
+        parts.append(f"{overview['suppliers']:,} suppliers")
+    if "total_spend" in overview:
+        parts.append(f"total spend {_money(overview['total_spend'])}")
+    if "first_po" in overview:
+        parts.append(f"PO dates {overview['first_po']} to {overview['last_po']}")
+    return ["Overview: " + ", ".join(parts)]
+
+def _render_spend(facts):
+    lines = []
+    if "spend_by_category" in facts:
+        lines.append("Spend by category:")
+        lines += [
+            f"- {row['category']}: {_money(row['spend'])} ({row['share']:.0%}, {row['orders']} orders)"
+            for row in facts["spend_by_category"]
+        ]
+    if "spend_by_year" in facts:
+        lines.append("Spend by year: " + "; ".join(f"{row['period']} {_money(row['spend'])}" for row in facts["spend_by_year"]))
+    if "spend_by_month" in facts:
+        # The most recent year of months keeps the sheet short
+        months = facts["spend_by_month"][-12:]
+        lines.append("Spend by month: " + "; ".join(f"{row['period']} {_money(row['spend'])}" for row in months))
+    return lines
+
+def _render_suppliers(facts):
+    lines = []
+    if "top_suppliers" in facts:
+        lines.append("Top suppliers by spend:")
+        lines += [_supplier_line(card) for card in facts["top_suppliers"]]
+    if "least_on_time_suppliers" in facts:
+        lines.append("Least on-time suppliers:")
+        lines += [_supplier_line(card) for card in facts["least_on_time_suppliers"]]
+    return lines
+
+def _render_risk(facts):
+    if "risk" not in facts:
+        return []
+    risk = facts["risk"]
+    lines = ["Rows by risk level: " + ", ".join(f"{level} {count:,}" for level, count in risk["rows_by_level"].items())]
+    if risk["suppliers_by_level"]:
+        lines.append("Suppliers by worst risk level: " + ", ".join(
+            f"{level} {count:,}" for level, count in risk["suppliers_by_level"].items()
+        ))
+    if risk.get("spend_by_level"):
+        lines.append("Spend by risk level: " + ", ".join(
+            f"{level} {_money(spend)}" for level, spend in risk["spend_by_level"].items()
+        ))
+    if risk["high_risk_suppliers"]:
+        lines.append("High-risk suppliers:")
+        lines += [_supplier_line(card) for card in risk["high_risk_suppliers"]]
+    return lines
+
+def _render_contracts(facts):
+    if "contracts" not in facts:
+        return []
+    contracts = facts["contracts"]
+    lines = [
+        f"Contracts as of {facts['as_of']}: {contracts['contracts']:,} total, {contracts['expired']:,} expired, "
+        f"{contracts['expiring_30_days']:,} expiring within 30 days, {contracts['expiring_90_days']:,} within 90 days"
+    ]
+    if contracts["next_expiring"]:
+        lines.append("Next expiring contracts:")
+        lines += [
+            f"- {row['contract']} ({row.get('supplier') or 'unknown supplier'}): ends {row['end']}, {row['days_left']} days left"
+            for row in contracts["next_expiring"]
+        ]
+    return lines
+
+def _render_compliance(facts):
+    if "compliance" not in facts:
+        return []
+    compliance = facts["compliance"]
+    lines = ["Rows by compliance status: " + ", ".join(
+        f"{status} {count:,}" for status, count in compliance["rows_by_status"].items()
+    )]
+    if "non_compliant_spend" in compliance:
+        lines.append(f"Non-compliant spend: {_money(compliance['non_compliant_spend'])}")
+    if compliance.get("most_non_compliant_suppliers"):
+        lines.append("Suppliers with most non-compliant rows: " + ", ".join(
+            f"{row['supplier']} ({row['rows']})" for row in compliance["most_non_compliant_suppliers"]
+        ))
+    return lines
+
+FACT_SECTIONS = {
+    "overview": _render_overview,
+    "spend": _render_spend,
+    "suppliers": _render_suppliers,
+    "risk": _render_risk,
+    "contracts": _render_contracts,
+    "compliance": _render_compliance,
+}
+
+def render_fact_sheet(facts, sections=None):
+    """Compact plain-text rendering of the given sections (all by default) of compute_facts output."""
+    lines = []
+    for section in sections or FACT_SECTIONS:
+        lines += FACT_SECTIONS[section](facts)
+    return "\n".join(lines)
+
+# --- Facts over the stored files ---
+
+# Row filters of agents' retrieval (see agents.FILTER_FIELDS) and the column each applies to;
+# "source" selects whole files
+_FILTER_COLUMNS = {
+    "supplier_id": "SupplierID", "supplier_name": "SupplierName",
+    "item_category": "ItemCategory", "risk_level": "SupplierRiskLevel",
+}
+
+# Fact sets kept, one per day, set of file versions and filters
+_MAX_CACHED_FACTS = 32
+
+_facts_cache = None
+_facts_lock = threading.Lock()
+
+def _filter_values(value):
+    return [str(item) for item in (value if isinstance(value, (list, tuple)) else [value])]
+
+def _filter_rows(df, filters):
+    """Rows of df matching the row filters; none when a filtered column is missing."""
+    mask = pd.Series(True, index=df.index)
+    for field, value in filters.items():
+        column = _FILTER_COLUMNS.get(field)
+        if column is None:
+            continue
+        if column not in df.columns:
+            return df.iloc[:0]
+        mask &= df[column].astype(str).isin(_filter_values(value))
+    return df if mask.all() else df[mask]
+
+def _load_frames(client, files):
+    from .frame_cache import get_dataframe_cache
+    cache = get_dataframe_cache()
+    frames = []
+    for info in files:
+        df = cache.get(info["name"], info["etag"], FACT_COLUMNS)
+        if df is None:
+            df = client.read_dataframe(info["name"], columns=FACT_COLUMNS)
+            if df is None:
+                continue
+            cache.put(info["name"], info["etag"], df, FACT_COLUMNS)
+        frames.append(df)
+    return frames
+
+def get_facts(filters=None):
+    """
+    Facts over every stored file, or None when there are none. With filters
+    ({field: value or list of values}, as the agents retrieve with), only files
+    named by "source" and rows matching the other fields are counted; None when
+    nothing matches. Results are cached per day, set of file versions (name,
+    ETag) and filters, so they are recomputed only after a file is uploaded,
+    replaced or deleted, or on a new day.
+    """
+    global _facts_cache
+    from .database import get_minio_client
+    filters = filters or {}
+    client = get_minio_client()
+    files = sorted(client.list_files_info(), key=lambda info: info["name"])
+    if "source" in filters:
+        sources = set(_filter_values(filters["source"]))
+        files = [info for info in files if info["name"] in sources]
+    if not files:
+        return None
+    # Contract expiries are relative to today, so facts also expire daily
+    key = (
+        time.strftime("%Y-%m-%d"),
+        tuple((info["name"], info["etag"]) for info in files),
+        tuple(sorted((field, tuple(_filter_values(value))) for field, value in filters.items())),
+    )
+
+    with _facts_lock:
+        if _facts_cache is None:
+            _facts_cache = OrderedDict()
+        if key in _facts_cache:
+            _facts_cache.move_to_end(key)
+            return _facts_cache[key]
+        start = time.time()
+        frames = [_filter_rows(df, filters) for df in _load_frames(client, files)]
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            return None
+        # Categories differ between files; concat falls back to plain values
+        facts = compute_facts(pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0])
+        _facts_cache[key] = facts
+        while len(_facts_cache) > _MAX_CACHED_FACTS:
+            _facts_cache.popitem(last=False)
+        logger.info(f"Computed facts for {len(files)} files ({facts['overview']['rows']:,} rows) in {time.time() - start:.2f}s")
+        return facts
+
+def get_fact_sheet(sections=None, filters=None):
+    """
+    Fact sheet text for the given sections over the stored data matching
+    filters (see get_facts), or "" when facts are disabled, nothing matches or
+    the data cannot be read.
+    """
+    if not Config.AGENT_FACTS_ENABLED:
+        return ""
+    try:
+        facts = get_facts(filters)
+    except Exception as e:
+        logger.warning(f"Facts unavailable: {e}")
+        return ""
+    return render_fact_sheet(facts, sections) if facts else ""
@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+from loguru import logger
+from .config import Config
+
+class DataFrameCache:
+    """
+    In-process LRU cache of parsed DataFrames keyed by (object name, ETag).
+
+    Entries for the same object are keyed by the columns they hold (None for
+    all columns); a full frame also serves any column subset. The total
+    in-memory size is kept under max_bytes by evicting least recently used
+    entries. Cached frames are shared between callers and must not be modified.
+    """
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes if max_bytes is not None else Config.DATAFRAME_CACHE_MAX_MB * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _columns_key(columns):
+        return None if columns is None else tuple(sorted(columns))
+
+    def get(self, object_name, etag, columns=None):
+        columns_key = self._columns_key(columns)
+        with self._lock:
+            for key in ((object_name, etag, columns_key), (object_name, etag, None)):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    df, _ = self._entries[key]
+                    self.hits += 1
+                    if key[2] is None and columns_key is not None:
+                        return df[[column for column in columns if column in df.columns]]
+                    return df
+            self.misses += 1
+            return None
+
+    def put(self, object_name, etag, df, columns=None):
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            logger.info(f"Not caching {object_name}: {size / 1024 / 1024:.1f} MB exceeds the cache budget")
+            return
+        key = (object_name, etag, self._columns_key(columns))
+        with self._lock:
+            # Entries for older versions of the object are stale
+            for stale in [k for k in self._entries if k[0] == object_name and k[1] != etag]:
+                self._remove(stale)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (df, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted, _ = next(iter(self._entries.items()))
+                self._remove(evicted)
+                logger.debug(f"DataFrame cache evicted {evicted[0]}")
+
+    def invalidate(self, object_name):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == object_name]:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+_dataframe_cache = None
+
+def get_dataframe_cache():
+    """Returns the process-wide DataFrame cache."""
+    global _dataframe_cache
+    if _dataframe_cache is None:
+        _dataframe_cache = DataFrameCache()
+    return _dataframe_cache
+
+def read_cached_dataframe(object_name, columns=None):
+    """
+    Loads a stored file as a typed DataFrame through the process-wide cache,
+    keyed by the object's current ETag. Returns None if the file does not exist.
+    The frame may be shared with other callers and must not be modified in place.
+    """
+    from .database import get_minio_client
+    client = get_minio_client()
+    etag = client.get_etag(object_name)
+    if etag is None:
+        return None
+    cache = get_dataframe_cache()
+    df = cache.get(object_name, etag, columns)
+    if df is None:
+        df = client.read_dataframe(object_name, columns=columns)
+        if df is not None:
+            cache.put(object_name, etag, df, columns)
+    return df
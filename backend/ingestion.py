@@ -1,85 +1,430 @@
 import pandas as pd
 import io
+import hashlib
+import tempfile
 from loguru import logger
-from llama_index.core import Document, VectorStoreIndex
-from .database import MinioClient, get_vector_store
+from llama_index.core import Document
+from llama_index.core.schema import MetadataMode
+from .database import get_minio_client, get_source_rows, upsert_documents, delete_documents
+from .embedding import BatchedEmbedder, get_embedding_cache
+from .pipeline import Pipeline, QueueReader
+from .checkpoints import get_checkpoint_store
+from .frame_cache import get_dataframe_cache
+from .columnar import ParquetCopyWriter, parquet_object_name, manifest_metadata, numeric_columns
+from .rollups import RollupAccumulator
+from .keyword_index import get_keyword_index
+from .key_index import get_key_index
+from .config import Config
 from .llm import init_llm
 
+# Text template for one row, in (label, column, default) order as rendered below.
+_ROW_TEXT_LAYOUT = (
+    ("Supplier: ", "SupplierName", "N/A"), (" (ID: ", "SupplierID", "N/A"),
+    (")\nItem: ", "ItemName", "N/A"), (" (Category: ", "ItemCategory", "N/A"),
+    (")\nPO: ", "POID", "N/A"), (" | Date: ", "PODate", "N/A"),
+    ("\nCost: ", "TotalAmount", "0"), (" ", "Unit", ""), (" | Price: ", "UnitPrice", "0"),
+    ("\nPerformance: Delivery ", "OnTimeDelivery%", "N/A"), ("%, Quality ", "QualityScore", "N/A"),
+    ("\nRisk: ", "SupplierRiskLevel", "Low"), (" - ", "RiskDescription", "None"),
+    ("\nContract: ", "ContractID", "N/A"), (" (Expires: ", "ContractEndDate", "N/A"),
+    (")\nCompliance: ", "ComplianceStatus", "Unknown"),
+)
+
+def _column_as_str(df, column, default):
+    """
+    Returns a column rendered the way an f-string renders each cell,
+    or the default repeated when the column is missing.
+    """
+    if column in df.columns:
+        return df[column].map(str)
+    return pd.Series(default, index=df.index, dtype=object)
+
+def _row_keys(df, poid_counts=None):
+    """
+    Stable per-row keys: POID plus its occurrence number (POs can span several
+    lines), or the row position when the file has no POID column.
+    poid_counts carries occurrence numbers across chunks of the same file.
+    """
+    if 'POID' in df.columns:
+        poid = df['POID'].map(str)
+        occurrence = poid.groupby(poid).cumcount()
+        if poid_counts is not None:
+            occurrence = occurrence + poid.map(poid_counts).fillna(0).astype(int)
+            for key, count in poid.value_counts().items():
+                poid_counts[key] = poid_counts.get(key, 0) + count
+        return (poid + "#" + occurrence.astype(str)).tolist()
+    return [f"row#{i}" for i in df.index]
+
+def document_id(file_name, row_key, text):
+    """
+    Deterministic node ID from (source file, row key, content hash), so an
+    unchanged row keeps its ID across uploads and a changed row gets a new one.
+    """
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{file_name}\0{row_key}\0{content_hash}".encode("utf-8")).hexdigest()[:32]
+
+def build_documents(df, file_name, poid_counts=None):
+    """
+    Builds one LlamaIndex Document per CSV row using column-wise string operations.
+    Produces the same text and metadata as formatting each row individually.
+    Document IDs are deterministic (see document_id).
+    """
+    text = pd.Series("", index=df.index, dtype=object)
+    for label, column, default in _ROW_TEXT_LAYOUT:
+        text = text + label + _column_as_str(df, column, default)
+
+    metadata_columns = zip(
+        _column_as_str(df, 'SupplierID', ''),
+        _column_as_str(df, 'SupplierName', ''),
+        _column_as_str(df, 'ItemCategory', ''),
+        _column_as_str(df, 'SupplierRiskLevel', ''),
+        df.index,
+    )
+    return [
+        Document(
+            id_=document_id(file_name, row_key, text_chunk),
+            text=text_chunk,
+            # Neither the file name nor the row position changes what a row means, so the
+            # same row in another file or position embeds (and hits the cache) the same
+            excluded_embed_metadata_keys=["source", "row_index"],
+            metadata={
+                "supplier_id": supplier_id,
+                "supplier_name": supplier_name,
+                "item_category": item_category,
+                "risk_level": risk_level,
+                "source": file_name,
+                "row_index": row_index
+            }
+        )
+        for text_chunk, row_key, (supplier_id, supplier_name, item_category, risk_level, row_index)
+        in zip(text.tolist(), _row_keys(df, poid_counts), metadata_columns)
+    ]
+
+def chunk_digest(documents):
+    """Fingerprint of a chunk's content: a digest of its document IDs in order."""
+    return hashlib.sha256("\n".join(doc.id_ for doc in documents).encode("utf-8")).hexdigest()
+
+def read_csv_chunks(stream, chunk_rows):
+    """
+    Parses a CSV stream in DataFrames of chunk_rows rows. Values are kept as the
+    strings in the file (missing ones as NaN): types inferred per chunk could
+    differ between chunks, e.g. 95 in one and 95.0 in another that has a gap,
+    so a row's text would depend on where the chunks fall.
+    """
+    return pd.read_csv(stream, chunksize=chunk_rows, dtype=str)
+
+def _stream_size(stream):
+    """
+    Number of bytes left in a stream from its current position,
+    or -1 when the stream is not seekable.
+    """
+    if not (hasattr(stream, "seekable") and stream.seekable()):
+        return -1
+    position = stream.tell()
+    size = stream.seek(0, io.SEEK_END)
+    stream.seek(position)
+    return size - position
+
 class DataPreprocessingAgent:
     def __init__(self):
-        self.minio_client = MinioClient()
+        self.minio_client = get_minio_client()
+        self.last_stage_timings = {}
         # Ensure LLM settings are initialized
         init_llm()
 
-    def process_csv(self, file_content, file_name, progress_callback=None):
+    def process_csv(self, file_content, file_name, progress_callback=None, chunk_rows=None, upload=True):
         """
-        Ingests a CSV file using LlamaIndex:
-        1. Uploads raw file to MinIO.
-        2. Parses CSV and creates LlamaIndex Documents.
-        3. Indexes them into ChromaDB via VectorStoreIndex.
+        Ingests a CSV file using LlamaIndex as a pipeline of concurrent stages:
+        1. read:   streams the file once, feeding both the upload and the parser.
+        2. upload: stores the raw file in MinIO.
+        3. parse:  reads the CSV in chunks of chunk_rows rows.
+           parquet: writes the chunks to a typed Parquet copy in MinIO.
+        4. build:  turns each chunk into Documents and keeps new/changed rows.
+        5. embed:  embeds the changed Documents.
+        6. write:  upserts them into ChromaDB and the keyword index.
+           rollup: accumulates per-supplier/category/contract/month totals.
+           keys:   indexes row offsets by PO, supplier and contract (see key_index.py).
+        Stages are connected by bounded queues, so memory stays bounded regardless
+        of file size, and a failing stage cancels the others. Once every stage has
+        succeeded, one summary document per rollup group is embedded and written
+        (see rollups.py), and vectors of rows or summaries that are no longer in
+        the file are removed.
+
+        Each written chunk is checkpointed; if a previous run for the same file
+        failed, chunks it already committed are not embedded or written again.
+        upload=False skips the upload stage (the file is already in MinIO).
+
+        file_content may be bytes or a binary file-like object.
         """
-        # 1. Upload to MinIO
-        if progress_callback: progress_callback(0.1, "Uploading to MinIO...")
-        self.minio_client.upload_file(file_name, io.BytesIO(file_content), len(file_content))
+        stream = io.BytesIO(file_content) if isinstance(file_content, (bytes, bytearray)) else file_content
+        chunk_rows = chunk_rows or Config.INGEST_CHUNK_ROWS
+        total_bytes = _stream_size(stream)
 
-        # 2. Parse CSV
-        if progress_callback: progress_callback(0.2, "Parsing CSV...")
+        # Diff baseline: what is already stored for this file
         try:
-            df = pd.read_csv(io.BytesIO(file_content))
-            logger.info(f"Loaded CSV with {len(df)} rows")
+            existing = get_source_rows(file_name)
         except Exception as e:
-            logger.error(f"Error parsing CSV: {e}")
-            return False, "Invalid CSV format"
-
-        # 3. Create LlamaIndex Documents
-        documents = []
-        total_rows = len(df)
-        
-        for index, row in df.iterrows():
-            if progress_callback and index % 10 == 0:
-                progress = 0.2 + (0.5 * (index / total_rows))
-                progress_callback(progress, f"Preparing Documents ({index+1}/{total_rows})...")
-
-            # Create a rich text representation of the row
-            text_chunk = (
-                f"Supplier: {row.get('SupplierName', 'N/A')} (ID: {row.get('SupplierID', 'N/A')})\n"
-                f"Item: {row.get('ItemName', 'N/A')} (Category: {row.get('ItemCategory', 'N/A')})\n"
-                f"PO: {row.get('POID', 'N/A')} | Date: {row.get('PODate', 'N/A')}\n"
-                f"Cost: {row.get('TotalAmount', '0')} {row.get('Unit', '')} | Price: {row.get('UnitPrice', '0')}\n"
-                f"Performance: Delivery {row.get('OnTimeDelivery%', 'N/A')}%, Quality {row.get('QualityScore', 'N/A')}\n"
-                f"Risk: {row.get('SupplierRiskLevel', 'Low')} - {row.get('RiskDescription', 'None')}\n"
-                f"Contract: {row.get('ContractID', 'N/A')} (Expires: {row.get('ContractEndDate', 'N/A')})\n"
-                f"Compliance: {row.get('ComplianceStatus', 'Unknown')}"
-            )
-            
-            # Metadata for filtering
-            metadata = {
-                "supplier_id": str(row.get('SupplierID', '')),
-                "supplier_name": str(row.get('SupplierName', '')),
-                "item_category": str(row.get('ItemCategory', '')),
-                "risk_level": str(row.get('SupplierRiskLevel', '')),
-                "source": file_name,
-                "row_index": index
-            }
-            
-            doc = Document(text=text_chunk, metadata=metadata)
-            documents.append(doc)
+            logger.error(f"Error reading existing vectors: {e}")
+            return False, f"Error indexing documents: {str(e)}"
+
+        checkpoints = get_checkpoint_store()
+        committed = checkpoints.start(file_name, chunk_rows, total_bytes)
+        if committed:
+            logger.info(f"{file_name}: resuming, {len(committed)} chunks already committed")
+
+        if progress_callback: progress_callback(0.05, "Uploading to MinIO and parsing CSV..." if upload else "Parsing CSV...")
+        pipeline = Pipeline(queue_size=Config.INGEST_QUEUE_SIZE)
+        embedder = BatchedEmbedder(cache=get_embedding_cache())
+        upload_queue = pipeline.queue(maxsize=8)
+        parse_queue = pipeline.queue(maxsize=8)
+        build_queue = pipeline.queue()
+        parquet_queue = pipeline.queue()
+        embed_queue = pipeline.queue()
+        write_queue = pipeline.queue()
+        rollup_queue = pipeline.queue()
+        rollups = RollupAccumulator() if Config.INGEST_ROLLUPS_ENABLED else None
+        keyword_index = get_keyword_index()
+        key_index = get_key_index()
+        keys_queue = pipeline.queue()
+        seen_ids = set()
+        totals = {"rows": 0, "parsed": 0, "changed": 0, "resumed_chunks": 0, "summaries": 0}
+
+        def progress(chunk, fraction, text):
+            # chunk["span"] is the (start, end) share of the file the chunk covers
+            chunk_start, chunk_end = chunk["span"]
+            done = chunk_start + (chunk_end - chunk_start) * fraction
+            pipeline.report(0.1 + 0.85 * done, f"Chunk {chunk['number']}: {text}")
+
+        def read():
+            while True:
+                block = stream.read(Config.INGEST_READ_BLOCK_BYTES)
+                if not block:
+                    break
+                if upload:
+                    pipeline.put(upload_queue, block)
+                pipeline.put(parse_queue, block)
+            if upload:
+                pipeline.close(upload_queue)
+            pipeline.close(parse_queue)
+
+        def upload_file():
+            _, reader = QueueReader.buffered(pipeline, upload_queue)
+            self.minio_client.upload_file(file_name, reader, total_bytes)
 
-        # 4. Index into ChromaDB
-        if progress_callback: progress_callback(0.8, "Indexing to Vector DB...")
-        
+        def parse():
+            raw, reader = QueueReader.buffered(pipeline, parse_queue)
+            read_fraction = 0.0
+            number = 0
+            for df in read_csv_chunks(reader, chunk_rows):
+                number += 1
+                # The parser reads ahead, so byte position is an approximation of rows read
+                if total_bytes > 0:
+                    span = (read_fraction, min(raw.bytes_read / total_bytes, 1.0))
+                else:
+                    span = (read_fraction, read_fraction)
+                read_fraction = span[1]
+                totals["parsed"] += len(df)
+                pipeline.put(parquet_queue, df)
+                if rollups is not None:
+                    pipeline.put(rollup_queue, df)
+                if key_index is not None:
+                    pipeline.put(keys_queue, df)
+                pipeline.put(build_queue, {"number": number, "span": span, "df": df})
+            pipeline.close(parquet_queue)
+            if rollups is not None:
+                pipeline.close(rollup_queue)
+            if key_index is not None:
+                pipeline.close(keys_queue)
+            pipeline.close(build_queue)
+
+        def write_parquet():
+            # A derived copy: failures are logged and readers fall back to the CSV
+            parquet_name = parquet_object_name(file_name)
+            if upload:
+                # Drop the previous copy first so a failed rewrite leaves no stale data behind
+                try:
+                    self.minio_client.client.remove_object(self.minio_client.bucket, parquet_name)
+                except Exception as e:
+                    logger.warning(f"Could not remove the old Parquet copy of {file_name}: {e}")
+            with tempfile.TemporaryFile() as sink:
+                writer = ParquetCopyWriter(sink)
+                error = None
+                for df in pipeline.iterate(parquet_queue):
+                    if error is None:
+                        try:
+                            writer.write(numeric_columns(df))
+                        except Exception as e:
+                            error = e
+                if error is None and writer.columns is None:
+                    error = "no data"
+                if error is None:
+                    try:
+                        writer.close()
+                        size = sink.tell()
+                        sink.seek(0)
+                        # Row count and schema ride along as metadata for cheap file listings
+                        self.minio_client.upload_file(
+                            parquet_name, sink, size, metadata=manifest_metadata(writer.rows, writer.columns),
+                            # Already zstd-compressed, and read with byte-range requests
+                            compression="none"
+                        )
+                        logger.info(f"Wrote {parquet_name} ({writer.rows} rows, {size / 1024:.1f} KB)")
+                        return
+                    except Exception as e:
+                        error = e
+                logger.warning(f"Skipping Parquet copy of {file_name}: {error}")
+
+        def rollup():
+            for df in pipeline.iterate(rollup_queue):
+                rollups.add(df)
+
+        def index_keys():
+            key_index.begin(file_name)
+            for df in pipeline.iterate(keys_queue):
+                key_index.add(file_name, df)
+
+        def build():
+            poid_counts = {}
+            for chunk in pipeline.iterate(build_queue):
+                documents = build_documents(chunk.pop("df"), file_name, poid_counts)
+                seen_ids.update(doc.id_ for doc in documents)
+                chunk["rows"] = len(documents)
+                chunk["digest"] = chunk_digest(documents)
+                if committed.get(chunk["number"]) == chunk["digest"]:
+                    # Written by a previous run of this job
+                    chunk["documents"] = []
+                    totals["resumed_chunks"] += 1
+                else:
+                    chunk["documents"] = [doc for doc in documents if existing.get(doc.id_, -1) != doc.metadata["row_index"]]
+                # Also covers rows whose vectors predate the keyword index
+                keyword_ids = keyword_index.existing_ids(doc.id_ for doc in documents) if keyword_index else set()
+                chunk["keyword_documents"] = [] if keyword_index is None else [
+                    doc for doc in documents if doc.id_ not in keyword_ids
+                ]
+                pipeline.put(embed_queue, chunk)
+            pipeline.close(embed_queue)
+
+        def embed():
+            for chunk in pipeline.iterate(embed_queue):
+                self._embed_documents(embedder, chunk["documents"], lambda f, text: progress(chunk, f, text))
+                pipeline.put(write_queue, chunk)
+            pipeline.close(write_queue)
+
+        def write():
+            for chunk in pipeline.iterate(write_queue):
+                upsert_documents(chunk["documents"])
+                if keyword_index is not None:
+                    keyword_index.add(chunk["keyword_documents"])
+                totals["rows"] += chunk["rows"]
+                totals["changed"] += len(chunk["documents"])
+                checkpoints.commit_chunk(file_name, chunk["number"], chunk["digest"], totals["rows"])
+                logger.info(
+                    f"{file_name} chunk {chunk['number']}: {chunk['rows']} rows, {len(chunk['documents'])} new/changed "
+                    f"({totals['rows']} rows so far)"
+                )
+                progress(chunk, 1.0, f"{totals['rows']:,} rows indexed")
+
+        stages = [
+            ("read", read), ("parse", parse), ("parquet", write_parquet),
+            ("build", build), ("embed", embed), ("write", write)
+        ]
+        if upload:
+            stages.insert(1, ("upload", upload_file))
+        if rollups is not None:
+            stages.append(("rollup", rollup))
+        if key_index is not None:
+            stages.append(("keys", index_keys))
+        for name, stage in stages:
+            pipeline.spawn(name, stage)
+        failure = pipeline.wait(progress_callback)
+        self.last_stage_timings = pipeline.timings
+
+        if failure:
+            stage, e = failure
+            if stage == "parse":
+                message = "Invalid CSV format" if totals["parsed"] == 0 else f"Invalid CSV format near row {totals['parsed']}"
+            elif stage in ("read", "upload"):
+                message = f"Error uploading file: {str(e)}"
+            else:
+                message = f"Error indexing documents: {str(e)}"
+            checkpoints.fail(file_name, message)
+            return False, message
+
+        if rollups is not None:
+            if progress_callback: progress_callback(0.96, "Indexing summaries...")
+            try:
+                summaries = rollups.documents(file_name)
+                seen_ids.update(doc.id_ for doc in summaries)
+                # Summary IDs hash their text, so unchanged summaries keep their vectors
+                changed = [doc for doc in summaries if doc.id_ not in existing]
+                self._embed_documents(embedder, changed)
+                upsert_documents(changed)
+                if keyword_index is not None:
+                    keyword_ids = keyword_index.existing_ids(doc.id_ for doc in summaries)
+                    keyword_index.add([doc for doc in summaries if doc.id_ not in keyword_ids])
+                totals["summaries"] = len(summaries)
+                logger.info(f"{file_name}: {len(summaries)} summaries, {len(changed)} new/changed")
+            except Exception as e:
+                logger.error(f"Error indexing summaries: {e}")
+                checkpoints.fail(file_name, f"Error indexing documents: {str(e)}")
+                return False, f"Error indexing documents: {str(e)}"
+
+        # Remove rows that vanished from the file, and switch lookups to its new keys
         try:
-            vector_store, storage_context = get_vector_store()
-            
-            # Create Index (this handles embedding generation automatically)
-            VectorStoreIndex.from_documents(
-                documents, 
-                storage_context=storage_context,
-                show_progress=True
-            )
-            
-            if progress_callback: progress_callback(1.0, "Done!")
-            return True, f"Successfully processed {len(documents)} records."
+            vanished = set(existing) - seen_ids
+            delete_documents(vanished)
+            if keyword_index is not None:
+                keyword_index.delete(vanished)
+            if key_index is not None:
+                key_index.commit(file_name)
         except Exception as e:
-            logger.error(f"Error indexing documents: {e}")
+            logger.error(f"Error removing stale vectors: {e}")
+            checkpoints.fail(file_name, f"Error indexing documents: {str(e)}")
             return False, f"Error indexing documents: {str(e)}"
+        checkpoints.finish(file_name)
+        # Cached frames were read from the previous file or Parquet copy
+        get_dataframe_cache().invalidate(file_name)
+
+        unchanged = totals["rows"] - totals["changed"]
+        logger.info(f"{file_name}: {totals['changed']} new/changed, {unchanged} unchanged, {len(vanished)} removed rows")
+        if progress_callback: progress_callback(1.0, "Done!")
+        resumed = f"; resumed after {totals['resumed_chunks']} committed chunks" if totals["resumed_chunks"] else ""
+        return True, (
+            f"Successfully processed {totals['rows']} records "
+            f"({totals['changed']} updated, {unchanged} unchanged, {len(vanished)} removed{resumed})"
+            + (f" and {totals['summaries']} summaries." if totals["summaries"] else ".")
+        )
+
+    def resume(self, file_name, progress_callback=None):
+        """
+        Resumes an incomplete ingestion job from its last checkpoint,
+        streaming the file back from MinIO.
+        """
+        job = get_checkpoint_store().get_job(file_name)
+        if job is None or job["status"] == "completed":
+            return False, f"No incomplete ingestion job for '{file_name}'"
+
+        stream = self.minio_client.open_file(file_name)
+        if stream is None:
+            return False, f"File '{file_name}' not found in storage"
+        try:
+            return self.process_csv(
+                stream, file_name, progress_callback=progress_callback, chunk_rows=job["chunk_rows"], upload=False
+            )
+        finally:
+            stream.close()
+
+    def _embed_documents(self, embedder, documents, progress_callback=None):
+        """
+        Embeds documents in concurrent batches, setting doc.embedding in place.
+        """
+        def report_embedding(done, total, docs_per_sec, tokens_per_sec):
+            if progress_callback:
+                progress_callback(
+                    done / total,
+                    f"Embedding ({done}/{total}) • {docs_per_sec:.1f} docs/s • {tokens_per_sec:,.0f} tokens/s"
+                )
+
+        texts = [doc.get_content(metadata_mode=MetadataMode.EMBED) for doc in documents]
+        embeddings = embedder.embed(texts, progress_callback=report_embedding)
+        for doc, embedding in zip(documents, embeddings):
+            doc.embedding = embedding
@@ -0,0 +1,129 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from .config import Config
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class IngestionJobQueue:
+    """
+    Runs ingestion jobs on a bounded worker pool so callers (the Streamlit
+    script, MCP tools) submit work and poll its status instead of blocking.
+
+    Jobs are plain dicts (see _new_job) held in memory; at most max_history
+    finished jobs are kept. A file has at most one active job at a time.
+    """
+    def __init__(self, max_workers=None, max_history=100):
+        self.max_workers = max_workers or Config.INGEST_MAX_JOBS
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ingest-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, file_name, content=None, chunk_rows=None, resume=False):
+        """
+        Queues ingestion of file_name and returns its job ID.
+        - content given: ingest (and upload) that data, as bytes or a binary
+          file object. The job takes ownership of a file object and closes it
+          once it has finished.
+        - content None: re-ingest the copy already stored in MinIO.
+        - resume=True: continue an incomplete job from its last checkpoint.
+        If the file already has a queued or running job, that job's ID is returned.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job["file_name"] == file_name and job["status"] in ACTIVE_STATUSES:
+                    _close(content)
+                    return job["id"]
+            job = _new_job(file_name, "resume" if resume else "ingest")
+            self._jobs[job["id"]] = job
+            self._trim_history()
+
+        self._executor.submit(self._run, job["id"], content, chunk_rows, resume)
+        logger.info(f"Queued ingestion job {job['id']} for {file_name}")
+        return job["id"]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self):
+        """All known jobs, most recently submitted first."""
+        with self._lock:
+            return sorted((dict(job) for job in self._jobs.values()), key=lambda job: job["submitted_at"], reverse=True)
+
+    def queue_depth(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job["status"] == "queued")
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, job_id, content, chunk_rows, resume):
+        from .ingestion import DataPreprocessingAgent
+
+        job = self.get(job_id)
+        self._update(job_id, status="running", started_at=time.time(), message="Starting...")
+
+        def report(progress, message):
+            self._update(job_id, progress=progress, message=message)
+
+        try:
+            agent = DataPreprocessingAgent()
+            if resume:
+                success, message = agent.resume(job["file_name"], progress_callback=report)
+            else:
+                # Without new content, re-ingest the stored copy and skip uploading it again
+                upload = content is not None
+                if not upload:
+                    content = agent.minio_client.open_file(job["file_name"])
+                    if content is None:
+                        raise FileNotFoundError(f"File '{job['file_name']}' not found in storage")
+                success, message = agent.process_csv(
+                    content, job["file_name"], progress_callback=report, chunk_rows=chunk_rows, upload=upload
+                )
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {e}")
+            success, message = False, str(e)
+        finally:
+            _close(content)
+
+        fields = {"progress": 1.0} if success else {}
+        self._update(job_id, status="succeeded" if success else "failed", message=message, finished_at=time.time(), **fields)
+        logger.info(f"Ingestion job {job_id} for {job['file_name']} {'succeeded' if success else 'failed'}: {message}")
+
+    def _trim_history(self):
+        finished = [job for job in self._jobs.values() if job["status"] not in ACTIVE_STATUSES]
+        finished.sort(key=lambda job: job["submitted_at"])
+        for job in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job["id"]]
+
+def _close(content):
+    if hasattr(content, "close"):
+        content.close()
+
+def _new_job(file_name, kind):
+    return {
+        "id": uuid.uuid4().hex[:12],
+        "file_name": file_name,
+        "kind": kind,
+        "status": "queued",
+        "progress": 0.0,
+        "message": "Waiting for a free worker...",
+        "submitted_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+    }
+
+_job_queue = None
+
+def get_job_queue():
+    """Returns the process-wide ingestion job queue."""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = IngestionJobQueue()
+    return _job_queue
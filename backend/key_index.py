@@ -0,0 +1,206 @@
+import os
+import re
+import sqlite3
+import threading
+import pandas as pd
+from loguru import logger
+from .config import Config
+
+# Lookup fields and the CSV column each is read from
+KEY_FIELDS = {"po": "POID", "supplier_id": "SupplierID", "supplier_name": "SupplierName", "contract": "ContractID"}
+
+# Fields whose values are identifiers that can be spotted in free text
+ID_FIELDS = ("po", "supplier_id", "contract")
+
+_TOKEN = re.compile(r"[\w-]+")
+
+# A word in free text is only taken for an identifier when it is shaped like one
+# (letters and digits, at least this long) or directly follows a word naming its
+# field ("PO 1001"), so counts and years ("top 5", "in 2024") are never looked up
+_MIN_ID_LENGTH = 4
+_ID_CUES = {"po": ("po", "poid"), "supplier_id": ("supplier", "supplierid", "vendor"), "contract": ("contract", "contractid")}
+
+def normalize_key(value):
+    """Lookups ignore case and surrounding whitespace."""
+    return str(value).strip().casefold()
+
+def _looks_like_id(term):
+    return (
+        len(term) >= _MIN_ID_LENGTH and any(char.isalpha() for char in term) and any(char.isdigit() for char in term)
+    )
+
+def _id_candidates(text, fields=ID_FIELDS):
+    """
+    {word: fields it may be an identifier of} for the words of text that look
+    like identifiers, in the order they are mentioned.
+    """
+    words = [normalize_key(word) for word in _TOKEN.findall(text)]
+    candidates = {}
+    for i, word in enumerate(words):
+        cued = [field for field in fields if i > 0 and words[i - 1] in _ID_CUES.get(field, ())]
+        if cued:
+            candidates.setdefault(word, set()).update(cued)
+        elif _looks_like_id(word):
+            candidates.setdefault(word, set()).update(fields)
+    return candidates
+
+class KeyIndex:
+    """
+    Exact-match index from PO, supplier and contract keys to row offsets in
+    the stored files, backed by an indexed SQLite table.
+
+    A file's keys are written as a pending generation while it is ingested and
+    replace its previous keys only once ingestion succeeds (see begin and commit),
+    so lookups never see a half-indexed file.
+    """
+    def __init__(self, path=None):
+        self.path = path or Config.KEY_INDEX_PATH
+        self._lock = threading.Lock()
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS keys ("
+            "field TEXT NOT NULL, key TEXT NOT NULL, source TEXT NOT NULL, "
+            "row_offset INTEGER NOT NULL, pending INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS keys_lookup ON keys (field, key, pending)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS keys_source ON keys (source, pending)")
+        self._conn.commit()
+
+    def begin(self, source):
+        """Starts a new generation of keys for source, dropping any left by a failed run."""
+        with self._lock:
+            self._conn.execute("DELETE FROM keys WHERE source = ? AND pending = 1", (source,))
+            self._conn.commit()
+
+    def add(self, source, df):
+        """Adds the keys of a chunk of source's rows; df's index holds their row offsets."""
+        rows = []
+        for field, column in KEY_FIELDS.items():
+            if column not in df.columns:
+                continue
+            values = df[column].dropna()
+            keys = values.map(normalize_key)
+            rows.extend((field, key, source, int(offset)) for key, offset in zip(keys, keys.index) if key)
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO keys (field, key, source, row_offset, pending) VALUES (?, ?, ?, ?, 1)", rows
+            )
+            self._conn.commit()
+
+    def commit(self, source):
+        """Makes the pending generation of source's keys the current one."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM keys WHERE source = ? AND pending = 0", (source,))
+                self._conn.execute("UPDATE keys SET pending = 0 WHERE source = ?", (source,))
+
+    def delete_source(self, source):
+        with self._lock:
+            self._conn.execute("DELETE FROM keys WHERE source = ?", (source,))
+            self._conn.commit()
+
+    def lookup(self, field, key, source=None):
+        """Returns {source: [row offsets]} for rows whose field equals key."""
+        sql = "SELECT source, row_offset FROM keys WHERE field = ? AND key = ? AND pending = 0"
+        params = [field, normalize_key(key)]
+        if source:
+            sql += " AND source = ?"
+            params.append(source)
+        offsets = {}
+        with self._lock:
+            for row_source, offset in self._conn.execute(sql + " ORDER BY source, row_offset", params):
+                offsets.setdefault(row_source, []).append(offset)
+        return offsets
+
+    def detect(self, text, fields=ID_FIELDS):
+        """
+        Returns the (field, key) pairs of indexed identifiers mentioned in text
+        (see _id_candidates).
+        """
+        candidates = _id_candidates(text, fields)
+        if not candidates:
+            return []
+        terms = list(candidates)
+        sql = (
+            f"SELECT DISTINCT field, key FROM keys WHERE pending = 0 "
+            f"AND field IN ({', '.join('?' * len(fields))}) AND key IN ({', '.join('?' * len(terms))})"
+        )
+        with self._lock:
+            found = {(field, key) for field, key in self._conn.execute(sql, list(fields) + terms) if field in candidates[key]}
+        # In the order they are mentioned
+        return sorted(found, key=lambda item: terms.index(item[1]))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM keys WHERE pending = 0").fetchone()[0]
+
+def find_rows(field, key, source=None, limit=None):
+    """
+    Returns (total matching rows, [(source, DataFrame of rows)]) for rows whose
+    field equals key, reading at most limit rows from storage. Each frame is
+    indexed by row offset. Finds nothing when the index is disabled.
+    """
+    from .database import get_minio_client
+    key_index = get_key_index()
+    if key_index is None:
+        return 0, []
+    offsets = key_index.lookup(field, key, source)
+    total = sum(len(rows) for rows in offsets.values())
+    client = get_minio_client()
+    frames = []
+    remaining = limit if limit is not None else total
+    for row_source, rows in offsets.items():
+        if remaining <= 0:
+            break
+        df = client.read_rows(row_source, rows[:remaining])
+        if df is not None and not df.empty:
+            frames.append((row_source, df))
+            remaining -= len(df)
+    return total, frames
+
+def plain_frame(df):
+    """Rows with dates back in their YYYY-MM-DD CSV form, for rendering as text."""
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime("%Y-%m-%d").astype(object).where(df[column].notna())
+        elif isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+    return df
+
+def mentioned_keys(text):
+    """
+    Identifiers from the key index mentioned in text, or [] when the index is
+    disabled or unavailable.
+    """
+    key_index = get_key_index()
+    if key_index is None:
+        return []
+    try:
+        return key_index.detect(text)
+    except Exception as e:
+        logger.warning(f"Key index lookup failed: {e}")
+        return []
+
+_key_index = None
+_key_index_lock = threading.Lock()
+
+def get_key_index():
+    """
+    Returns the process-wide key index, or None when it is disabled.
+    """
+    global _key_index
+    if not Config.KEY_INDEX_ENABLED:
+        return None
+    if _key_index is None:
+        with _key_index_lock:
+            if _key_index is None:
+                _key_index = KeyIndex()
+                logger.info(f"Opened key index at {_key_index.path}")
+    return _key_index
@@ -0,0 +1,151 @@
+import os
+import re
+import sqlite3
+import threading
+from loguru import logger
+from .config import Config
+
+# Hyphens and underscores stay inside tokens, so IDs like PO-2024-0193 match as one term
+_TOKEN = re.compile(r"[\w-]+")
+
+# Matches scoring under this share of the best match only share terms that
+# occur almost everywhere ("of", "supplier") and are dropped
+_MIN_RELATIVE_SCORE = 0.01
+
+def _match_expression(query):
+    """FTS5 query matching any term of query, with every term quoted so no syntax is interpreted."""
+    terms = dict.fromkeys(term.lower() for term in _TOKEN.findall(query))
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+class KeywordIndex:
+    """
+    BM25 keyword index over ingested documents, backed by a SQLite FTS5 table.
+
+    Complements vector search for exact terms such as PO, contract and supplier
+    IDs, which dense embeddings match poorly. Documents are keyed by the same
+    node IDs as their vectors.
+    """
+    def __init__(self, path=None):
+        self.path = path or Config.KEYWORD_INDEX_PATH
+        self._lock = threading.Lock()
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5("
+            "node_id UNINDEXED, source UNINDEXED, doc_level UNINDEXED, text, "
+            "tokenize = \"unicode61 tokenchars '-_'\")"
+        )
+        self._conn.commit()
+
+    def add(self, documents):
+        """Indexes documents, replacing any already stored under the same IDs."""
+        if not documents:
+            return
+        with self._lock:
+            self._delete([doc.id_ for doc in documents])
+            self._conn.executemany(
+                "INSERT INTO documents (node_id, source, doc_level, text) VALUES (?, ?, ?, ?)",
+                [
+                    (doc.id_, doc.metadata.get("source", ""), doc.metadata.get("doc_level", "row"), doc.text)
+                    for doc in documents
+                ]
+            )
+            self._conn.commit()
+
+    def delete(self, node_ids):
+        if not node_ids:
+            return
+        with self._lock:
+            self._delete(list(node_ids))
+            self._conn.commit()
+
+    def delete_source(self, source):
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE source = ?", (source,))
+            self._conn.commit()
+
+    def _delete(self, node_ids):
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(node_ids), 500):
+            batch = node_ids[start:start + 500]
+            self._conn.execute(
+                f"DELETE FROM documents WHERE node_id IN ({', '.join('?' * len(batch))})", batch
+            )
+
+    def existing_ids(self, node_ids):
+        """The subset of node_ids that are indexed."""
+        node_ids = list(node_ids)
+        found = set()
+        with self._lock:
+            for start in range(0, len(node_ids), 500):
+                batch = node_ids[start:start + 500]
+                found.update(row[0] for row in self._conn.execute(
+                    f"SELECT node_id FROM documents WHERE node_id IN ({', '.join('?' * len(batch))})", batch
+                ))
+        return found
+
+    def search(self, query, limit=10, doc_levels=None, sources=None):
+        """
+        Returns up to limit (node_id, score) pairs, best first, for documents
+        matching any term of query. Scores are BM25 (higher is better). With
+        doc_levels, only documents of those levels ("row" for row documents) match;
+        with sources (a file name or list of them), only documents of those files.
+        Matches far weaker than the best one are dropped.
+        """
+        expression = _match_expression(query)
+        if not expression:
+            return []
+        sql = "SELECT node_id, bm25(documents) FROM documents WHERE documents MATCH ?"
+        params = [expression]
+        if doc_levels:
+            sql += f" AND doc_level IN ({', '.join('?' * len(doc_levels))})"
+            params += list(doc_levels)
+        if sources:
+            sources = [sources] if isinstance(sources, str) else list(sources)
+            sql += f" AND source IN ({', '.join('?' * len(sources))})"
+            params += sources
+        # bm25() is lower for better matches
+        sql += " ORDER BY bm25(documents) LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            results = [(node_id, -score) for node_id, score in self._conn.execute(sql, params)]
+        if not results:
+            return []
+        cutoff = results[0][1] * _MIN_RELATIVE_SCORE
+        return [(node_id, score) for node_id, score in results if score >= cutoff]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuses ranked lists of IDs by reciprocal rank: each ID scores the sum of
+    1 / (k + rank) over the lists it appears in. Returns [(id, score)], best
+    first, with ties in the order the IDs first appear in rankings.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, node_id in enumerate(ranking, start=1):
+            scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+_keyword_index = None
+_keyword_index_lock = threading.Lock()
+
+def get_keyword_index():
+    """
+    Returns the process-wide keyword index, or None when hybrid retrieval is disabled.
+    """
+    global _keyword_index
+    if not Config.HYBRID_RETRIEVAL_ENABLED:
+        return None
+    if _keyword_index is None:
+        with _keyword_index_lock:
+            if _keyword_index is None:
+                _keyword_index = KeywordIndex()
+                logger.info(f"Opened keyword index at {_keyword_index.path}")
+    return _keyword_index
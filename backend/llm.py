@@ -1,11 +1,188 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from llama_index.llms.ollama import Ollama
 from llama_index.embeddings.ollama import OllamaEmbedding
 from llama_index.core import Settings
+from llama_index.core.llms import ChatMessage, ChatResponse
 from loguru import logger
 from .config import Config
+from .response_cache import get_response_cache, response_cache_bypassed
 
 _is_initialized = False
 
+# Lower values are served first
+PRIORITIES = {"interactive": 0, "normal": 1, "batch": 2}
+
+_priority = ContextVar("llm_priority", default="normal")
+
+@contextmanager
+def llm_priority(priority):
+    """LLM calls made inside this block (in this thread) wait in the scheduler with this priority."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority '{priority}', expected one of {', '.join(PRIORITIES)}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+class LLMScheduler:
+    """
+    Process-wide gate in front of the LLM server: at most max_concurrency
+    generations run at once. Waiting calls are served by priority (interactive
+    before normal before batch), then in arrival order.
+    """
+    def __init__(self, max_concurrency=None):
+        self.max_concurrency = max_concurrency or Config.LLM_MAX_CONCURRENCY
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._stats = {priority: {"calls": 0, "wait_total": 0.0, "wait_max": 0.0} for priority in PRIORITIES}
+
+    def acquire(self, priority=None):
+        priority = priority or _priority.get()
+        entry = (PRIORITIES[priority], next(self._sequence))
+        start = time.perf_counter()
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            while self._waiting[0] != entry or self._running >= self.max_concurrency:
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._running += 1
+            # The next waiter may also fit under the cap
+            self._cond.notify_all()
+            waited = time.perf_counter() - start
+            stats = self._stats[priority]
+            stats["calls"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+        if waited > 1:
+            logger.info(f"LLM call ({priority}) waited {waited:.1f}s for a free slot")
+
+    def release(self):
+        with self._cond:
+            self._running -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=None):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        """Queue depth, running calls, and per-priority call counts and wait times."""
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "queue_depth": len(self._waiting),
+                "priorities": {
+                    priority: {
+                        "calls": stats["calls"],
+                        "wait_avg": stats["wait_total"] / stats["calls"] if stats["calls"] else 0.0,
+                        "wait_max": stats["wait_max"],
+                    }
+                    for priority, stats in self._stats.items()
+                },
+            }
+
+_llm_scheduler = None
+_llm_scheduler_lock = threading.Lock()
+
+def get_llm_scheduler():
+    """Returns the process-wide LLM scheduler."""
+    global _llm_scheduler
+    if _llm_scheduler is None:
+        with _llm_scheduler_lock:
+            if _llm_scheduler is None:
+                _llm_scheduler = LLMScheduler()
+    return _llm_scheduler
+
+class CachedOllama(Ollama):
+    """
+    Ollama LLM that answers repeated chat/complete calls from the persistent
+    response cache (see response_cache.py). The cache key covers the model,
+    its generation options and every message, so a different template, query
+    or retrieved context is a different entry. Streamed answers are cached once
+    the stream completes; a cached answer is streamed back as a single chunk.
+
+    Calls that reach Ollama go through the process-wide LLMScheduler; a stream
+    holds its slot until it is exhausted or closed.
+    """
+    def _scheduled_chat(self, messages, **kwargs):
+        with get_llm_scheduler().slot():
+            return super().chat(messages, **kwargs)
+
+    def _scheduled_stream_chat(self, messages, **kwargs):
+        # Acquired on first iteration, in the thread that consumes the stream, and
+        # released when the stream is exhausted, fails or is closed (GeneratorExit)
+        scheduler = get_llm_scheduler()
+        scheduler.acquire()
+        stream = None
+        try:
+            stream = super().stream_chat(messages, **kwargs)
+            yield from stream
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            scheduler.release()
+
+    def _cache_key(self, cache, messages, kwargs):
+        return cache.key(
+            self.model,
+            {"options": self._model_kwargs, "json_mode": self.json_mode, "kwargs": kwargs},
+            [(message.role.value, message.content) for message in messages]
+        )
+
+    def stream_chat(self, messages, **kwargs):
+        cache = get_response_cache()
+        if cache is None or response_cache_bypassed():
+            return self._scheduled_stream_chat(messages, **kwargs)
+
+        key = self._cache_key(cache, messages, kwargs)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"LLM response cache hit ({self.model})")
+            message = ChatMessage(role=cached["role"], content=cached["content"])
+            return iter([ChatResponse(message=message, delta=cached["content"])])
+
+        def gen():
+            response = None
+            stream = self._scheduled_stream_chat(messages, **kwargs)
+            try:
+                for response in stream:
+                    yield response
+            finally:
+                stream.close()
+            # Only complete answers are stored
+            if response is not None:
+                cache.put(key, {"role": response.message.role.value, "content": response.message.content})
+        return gen()
+
+    def chat(self, messages, **kwargs) -> ChatResponse:
+        cache = get_response_cache()
+        if cache is None or response_cache_bypassed():
+            return self._scheduled_chat(messages, **kwargs)
+
+        key = self._cache_key(cache, messages, kwargs)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"LLM response cache hit ({self.model})")
+            return ChatResponse(message=ChatMessage(role=cached["role"], content=cached["content"]))
+
+        response = self._scheduled_chat(messages, **kwargs)
+        cache.put(key, {"role": response.message.role.value, "content": response.message.content})
+        return response
+
 def init_llm():
     """
     Configures the global LlamaIndex Settings with Ollama models.
@@ -18,7 +195,7 @@ def init_llm():
     try:
         logger.info(f"Initializing LlamaIndex with LLM={Config.LLM_MODEL} and Embed={Config.EMBEDDING_MODEL}")
         
-        Settings.llm = Ollama(
+        Settings.llm = CachedOllama(
             model=Config.LLM_MODEL, 
             base_url=Config.OLLAMA_BASE_URL,
             request_timeout=300.0,
@@ -27,7 +204,8 @@ def init_llm():
         
         Settings.embed_model = OllamaEmbedding(
             model_name=Config.EMBEDDING_MODEL,
-            base_url=Config.OLLAMA_BASE_URL
+            base_url=Config.OLLAMA_BASE_URL,
+            embed_batch_size=Config.EMBED_BATCH_SIZE
         )
         
         _is_initialized = True
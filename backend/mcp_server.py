@@ -1,5 +1,6 @@
 import sys
 import logging
+import time
 from typing import Optional
 import pandas as pd
 
@@ -13,7 +14,7 @@ logger = logging.getLogger(__name__)
 
 try:
     logger.info("Starting MCP Server...")
-    from mcp.server.fastmcp import FastMCP
+    from mcp.server.fastmcp import FastMCP, Context
     from backend.database import MinioClient
     import chromadb
     from backend.config import Config
@@ -32,23 +33,14 @@ except Exception as e:
 # ============================================================================
 
 def get_minio_client():
-    """Lazy initialization of MinIO client"""
-    from backend.database import MinioClient
-    return MinioClient()
+    """Lazy initialization of the shared MinIO client"""
+    from backend.database import get_minio_client as shared_minio_client
+    return shared_minio_client()
 
-def get_query_engine(similarity_top_k: int = 5):
-    """Get LlamaIndex query engine with proper embeddings"""
-    from llama_index.core import VectorStoreIndex
-    from backend.database import get_vector_store
-    from backend.llm import get_llm, get_embed_model
-    
-    vector_store, storage_context = get_vector_store()
-    index = VectorStoreIndex.from_vector_store(
-        vector_store,
-        storage_context=storage_context,
-        embed_model=get_embed_model()
-    )
-    return index.as_query_engine(llm=get_llm(), similarity_top_k=similarity_top_k)
+def get_query_engine(similarity_top_k: int = 5, filters: Optional[dict] = None):
+    """Get the cached LlamaIndex query engine for the shared index, retrieving only documents matching filters"""
+    from backend.agents import get_query_engine as cached_query_engine
+    return cached_query_engine("query_procurement_data", similarity_top_k=similarity_top_k, filters=filters)
 
 def get_agent(agent_type: str):
     """Get a specific agent instance"""
@@ -71,32 +63,96 @@ def get_agent(agent_type: str):
     
     return agents[agent_type.lower()]()
 
-def get_procurement_dataframe(source_file: Optional[str] = None) -> pd.DataFrame:
+def retrieval_filters(source_file: Optional[str] = None, supplier: Optional[str] = None,
+                      category: Optional[str] = None, risk_level: Optional[str] = None) -> Optional[dict]:
+    """Metadata filters for the agents' retrieval from the optional tool arguments; None when none is set"""
+    from backend.agents import merge_filters
+    risk_levels = [level.strip() for level in risk_level.split(",") if level.strip()] if risk_level else None
+    return merge_filters({
+        "source": source_file or None,
+        "supplier_name": supplier or None,
+        "item_category": category or None,
+        "risk_level": risk_levels[0] if risk_levels and len(risk_levels) == 1 else risk_levels,
+    })
+
+async def run_agent_streaming(agent_type: str, query: str, ctx: Optional[Context] = None,
+                              filters: Optional[dict] = None, exact_lookup: bool = False, fresh: bool = False) -> str:
+    """
+    Run an agent with token streaming in a worker thread, sending the answer so far
+    as MCP progress notifications (at most every 0.5s), and return the full answer.
+    With filters, the agent only retrieves matching documents. With exact_lookup,
+    set for questions from the caller rather than a tool's default prompt, a
+    query naming a PO, supplier or contract ID is answered from its rows. With
+    fresh, the LLM response cache is skipped, so the answer is generated again.
+    """
+    import anyio
+    from contextlib import nullcontext
+    from backend.response_cache import bypass_response_cache
+    agent = await anyio.to_thread.run_sync(get_agent, agent_type)
+    agent.set_scope(filters)
+    agent.exact_lookup = exact_lookup
+    # Worker threads run in a copy of this context, so they see the bypass
+    with bypass_response_cache() if fresh else nullcontext():
+        return await _collect_tokens(agent, query, ctx)
+
+async def _collect_tokens(agent, query: str, ctx: Optional[Context]) -> str:
+    """Streams agent's answer to query, reporting progress to ctx, and returns it."""
+    import anyio
+    tokens = await anyio.to_thread.run_sync(agent.stream, query)
+    parts = []
+    last_sent = 0.0
+    try:
+        while True:
+            token = await anyio.to_thread.run_sync(next, tokens, None)
+            if token is None:
+                break
+            parts.append(token)
+            if ctx is not None and time.time() - last_sent >= 0.5:
+                last_sent = time.time()
+                try:
+                    await ctx.report_progress(len(parts), message="".join(parts)[-500:])
+                except Exception as e:
+                    logger.debug(f"Could not send progress notification: {e}")
+    finally:
+        # A cancelled call stops generating and frees its LLM slot
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(tokens.close)
+    return "".join(parts)
+
+def get_procurement_dataframe(source_file: Optional[str] = None, columns: Optional[list[str]] = None) -> pd.DataFrame:
     """
     Get procurement data as pandas DataFrame from MinIO.
+    Reads the typed Parquet copy when available, loading only `columns` if given.
     
     Behavior:
     - If source_file is provided, load exactly that file.
     - If no source_file:
         - If one file exists, load that.
         - If multiple files exist, raise an error asking to specify source_file.
+
+    Parsed frames are cached in memory by (file, ETag); a stat call per request
+    detects files that changed since they were cached. The returned frame may be
+    shared with other calls and must not be modified in place.
     """
-    import io
+    from backend.frame_cache import get_dataframe_cache
 
     minio_client = get_minio_client()
-    files = minio_client.list_files()
-
-    if not files:
-        raise RuntimeError("No procurement files found in storage. Please upload a CSV file first.")
 
-    # Determine which file to use
-    if source_file:
-        if source_file not in files:
-            raise RuntimeError(f"File '{source_file}' not found. Available files: {', '.join(files)}")
+    # Determine which file to use; a named file only needs a stat call
+    etag = minio_client.get_etag(source_file) if source_file else None
+    if etag is not None:
         target_file = source_file
     else:
+        files = minio_client.list_files()
+
+        if not files:
+            raise RuntimeError("No procurement files found in storage. Please upload a CSV file first.")
+
+        if source_file:
+            raise RuntimeError(f"File '{source_file}' not found. Available files: {', '.join(files)}")
         if len(files) == 1:
             target_file = files[0]
+            etag = minio_client.get_etag(target_file)
         else:
             raise RuntimeError(
                 "Multiple procurement files found. "
@@ -104,16 +160,23 @@ def get_procurement_dataframe(source_file: Optional[str] = None) -> pd.DataFrame
                 f"Available files: {', '.join(files)}"
             )
 
-    content = minio_client.get_file_content(target_file)
-    if not content:
-        raise RuntimeError(f"Could not read content of '{target_file}'.")
+    cache = get_dataframe_cache()
+    if etag is not None:
+        df = cache.get(target_file, etag, columns)
+        if df is not None:
+            logger.debug(f"DataFrame cache hit for {target_file}")
+            return df
 
     try:
-        df = pd.read_csv(io.BytesIO(content))
+        df = minio_client.read_dataframe(target_file, columns=columns)
     except Exception as e:
         logger.error(f"Error parsing CSV '{target_file}': {e}")
         raise RuntimeError(f"Failed to parse CSV file '{target_file}'.") from e
+    if df is None:
+        raise RuntimeError(f"Could not read content of '{target_file}'.")
 
+    if etag is not None:
+        cache.put(target_file, etag, df, columns)
     return df
 
 # ============================================================================
@@ -144,28 +207,128 @@ def get_file_info(filename: str) -> str:
     """
     try:
         minio_client = get_minio_client()
-        files = minio_client.list_files()
+        # Metadata only: the file body is never downloaded
+        info = minio_client.get_file_info(filename)
         
-        if filename not in files:
+        if info is None:
+            files = minio_client.list_files()
             return f"File '{filename}' not found. Available files: {', '.join(files)}"
         
-        # Get file content size
-        content = minio_client.get_file_content(filename)
-        if content:
-            size_kb = len(content) / 1024
-            return f"File: {filename}\nSize: {size_kb:.2f} KB\nStatus: Available"
-        else:
-            return f"File '{filename}' exists but could not be retrieved."
+        lines = [
+            f"File: {filename}",
+            f"Size: {info['size'] / 1024:.2f} KB",
+            f"Last Modified: {info['last_modified']}",
+            f"ETag: {info['etag']}",
+            f"Rows: {info['row_count'] if info['row_count'] is not None else 'Unknown (not ingested)'}",
+        ]
+        if info['columns']:
+            lines.append("Columns: " + ", ".join(f"{name} ({dtype})" for name, dtype in info['columns']))
+        lines.append("Status: Available")
+        return "\n".join(lines)
     except Exception as e:
         logger.error(f"Error getting file info: {e}")
         return f"Error: {str(e)}"
 
+# ============================================================================
+# MCP Tools - Ingestion
+# ============================================================================
+
+@mcp.tool()
+def list_ingestion_jobs() -> str:
+    """
+    List ingestion jobs running in the background and those that failed
+    or were interrupted and can be resumed.
+    """
+    try:
+        from backend.checkpoints import get_checkpoint_store
+        from backend.jobs import get_job_queue
+        jobs = get_job_queue().list_jobs()
+        incomplete = get_checkpoint_store().incomplete_jobs()
+        if not jobs and not incomplete:
+            return "No ingestion jobs."
+
+        lines = []
+        if jobs:
+            lines.append("# Ingestion Jobs\n")
+            for job in jobs:
+                lines.append(
+                    f"- `{job['id']}` **{job['file_name']}** ({job['status']}, {job['progress']:.0%}): {job['message']}"
+                )
+        if incomplete:
+            lines.append("\n# Resumable Jobs\n")
+            for job in incomplete:
+                lines.append(
+                    f"- **{job['source']}** ({job['status']}): {job['committed_chunk']} chunks / "
+                    f"{job['committed_rows']} rows committed. {job['error'] or ''}".rstrip()
+                )
+        return "\n".join(lines)
+    except Exception as e:
+        logger.error(f"Error listing ingestion jobs: {e}")
+        return f"Error listing ingestion jobs: {str(e)}"
+
+@mcp.tool()
+def submit_ingestion(filename: str) -> str:
+    """
+    Queue (re-)ingestion of a stored procurement file into the knowledge base.
+    Returns a job ID; use get_ingestion_status to follow its progress.
+
+    Args:
+        filename: Name of a file already stored in MinIO
+    """
+    try:
+        from backend.jobs import get_job_queue
+        job_id = get_job_queue().submit(filename)
+        return f"Ingestion job `{job_id}` queued for {filename}."
+    except Exception as e:
+        logger.error(f"Error submitting ingestion: {e}")
+        return f"Error submitting ingestion: {str(e)}"
+
+@mcp.tool()
+def resume_ingestion(filename: str) -> str:
+    """
+    Resume an incomplete ingestion job from its last checkpoint in the background.
+    Returns a job ID; use get_ingestion_status to follow its progress.
+
+    Args:
+        filename: Name of the file whose ingestion should be resumed
+    """
+    try:
+        from backend.jobs import get_job_queue
+        job_id = get_job_queue().submit(filename, resume=True)
+        return f"Resume job `{job_id}` queued for {filename}."
+    except Exception as e:
+        logger.error(f"Error resuming ingestion: {e}")
+        return f"Error resuming ingestion: {str(e)}"
+
+@mcp.tool()
+def get_ingestion_status(job_id: str) -> str:
+    """
+    Get the status and progress of an ingestion job.
+
+    Args:
+        job_id: ID returned by submit_ingestion or resume_ingestion
+    """
+    try:
+        from backend.jobs import get_job_queue
+        job = get_job_queue().get(job_id)
+        if job is None:
+            return f"Unknown ingestion job '{job_id}'."
+        return (
+            f"Job: {job['id']}\nFile: {job['file_name']}\nStatus: {job['status']}\n"
+            f"Progress: {job['progress']:.0%}\nMessage: {job['message']}"
+        )
+    except Exception as e:
+        logger.error(f"Error getting ingestion status: {e}")
+        return f"Error getting ingestion status: {str(e)}"
+
 # ============================================================================
 # MCP Tools - Data Querying
 # ============================================================================
 
 @mcp.tool()
-def query_procurement_data(query: str, n_results: int = 5) -> str:
+def query_procurement_data(query: str, n_results: int = 5, source_file: Optional[str] = None,
+                           supplier: Optional[str] = None, category: Optional[str] = None,
+                           risk_level: Optional[str] = None) -> str:
     """
     Search the procurement knowledge base (ChromaDB) for relevant information.
     Use this to find specific details about suppliers, contracts, risks, or spend.
@@ -173,165 +336,378 @@ def query_procurement_data(query: str, n_results: int = 5) -> str:
     Args:
         query: The search query (e.g., "high risk suppliers", "IT spend analysis")
         n_results: Number of results to return (default: 5)
+        source_file: Optional CSV filename to restrict the search to.
+        supplier: Optional exact supplier name to restrict the search to.
+        category: Optional item category to restrict the search to.
+        risk_level: Optional supplier risk level(s), e.g. "High" or "High,Medium".
     """
     try:
-        query_engine = get_query_engine(similarity_top_k=n_results)
-        response = query_engine.query(query)
-        return str(response)
+        from backend.semantic_cache import cached_answer
+        from backend.agents import exact_nodes, filters_key
+        from llama_index.core.schema import QueryBundle
+        filters = retrieval_filters(source_file, supplier, category, risk_level)
+
+        def answer():
+            setup_start = time.time()
+            query_engine = get_query_engine(similarity_top_k=n_results, filters=filters)
+            query_start = time.time()
+            response = query_engine.query(query)
+            logger.info(
+                f"query_procurement_data: setup {(query_start - setup_start) * 1000:.1f}ms, "
+                f"query {time.time() - query_start:.2f}s"
+            )
+            return str(response)
+
+        from backend.llm import llm_priority
+
+        with llm_priority("interactive"):
+            # Questions naming a PO, supplier or contract ID answer from its rows; they are
+            # not cached, since a near-duplicate naming another ID needs another answer
+            nodes = exact_nodes(query, filters=filters)
+            if nodes:
+                return str(get_query_engine(similarity_top_k=n_results, filters=filters).synthesize(QueryBundle(query), nodes))
+            # Answers depend on how many results were retrieved and from which documents,
+            # so each n_results and set of filters has its own namespace
+            namespace = f"query:{n_results}" + (f":{filters_key(filters)}" if filters else "")
+            return cached_answer(namespace, query, answer)
     except Exception as e:
         logger.error(f"Error querying data: {e}")
         return f"Error querying data: {str(e)}"
 
+@mcp.tool()
+def get_query_cache_stats() -> str:
+    """
+    Get hit and miss counters of the semantic answer cache used by
+    query_procurement_data and the chat assistant (for this server process).
+    """
+    try:
+        from backend.semantic_cache import get_semantic_cache
+        cache = get_semantic_cache()
+        if cache is None:
+            return "Semantic cache is disabled (SEMANTIC_CACHE_ENABLED=false)."
+        stats = cache.stats()
+        return (
+            f"# Semantic Cache\n\n"
+            f"- **Hits:** {stats['hits']}\n"
+            f"- **Misses:** {stats['misses']}\n"
+            f"- **Hit rate:** {stats['hit_rate']:.0%}\n"
+            f"- **Stored answers:** {stats['entries']}\n"
+            f"- **Similarity threshold:** {stats['threshold']}\n"
+        )
+    except Exception as e:
+        logger.error(f"Error getting cache stats: {e}")
+        return f"Error getting cache stats: {str(e)}"
+
+@mcp.tool()
+def get_llm_queue_stats() -> str:
+    """
+    Get the LLM scheduler's state for this server process: running and queued
+    generations, and per-priority call counts and wait times.
+    """
+    try:
+        from backend.llm import get_llm_scheduler
+        stats = get_llm_scheduler().stats()
+        lines = [
+            "# LLM Queue\n",
+            f"- **Running:** {stats['running']} / {stats['max_concurrency']}",
+            f"- **Queued:** {stats['queue_depth']}\n",
+            "| Priority | Calls | Avg wait | Max wait |",
+            "|---|---|---|---|",
+        ]
+        for priority, values in stats["priorities"].items():
+            lines.append(f"| {priority} | {values['calls']} | {values['wait_avg']:.2f}s | {values['wait_max']:.2f}s |")
+        return "\n".join(lines)
+    except Exception as e:
+        logger.error(f"Error getting LLM queue stats: {e}")
+        return f"Error getting LLM queue stats: {str(e)}"
+
+@mcp.tool()
+def get_procurement_facts(source_file: Optional[str] = None) -> str:
+    """
+    Get exact aggregates over the procurement data: spend by category, month and
+    year, supplier scorecards, risk counts, contract expiries and compliance counts.
+    These are the same figures the analysis agents are given.
+
+    Args:
+        source_file: Optional specific CSV filename. If omitted, facts cover all files.
+    """
+    try:
+        from backend.facts import get_facts, render_fact_sheet
+        # The same cached facts a file-scoped analysis is given
+        facts = get_facts({"source": source_file} if source_file else None)
+        if facts is None:
+            if source_file:
+                return f"Error: File '{source_file}' not found or has no rows."
+            return "No procurement files found in storage. Please upload a CSV file first."
+        return f"# Procurement Facts ({source_file or 'all files'})\n\n{render_fact_sheet(facts)}"
+    except Exception as e:
+        logger.error(f"Error computing facts: {e}")
+        return f"Error computing facts: {str(e)}"
+
+def render_lookup(title: str, field: str, key: str, source_file: Optional[str], limit: int) -> Optional[str]:
+    """Markdown table of the rows the key index holds for field == key, or None if there are none."""
+    from backend.key_index import find_rows, plain_frame
+    total, frames = find_rows(field, key, source=source_file, limit=limit)
+    if not frames:
+        return None
+    shown = sum(len(df) for _, df in frames)
+    report = f"# {title}\n\n**Rows found:** {total}"
+    if shown < total:
+        report += f" (showing the first {shown})"
+    report += "\n\n"
+    for source, df in frames:
+        df = plain_frame(df).fillna("")
+        if 'TotalAmount' in df.columns:
+            amounts = pd.to_numeric(df['TotalAmount'], errors='coerce')
+            report += f"**{source}** - rows {len(df)}, total amount ${amounts.sum():,.2f}\n\n"
+        else:
+            report += f"**{source}** - rows {len(df)}\n\n"
+        report += "| Row | " + " | ".join(df.columns) + " |\n"
+        report += "|-----|" + "|".join("---" for _ in df.columns) + "|\n"
+        for offset, row in zip(df.index, df.itertuples(index=False)):
+            report += f"| {offset} | " + " | ".join(str(value) for value in row) + " |\n"
+        report += "\n"
+    return report
+
+def key_index_disabled() -> bool:
+    from backend.key_index import get_key_index
+    return get_key_index() is None
+
+@mcp.tool()
+def get_po(po_id: str, source_file: Optional[str] = None) -> str:
+    """
+    Look up a purchase order by its exact PO ID (e.g. "PO-2024-0193") and return
+    its rows. Answers from the key index built at ingestion, without a search or LLM.
+
+    Args:
+        po_id: The PO ID to look up (case-insensitive)
+        source_file: Optional specific CSV filename. If omitted, all files are searched.
+    """
+    try:
+        if key_index_disabled():
+            return "Exact lookups are disabled (KEY_INDEX_ENABLED=false)."
+        report = render_lookup(f"Purchase Order {po_id}", "po", po_id, source_file, Config.KEY_LOOKUP_MAX_ROWS)
+        return report or f"PO '{po_id}' not found."
+    except Exception as e:
+        logger.error(f"Error looking up PO: {e}")
+        return f"Error looking up PO: {str(e)}"
+
+@mcp.tool()
+def get_supplier_rows(supplier: str, source_file: Optional[str] = None, limit: int = 50) -> str:
+    """
+    Look up all rows of a supplier by its exact supplier ID or name. Answers from
+    the key index built at ingestion, without a search or LLM.
+
+    Args:
+        supplier: Supplier ID or full supplier name (case-insensitive)
+        source_file: Optional specific CSV filename. If omitted, all files are searched.
+        limit: Maximum number of rows to return (default: 50)
+    """
+    try:
+        if key_index_disabled():
+            return "Exact lookups are disabled (KEY_INDEX_ENABLED=false)."
+        for field in ("supplier_id", "supplier_name"):
+            report = render_lookup(f"Supplier {supplier}", field, supplier, source_file, limit)
+            if report:
+                return report
+        return f"Supplier '{supplier}' not found. Use the exact supplier ID or name."
+    except Exception as e:
+        logger.error(f"Error looking up supplier: {e}")
+        return f"Error looking up supplier: {str(e)}"
+
+@mcp.tool()
+def get_contract(contract_id: str, source_file: Optional[str] = None) -> str:
+    """
+    Look up a contract by its exact contract ID and return the rows under it.
+    Answers from the key index built at ingestion, without a search or LLM.
+
+    Args:
+        contract_id: The contract ID to look up (case-insensitive)
+        source_file: Optional specific CSV filename. If omitted, all files are searched.
+    """
+    try:
+        if key_index_disabled():
+            return "Exact lookups are disabled (KEY_INDEX_ENABLED=false)."
+        report = render_lookup(f"Contract {contract_id}", "contract", contract_id, source_file, Config.KEY_LOOKUP_MAX_ROWS)
+        return report or f"Contract '{contract_id}' not found."
+    except Exception as e:
+        logger.error(f"Error looking up contract: {e}")
+        return f"Error looking up contract: {str(e)}"
+
 # ============================================================================
 # MCP Tools - Agent-Based Analysis
 # ============================================================================
 
 @mcp.tool()
-def analyze_spend(query: Optional[str] = None) -> str:
+async def analyze_spend(query: Optional[str] = None, source_file: Optional[str] = None, supplier: Optional[str] = None,
+                        category: Optional[str] = None, risk_level: Optional[str] = None, fresh: bool = False,
+                        ctx: Context = None) -> str:
     """
     Run spend analysis using the Spend Analysis Agent.
     Analyzes spend patterns, identifies anomalies, and finds cost-saving opportunities.
     
     Args:
         query: Optional specific query. If not provided, runs general spend analysis.
+        source_file: Optional CSV filename to restrict the search to.
+        supplier: Optional exact supplier name to restrict the search to.
+        category: Optional item category to restrict the search to.
+        risk_level: Optional supplier risk level(s), e.g. "High" or "High,Medium".
+        fresh: Generate a new answer instead of reusing a cached LLM response.
     """
     try:
-        agent = get_agent("spend")
+        exact_lookup = query is not None
         query = query or "Analyze spend patterns, identifying anomalies and opportunities."
-        result = agent.run(query)
-        return result
+        return await run_agent_streaming(
+            "spend", query, ctx, retrieval_filters(source_file, supplier, category, risk_level), exact_lookup, fresh
+        )
     except Exception as e:
         logger.error(f"Error in spend analysis: {e}")
         return f"Error running spend analysis: {str(e)}"
 
 @mcp.tool()
-def analyze_risk(query: Optional[str] = None) -> str:
+async def analyze_risk(query: Optional[str] = None, source_file: Optional[str] = None, supplier: Optional[str] = None,
+                       category: Optional[str] = None, risk_level: Optional[str] = None, fresh: bool = False,
+                       ctx: Context = None) -> str:
     """
     Run risk analysis using the Risk Monitoring Agent.
     Identifies high-risk suppliers and potential supply chain disruptions.
     
     Args:
         query: Optional specific query. If not provided, runs general risk analysis.
+        source_file: Optional CSV filename to restrict the search to.
+        supplier: Optional exact supplier name to restrict the search to.
+        category: Optional item category to restrict the search to.
+        risk_level: Optional supplier risk level(s), e.g. "High" or "High,Medium".
+        fresh: Generate a new answer instead of reusing a cached LLM response.
     """
     try:
-        agent = get_agent("risk")
+        exact_lookup = query is not None
         query = query or "Identify high-risk suppliers and potential supply chain disruptions."
-        result = agent.run(query)
-        return result
+        return await run_agent_streaming(
+            "risk", query, ctx, retrieval_filters(source_file, supplier, category, risk_level), exact_lookup, fresh
+        )
     except Exception as e:
         logger.error(f"Error in risk analysis: {e}")
         return f"Error running risk analysis: {str(e)}"
 
 @mcp.tool()
-def analyze_suppliers(query: Optional[str] = None) -> str:
+async def analyze_suppliers(query: Optional[str] = None, source_file: Optional[str] = None, supplier: Optional[str] = None,
+                            category: Optional[str] = None, risk_level: Optional[str] = None, fresh: bool = False,
+                            ctx: Context = None) -> str:
     """
     Run supplier analysis using the Supplier Intelligence Agent.
     Provides detailed analysis of top suppliers and their performance.
     
     Args:
         query: Optional specific query. If not provided, runs general supplier analysis.
+        source_file: Optional CSV filename to restrict the search to.
+        supplier: Optional exact supplier name to restrict the search to.
+        category: Optional item category to restrict the search to.
+        risk_level: Optional supplier risk level(s), e.g. "High" or "High,Medium".
+        fresh: Generate a new answer instead of reusing a cached LLM response.
     """
     try:
-        agent = get_agent("supplier")
+        exact_lookup = query is not None
         query = query or "Provide a detailed analysis of top suppliers and their performance."
-        result = agent.run(query)
-        return result
+        return await run_agent_streaming(
+            "supplier", query, ctx, retrieval_filters(source_file, supplier, category, risk_level), exact_lookup, fresh
+        )
     except Exception as e:
         logger.error(f"Error in supplier analysis: {e}")
         return f"Error running supplier analysis: {str(e)}"
 
 @mcp.tool()
-def analyze_contracts(query: Optional[str] = None) -> str:
+async def analyze_contracts(query: Optional[str] = None, source_file: Optional[str] = None, supplier: Optional[str] = None,
+                            category: Optional[str] = None, risk_level: Optional[str] = None, fresh: bool = False,
+                            ctx: Context = None) -> str:
     """
     Run contract analysis using the Contract Intelligence Agent.
     Reviews contracts for expiry dates and compliance risks.
     
     Args:
         query: Optional specific query. If not provided, runs general contract analysis.
+        source_file: Optional CSV filename to restrict the search to.
+        supplier: Optional exact supplier name to restrict the search to.
+        category: Optional item category to restrict the search to.
+        risk_level: Optional supplier risk level(s), e.g. "High" or "High,Medium".
+        fresh: Generate a new answer instead of reusing a cached LLM response.
     """
     try:
-        agent = get_agent("contract")
+        exact_lookup = query is not None
         query = query or "Review contracts for expiry and compliance risks."
-        result = agent.run(query)
-        return result
+        return await run_agent_streaming(
+            "contract", query, ctx, retrieval_filters(source_file, supplier, category, risk_level), exact_lookup, fresh
+        )
     except Exception as e:
         logger.error(f"Error in contract analysis: {e}")
         return f"Error running contract analysis: {str(e)}"
 
 @mcp.tool()
-def analyze_purchase_orders(query: Optional[str] = None) -> str:
+async def analyze_purchase_orders(query: Optional[str] = None, source_file: Optional[str] = None, supplier: Optional[str] = None,
+                                  category: Optional[str] = None, risk_level: Optional[str] = None, fresh: bool = False,
+                                  ctx: Context = None) -> str:
     """
     Run PO analysis using the PO Automation Agent.
     Analyzes Purchase Orders for delays and price discrepancies.
     
     Args:
         query: Optional specific query. If not provided, runs general PO analysis.
+        source_file: Optional CSV filename to restrict the search to.
+        supplier: Optional exact supplier name to restrict the search to.
+        category: Optional item category to restrict the search to.
+        risk_level: Optional supplier risk level(s), e.g. "High" or "High,Medium".
+        fresh: Generate a new answer instead of reusing a cached LLM response.
     """
     try:
-        agent = get_agent("po")
+        exact_lookup = query is not None
         query = query or "Analyze Purchase Orders for delays and price discrepancies."
-        result = agent.run(query)
-        return result
+        return await run_agent_streaming(
+            "po", query, ctx, retrieval_filters(source_file, supplier, category, risk_level), exact_lookup, fresh
+        )
     except Exception as e:
         logger.error(f"Error in PO analysis: {e}")
         return f"Error running PO analysis: {str(e)}"
 
 @mcp.tool()
-def analyze_compliance(query: Optional[str] = None) -> str:
+async def analyze_compliance(query: Optional[str] = None, source_file: Optional[str] = None, supplier: Optional[str] = None,
+                             category: Optional[str] = None, risk_level: Optional[str] = None, fresh: bool = False,
+                             ctx: Context = None) -> str:
     """
     Run compliance analysis using the Compliance & Policy Agent.
     Checks for policy violations and budget adherence.
     
     Args:
         query: Optional specific query. If not provided, runs general compliance analysis.
+        source_file: Optional CSV filename to restrict the search to.
+        supplier: Optional exact supplier name to restrict the search to.
+        category: Optional item category to restrict the search to.
+        risk_level: Optional supplier risk level(s), e.g. "High" or "High,Medium".
+        fresh: Generate a new answer instead of reusing a cached LLM response.
     """
     try:
-        agent = get_agent("compliance")
+        exact_lookup = query is not None
         query = query or "Check for policy violations and budget adherence."
-        result = agent.run(query)
-        return result
+        return await run_agent_streaming(
+            "compliance", query, ctx, retrieval_filters(source_file, supplier, category, risk_level), exact_lookup, fresh
+        )
     except Exception as e:
         logger.error(f"Error in compliance analysis: {e}")
         return f"Error running compliance analysis: {str(e)}"
 
 @mcp.tool()
-def run_comprehensive_analysis() -> str:
+def run_comprehensive_analysis(source_file: Optional[str] = None) -> str:
     """
     Run all agent analyses in parallel and return a comprehensive report.
     This combines insights from all 6 specialized agents.
+    
+    Args:
+        source_file: Optional CSV filename to restrict the analysis to.
     """
     try:
-        import concurrent.futures
-        
-        agents_config = {
-            "spend": ("Analyze spend patterns, identifying anomalies and opportunities.", "spend"),
-            "risk": ("Identify high-risk suppliers and potential supply chain disruptions.", "risk"),
-            "supplier": ("Provide a detailed analysis of top suppliers and their performance.", "supplier"),
-            "contract": ("Review contracts for expiry and compliance risks.", "contract"),
-            "po": ("Analyze Purchase Orders for delays and price discrepancies.", "po"),
-            "compliance": ("Check for policy violations and budget adherence.", "compliance")
-        }
-        
-        results = {}
+        from backend.agents import run_complete_analysis
         
-        def run_agent(key, query, agent_type):
-            try:
-                agent = get_agent(agent_type)
-                return key, agent.run(query)
-            except Exception as e:
-                logger.error(f"Error in {key} analysis: {e}")
-                return key, f"Error: {str(e)}"
-        
-        # Run agents in parallel (max 2 workers to avoid overload)
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-            futures = {
-                executor.submit(run_agent, key, query, agent_type): key
-                for key, (query, agent_type) in agents_config.items()
-            }
-            
-            for future in concurrent.futures.as_completed(futures):
-                key, result = future.result()
-                results[key] = result
+        # Shared retrieval for all agents; the LLM scheduler limits concurrent generations
+        results = dict(run_complete_analysis(filters=retrieval_filters(source_file)))
         
         # Format comprehensive report
         report = "# Comprehensive Procurement Analysis Report\n\n"
@@ -360,7 +736,10 @@ def compare_suppliers(supplier1: str, supplier2: str, source_file: Optional[str]
                      files exist, an error will be returned asking to specify it.
     """
     try:
-        df = get_procurement_dataframe(source_file=source_file)
+        df = get_procurement_dataframe(source_file=source_file, columns=[
+            'SupplierName', 'OnTimeDelivery%', 'QualityScore', 'TotalAmount',
+            'UnitPrice', 'SupplierRiskLevel', 'ComplianceStatus'
+        ])
         
         # Filter data for both suppliers
         supplier1_data = df[df['SupplierName'].str.contains(supplier1, case=False, na=False)]
@@ -484,57 +863,42 @@ def get_expiring_contracts(days_ahead: int = 90, source_file: Optional[str] = No
     """
     try:
         from datetime import datetime, timedelta
+        from backend.columnar import parse_dates
         
-        df = get_procurement_dataframe(source_file=source_file)
+        df = get_procurement_dataframe(source_file=source_file, columns=[
+            'ContractID', 'SupplierName', 'ContractEndDate', 'SupplierRiskLevel'
+        ])
         
         if 'ContractEndDate' not in df.columns:
             return "Error: Contract end dates not available in the data."
         
-        # Calculate cutoff date
-        cutoff_date = datetime.now() + timedelta(days=days_ahead)
-        
-        # Parse contract end dates
-        expiring_contracts = []
-        for idx, row in df.iterrows():
-            try:
-                if pd.isna(row.get('ContractEndDate')):
-                    continue
-                
-                # Try different date formats
-                end_date = None
-                date_str = str(row['ContractEndDate'])
-                
-                for fmt in ['%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S']:
-                    try:
-                        end_date = datetime.strptime(date_str.split()[0], fmt)
-                        break
-                    except:
-                        continue
-                
-                if end_date and end_date <= cutoff_date:
-                    expiring_contracts.append({
-                        'contract_id': row.get('ContractID', 'N/A'),
-                        'supplier': row.get('SupplierName', 'N/A'),
-                        'end_date': end_date.strftime('%Y-%m-%d'),
-                        'days_until_expiry': (end_date - datetime.now()).days,
-                        'risk_level': row.get('SupplierRiskLevel', 'Unknown'),
-                        'total_amount': row.get('TotalAmount', 0)
-                    })
-            except Exception as e:
-                logger.debug(f"Error parsing contract date: {e}")
-                continue
-        
-        if not expiring_contracts:
+        def column(name, default):
+            return df[name] if name in df.columns else pd.Series(default, index=df.index)
+
+        # Parse contract end dates in any of the accepted formats; unparseable ones are skipped
+        now = datetime.now()
+        end_dates = parse_dates(df['ContractEndDate'])
+        contracts = pd.DataFrame({
+            'contract_id': column('ContractID', 'N/A'),
+            'supplier': column('SupplierName', 'N/A'),
+            'end_date': end_dates,
+            'days_until_expiry': (end_dates - now).dt.days,
+            'risk_level': column('SupplierRiskLevel', 'Unknown'),
+        })[end_dates <= now + timedelta(days=days_ahead)]
+
+        if contracts.empty:
             return f"No contracts expiring in the next {days_ahead} days."
-        
-        # Remove duplicates and sort by expiry date
-        unique_contracts = {}
-        for contract in expiring_contracts:
-            key = contract['contract_id']
-            if key not in unique_contracts or contract['days_until_expiry'] < unique_contracts[key]['days_until_expiry']:
-                unique_contracts[key] = contract
-        
-        sorted_contracts = sorted(unique_contracts.values(), key=lambda x: x['days_until_expiry'])
+
+        # Remove duplicates (keeping each contract's earliest expiry) and sort by expiry date
+        sorted_contracts = (
+            contracts.sort_values('days_until_expiry', kind='stable')
+            .drop_duplicates('contract_id')
+            .assign(
+                end_date=lambda frame: frame['end_date'].dt.strftime('%Y-%m-%d'),
+                days_until_expiry=lambda frame: frame['days_until_expiry'].astype(int)
+            )
+            .to_dict('records')
+        )
         
         # Generate report
         report = f"# Contracts Expiring in Next {days_ahead} Days\n\n"
@@ -586,8 +950,17 @@ def export_report(report_type: str, format: str = "excel", source_file: Optional
         if report_type.lower() not in valid_types:
             return f"Error: Invalid report type. Available: {', '.join(valid_types)}"
         
-        # Get data
-        df = get_procurement_dataframe(source_file=source_file)
+        # Get data (only the columns the report uses; other report types export every column)
+        report_columns = {
+            'spend': ['ItemCategory', 'TotalAmount', 'UnitPrice', 'POID'],
+            'supplier': ['SupplierName', 'OnTimeDelivery%', 'QualityScore', 'TotalAmount', 'SupplierRiskLevel'],
+            'contract': ['ContractID', 'SupplierName', 'ContractEndDate', 'SupplierRiskLevel', 'TotalAmount'],
+            'comprehensive': [
+                'ItemCategory', 'TotalAmount', 'SupplierName', 'OnTimeDelivery%', 'QualityScore',
+                'SupplierRiskLevel', 'ContractID', 'ContractEndDate'
+            ],
+        }
+        df = get_procurement_dataframe(source_file=source_file, columns=report_columns.get(report_type.lower()))
         
         # Generate report data based on type
         export_df = None
@@ -595,7 +968,7 @@ def export_report(report_type: str, format: str = "excel", source_file: Optional
         
         if report_type.lower() == 'spend':
             if 'ItemCategory' in df.columns and 'TotalAmount' in df.columns:
-                export_df = df.groupby('ItemCategory').agg({
+                export_df = df.groupby('ItemCategory', observed=True).agg({
                     'TotalAmount': 'sum',
                     'UnitPrice': 'mean',
                     'POID': 'count'
@@ -605,7 +978,7 @@ def export_report(report_type: str, format: str = "excel", source_file: Optional
         
         elif report_type.lower() == 'supplier':
             if 'SupplierName' in df.columns:
-                export_df = df.groupby('SupplierName').agg({
+                export_df = df.groupby('SupplierName', observed=True).agg({
                     'OnTimeDelivery%': 'mean' if 'OnTimeDelivery%' in df.columns else 'first',
                     'QualityScore': 'mean' if 'QualityScore' in df.columns else 'first',
                     'TotalAmount': 'sum',
@@ -632,7 +1005,7 @@ def export_report(report_type: str, format: str = "excel", source_file: Optional
             with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
                 # Spend Summary
                 if 'ItemCategory' in df.columns:
-                    spend_df = df.groupby('ItemCategory')['TotalAmount'].sum().reset_index()
+                    spend_df = df.groupby('ItemCategory', observed=True)['TotalAmount'].sum().reset_index()
                     spend_df.columns = ['Category', 'Total Spend']
                     spend_df.to_excel(writer, sheet_name='Spend Summary', index=False)
                 
@@ -696,13 +1069,15 @@ def list_files_resource() -> list[dict]:
     """Resource listing all procurement files"""
     try:
         minio_client = get_minio_client()
-        files = minio_client.list_files()
+        files = minio_client.list_files_info()
         return [
             {
-                "uri": f"procurement://file/{file}",
-                "name": file,
-                "description": f"Procurement data file: {file}",
-                "mimeType": "text/csv"
+                "uri": f"procurement://file/{file['name']}",
+                "name": file['name'],
+                "description": f"Procurement data file: {file['name']}"
+                + (f" ({file['row_count']:,} rows)" if file['row_count'] is not None else ""),
+                "mimeType": "text/csv",
+                "size": file['size']
             }
             for file in files
         ]
@@ -0,0 +1,161 @@
+import io
+import queue
+import threading
+import time
+from loguru import logger
+
+_END = object()
+
+class PipelineCancelled(Exception):
+    """Raised inside a stage when another stage has failed."""
+
+class Pipeline:
+    """
+    Runs ingestion stages concurrently in threads connected by bounded queues.
+
+    - Stages exchange items with put()/get()/iterate(); a full queue blocks the
+      producer, so at most queue_size items are buffered between two stages.
+    - If any stage raises, the pipeline is cancelled: every blocked put/get in
+      the other stages raises PipelineCancelled and their threads exit.
+    - Progress events from stages are delivered to the caller's thread by
+      wait(), which keeps UI callbacks (e.g. Streamlit) off worker threads.
+    """
+    def __init__(self, queue_size=2, poll_interval=0.1):
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.cancelled = threading.Event()
+        self.timings = {}
+        self.errors = []
+        self._threads = []
+        self._progress = queue.Queue()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def queue(self, maxsize=None):
+        return queue.Queue(maxsize=maxsize or self.queue_size)
+
+    def put(self, q, item):
+        start = time.perf_counter()
+        try:
+            while True:
+                if self.cancelled.is_set():
+                    raise PipelineCancelled()
+                try:
+                    q.put(item, timeout=self.poll_interval)
+                    return
+                except queue.Full:
+                    continue
+        finally:
+            self._add_wait(time.perf_counter() - start)
+
+    def get(self, q):
+        start = time.perf_counter()
+        try:
+            while True:
+                if self.cancelled.is_set():
+                    raise PipelineCancelled()
+                try:
+                    return q.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    continue
+        finally:
+            self._add_wait(time.perf_counter() - start)
+
+    def close(self, q):
+        """Signals the consumer of q that no more items follow."""
+        self.put(q, _END)
+
+    def iterate(self, q):
+        while True:
+            item = self.get(q)
+            if item is _END:
+                return
+            yield item
+
+    def report(self, fraction, text):
+        self._progress.put((fraction, text))
+
+    def _add_wait(self, seconds):
+        if hasattr(self._local, "wait"):
+            self._local.wait += seconds
+
+    def spawn(self, name, target, *args):
+        """Starts target(*args) as a named stage thread."""
+        def run():
+            self._local.wait = 0.0
+            start = time.perf_counter()
+            try:
+                target(*args)
+            except PipelineCancelled:
+                logger.debug(f"Pipeline stage '{name}' cancelled")
+            except Exception as e:
+                logger.error(f"Pipeline stage '{name}' failed: {e}")
+                with self._lock:
+                    self.errors.append((name, e))
+                self.cancelled.set()
+            finally:
+                wall = time.perf_counter() - start
+                self.timings[name] = {"wall": wall, "busy": wall - self._local.wait, "wait": self._local.wait}
+
+        thread = threading.Thread(target=run, name=f"pipeline-{name}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def wait(self, progress_callback=None):
+        """
+        Blocks until every stage has finished, forwarding progress events to
+        progress_callback in the calling thread. Returns the failed
+        (stage, exception) pair, or None if all stages succeeded.
+        """
+        while any(thread.is_alive() for thread in self._threads):
+            self._drain(progress_callback, timeout=self.poll_interval)
+        self._drain(progress_callback)
+
+        for name, timing in self.timings.items():
+            logger.info(
+                f"Stage {name}: {timing['wall']:.2f}s wall, {timing['busy']:.2f}s busy, {timing['wait']:.2f}s waiting"
+            )
+        return self.errors[0] if self.errors else None
+
+    def _drain(self, progress_callback, timeout=None):
+        try:
+            event = self._progress.get(timeout=timeout) if timeout else self._progress.get_nowait()
+            while True:
+                if progress_callback:
+                    progress_callback(*event)
+                event = self._progress.get_nowait()
+        except queue.Empty:
+            pass
+
+class QueueReader(io.RawIOBase):
+    """
+    Read-only file object over byte blocks arriving on a pipeline queue,
+    so consumers like pd.read_csv or MinIO's put_object can stream from it.
+    """
+    def __init__(self, pipeline, q):
+        self._pipeline = pipeline
+        self._queue = q
+        self._buffer = b""
+        self._eof = False
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer and not self._eof:
+            block = self._pipeline.get(self._queue)
+            if block is _END:
+                self._eof = True
+            else:
+                self._buffer = block
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        self.bytes_read += n
+        return n
+
+    @classmethod
+    def buffered(cls, pipeline, q, buffer_size=1024 * 1024):
+        raw = cls(pipeline, q)
+        return raw, io.BufferedReader(raw, buffer_size=buffer_size)
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import hashlib
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from loguru import logger
+from .config import Config
+
+_bypass = ContextVar("llm_response_cache_bypass", default=False)
+
+@contextmanager
+def bypass_response_cache():
+    """LLM calls made inside this block skip the response cache (neither read nor written)."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+def response_cache_bypassed():
+    return _bypass.get()
+
+class ResponseCache:
+    """
+    Persistent LLM response store backed by SQLite.
+
+    Entries are keyed by sha256 of the model, generation parameters and the
+    full prompt (template, query and retrieved context as sent to the model).
+    Entries older than ttl_seconds are ignored and purged; when the stored
+    size exceeds max_bytes, least recently used entries are evicted.
+    """
+    def __init__(self, path=None, ttl_seconds=None, max_bytes=None):
+        self.path = path or Config.LLM_CACHE_PATH
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else Config.LLM_CACHE_TTL_HOURS * 3600
+        self.max_bytes = max_bytes if max_bytes is not None else Config.LLM_CACHE_MAX_MB * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+
+    @staticmethod
+    def key(model, params, messages):
+        """messages is a list of (role, content) pairs; params must be JSON-serializable."""
+        payload = json.dumps([model, params, messages], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached response dict for key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at >= ?", (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total, count = self._conn.execute("SELECT COALESCE(SUM(LENGTH(response)), 0), COUNT(*) FROM responses").fetchone()
+        if total <= self.max_bytes or count == 0:
+            return
+        excess_rows = math.ceil((total - self.max_bytes) / (total / count))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+            (excess_rows,)
+        )
+        logger.info(f"LLM response cache evicted {excess_rows} least recently used entries")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+_response_cache = None
+
+def get_response_cache():
+    """
+    Returns the process-wide LLM response cache, or None when caching is disabled.
+    """
+    global _response_cache
+    if not Config.LLM_CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
@@ -0,0 +1,165 @@
+import pandas as pd
+from llama_index.core import Document
+from .columnar import parse_dates
+
+# Summary document levels, in the order they are built. Row documents have no doc_level.
+ROLLUP_LEVELS = ("supplier", "category", "contract", "month")
+
+_LEVEL_KEYS = {"supplier": "SupplierName", "category": "ItemCategory", "contract": "ContractID", "month": "PODate"}
+
+_RISK_LEVELS = ("High", "Medium", "Low")
+
+# How each measure merges across chunks
+_AGGREGATIONS = {
+    "rows": "sum", "spend": "sum",
+    "on_time_sum": "sum", "on_time_n": "sum", "quality_sum": "sum", "quality_n": "sum",
+    "risk_High": "sum", "risk_Medium": "sum", "risk_Low": "sum",
+    "compliance_n": "sum", "non_compliant": "sum",
+    "first_po": "min", "last_po": "max", "contract_end": "max",
+    "supplier_id": "first", "supplier_name": "first",
+}
+
+def _measures(df):
+    """Per-row measures whose sums, minima and maxima merge exactly across chunks."""
+    measures = pd.DataFrame({"rows": 1}, index=df.index)
+    columns = df.columns
+    if "TotalAmount" in columns:
+        measures["spend"] = pd.to_numeric(df["TotalAmount"], errors="coerce").fillna(0.0)
+    for column, name in (("OnTimeDelivery%", "on_time"), ("QualityScore", "quality")):
+        if column in columns:
+            values = pd.to_numeric(df[column], errors="coerce")
+            measures[f"{name}_sum"] = values.fillna(0.0)
+            measures[f"{name}_n"] = values.notna().astype(int)
+    if "SupplierRiskLevel" in columns:
+        risk = df["SupplierRiskLevel"].astype(str)
+        for level in _RISK_LEVELS:
+            measures[f"risk_{level}"] = (risk == level).astype(int)
+    if "ComplianceStatus" in columns:
+        status = df["ComplianceStatus"]
+        measures["compliance_n"] = status.notna().astype(int)
+        measures["non_compliant"] = (status.notna() & (status.astype(str).str.lower() != "compliant")).astype(int)
+    if "PODate" in columns:
+        dates = parse_dates(df["PODate"])
+        measures["first_po"] = dates
+        measures["last_po"] = dates
+    if "ContractEndDate" in columns:
+        measures["contract_end"] = parse_dates(df["ContractEndDate"])
+    for column, name in (("SupplierID", "supplier_id"), ("SupplierName", "supplier_name")):
+        if column in columns:
+            measures[name] = df[column].astype(str).where(df[column].notna())
+    return measures
+
+def _level_keys(df, level):
+    column = _LEVEL_KEYS[level]
+    if column not in df.columns:
+        return None
+    if level == "month":
+        return parse_dates(df[column]).dt.to_period("M").astype(str).where(lambda keys: keys != "NaT")
+    return df[column].astype(str).where(df[column].notna())
+
+class RollupAccumulator:
+    """
+    Builds per-supplier, per-category, per-contract and per-month totals from
+    CSV chunks. Chunks are merged into running aggregates as they arrive, so
+    memory grows with the number of groups, not rows.
+    """
+    def __init__(self, levels=ROLLUP_LEVELS):
+        self.levels = levels
+        self.total_spend = 0.0
+        self._totals = {}
+
+    def add(self, df):
+        measures = _measures(df)
+        if "spend" in measures.columns:
+            self.total_spend += float(measures["spend"].sum())
+        for level in self.levels:
+            keys = _level_keys(df, level)
+            if keys is None:
+                continue
+            aggregations = {column: _AGGREGATIONS[column] for column in measures.columns}
+            partial = measures.groupby(keys.rename("key"), sort=False).agg(aggregations)
+            if level in self._totals:
+                partial = pd.concat([self._totals[level], partial]).groupby(level=0, sort=False).agg(aggregations)
+            self._totals[level] = partial
+
+    def totals(self, level):
+        """Aggregates for one level, one row per group, or None if the data has no key column for it."""
+        return self._totals.get(level)
+
+    def documents(self, file_name):
+        """One summary Document per group of every level, with deterministic IDs."""
+        from .ingestion import document_id
+        documents = []
+        for level in self.levels:
+            totals = self.totals(level)
+            if totals is None:
+                continue
+            for key, row in zip(totals.index, totals.to_dict("records")):
+                text = _summary_text(level, key, row, self.total_spend)
+                metadata = {"doc_level": level, "source": file_name, "row_index": -1}
+                metadata.update(_level_metadata(level, key, row))
+                documents.append(Document(
+                    # Metadata is filtered on, so a change to it must re-index the summary too
+                    id_=document_id(file_name, f"{level}:{key}", text + "\0" + repr(sorted(metadata.items()))),
+                    text=text,
+                    excluded_embed_metadata_keys=["source", "row_index", "doc_level"],
+                    metadata=metadata
+                ))
+        return documents
+
+def _label(row, name):
+    value = row.get(name)
+    return value if isinstance(value, str) else ""
+
+def _level_metadata(level, key, row):
+    if level == "supplier":
+        metadata = {"supplier_id": _label(row, "supplier_id"), "supplier_name": key}
+        # The supplier's worst risk level, so risk filters apply to its summary like to its rows
+        worst = next((risk for risk in _RISK_LEVELS if row.get(f"risk_{risk}")), None)
+        if worst:
+            metadata["risk_level"] = worst
+        return metadata
+    if level == "category":
+        return {"item_category": key}
+    if level == "contract":
+        return {"contract_id": key, "supplier_name": _label(row, "supplier_name")}
+    return {"month": key}
+
+def _date(value):
+    return value.strftime("%Y-%m-%d") if pd.notna(value) else "N/A"
+
+def _summary_text(level, key, row, total_spend):
+    if level == "supplier":
+        supplier_id = f" (ID: {_label(row, 'supplier_id')})" if _label(row, "supplier_id") else ""
+        lines = [f"Supplier summary: {key}{supplier_id}"]
+    elif level == "category":
+        lines = [f"Category summary: {key}"]
+    elif level == "contract":
+        supplier = f" (Supplier: {_label(row, 'supplier_name')})" if _label(row, "supplier_name") else ""
+        lines = [f"Contract summary: {key}{supplier}", f"Expires: {_date(row.get('contract_end'))}"]
+    else:
+        lines = [f"Monthly summary: {key}"]
+
+    spend = f"Orders: {int(row['rows'])}"
+    if "spend" in row:
+        spend += f" | Total spend: {row['spend']:,.2f}"
+        if total_spend and level == "category":
+            spend += f" ({row['spend'] / total_spend:.0%} of all spend)"
+        if row["rows"]:
+            spend += f" | Average order: {row['spend'] / row['rows']:,.2f}"
+    lines.append(spend)
+    if level != "month" and "first_po" in row:
+        lines.append(f"PO dates: {_date(row['first_po'])} to {_date(row['last_po'])}")
+
+    performance = [
+        f"average {label} {row[f'{name}_sum'] / row[f'{name}_n']:.1f}{unit}"
+        for name, label, unit in (("on_time", "on-time delivery", "%"), ("quality", "quality", ""))
+        if row.get(f"{name}_n")
+    ]
+    if performance:
+        lines.append("Performance: " + ", ".join(performance))
+    if "risk_High" in row:
+        lines.append("Risk mix: " + ", ".join(f"{risk} {int(row[f'risk_{risk}'])}" for risk in _RISK_LEVELS))
+    if row.get("compliance_n"):
+        lines.append(f"Compliance: {int(row['non_compliant'])} of {int(row['compliance_n'])} rows non-compliant")
+    return "\n".join(lines)
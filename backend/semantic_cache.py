@@ -0,0 +1,168 @@
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from loguru import logger
+from .config import Config
+
+class SemanticCache:
+    """
+    Answers keyed by query embedding, stored in SQLite.
+
+    A lookup returns the answer of the most similar cached query in the same
+    namespace (e.g. "chat") and data version, if its cosine similarity is at
+    least threshold. Answers for an older data version are never returned.
+    At most max_entries answers are kept; the least recently used go first.
+    """
+    def __init__(self, path=None, threshold=None, max_entries=None):
+        self.path = path or Config.SEMANTIC_CACHE_PATH
+        self.threshold = threshold if threshold is not None else Config.SEMANTIC_CACHE_THRESHOLD
+        self.max_entries = max_entries or Config.SEMANTIC_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT NOT NULL, data_version TEXT NOT NULL, "
+            "query TEXT NOT NULL, embedding BLOB NOT NULL, answer TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_scope ON answers(namespace, data_version)")
+        self._conn.commit()
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, namespace, embedding, data_version):
+        """Returns (answer, similarity, cached query) for the best match, or None on a miss."""
+        query_vector = self._normalize(embedding)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, query, embedding, answer FROM answers WHERE namespace = ? AND data_version = ?",
+                (namespace, data_version)
+            ).fetchall()
+            if rows:
+                # Stored vectors are normalized, so the dot product is the cosine similarity
+                matrix = np.vstack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+                similarities = matrix @ query_vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), rows[best][0]))
+                    self._conn.commit()
+                    self.hits += 1
+                    return rows[best][3], float(similarities[best]), rows[best][1]
+            self.misses += 1
+            return None
+
+    def store(self, namespace, query, embedding, data_version, answer):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (namespace, data_version, query, embedding, answer, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, data_version, query, self._normalize(embedding).tobytes(), answer, time.time())
+            )
+            # Answers for older data versions can never be served again
+            self._conn.execute(
+                "DELETE FROM answers WHERE namespace = ? AND data_version != ?", (namespace, data_version)
+            )
+            self._conn.execute(
+                "DELETE FROM answers WHERE id NOT IN (SELECT id FROM answers ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "threshold": self.threshold,
+        }
+
+def current_data_version():
+    """
+    Identifies the state of the indexed data: the number of stored vectors plus
+    the ingestion records, which change whenever a file is ingested or removed.
+    """
+    from .checkpoints import get_checkpoint_store
+    from .database import get_chroma_collection
+    return f"{get_chroma_collection().count()}:{get_checkpoint_store().data_version()}"
+
+def _lookup(namespace, query):
+    """(cache, embedding, data version, match) for query; cache is None when unavailable."""
+    cache = get_semantic_cache()
+    if cache is None:
+        return None, None, None, None
+    try:
+        from .llm import get_embed_model
+        embedding = get_embed_model().get_query_embedding(query)
+        data_version = current_data_version()
+        match = cache.lookup(namespace, embedding, data_version)
+    except Exception as e:
+        logger.warning(f"Semantic cache unavailable: {e}")
+        return None, None, None, None
+    if match is not None:
+        answer, similarity, cached_query = match
+        logger.info(f"Semantic cache hit ({similarity:.3f}): '{query}' ~ '{cached_query}'")
+    return cache, embedding, data_version, match
+
+def _store(cache, namespace, query, embedding, data_version, answer):
+    try:
+        cache.store(namespace, query, embedding, data_version, answer)
+    except Exception as e:
+        logger.warning(f"Could not store answer in semantic cache: {e}")
+
+def cached_answer(namespace, query, answer_fn):
+    """
+    Returns the cached answer to a near-duplicate of query on the current data,
+    or calls answer_fn() and caches its result. Cache errors never stop the
+    answer: the query is then answered uncached.
+    """
+    cache, embedding, data_version, match = _lookup(namespace, query)
+    if match is not None:
+        return match[0]
+    answer = answer_fn()
+    if cache is not None:
+        _store(cache, namespace, query, embedding, data_version, answer)
+    return answer
+
+def cached_answer_stream(namespace, query, stream_fn):
+    """
+    Streaming form of cached_answer: yields a cached answer as one chunk, or the
+    tokens of stream_fn() as they arrive, caching the answer once it completes.
+    """
+    cache, embedding, data_version, match = _lookup(namespace, query)
+    if match is not None:
+        yield match[0]
+        return
+    tokens = []
+    for token in stream_fn():
+        tokens.append(token)
+        yield token
+    if cache is not None:
+        _store(cache, namespace, query, embedding, data_version, "".join(tokens))
+
+_semantic_cache = None
+
+def get_semantic_cache():
+    """
+    Returns the process-wide semantic cache, or None when it is disabled.
+    """
+    global _semantic_cache
+    if not Config.SEMANTIC_CACHE_ENABLED:
+        return None
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache()
+    return _semantic_cache
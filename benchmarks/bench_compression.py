@@ -0,0 +1,78 @@
+"""
+Benchmark: storage codecs for raw uploads (none / gzip / zstd).
+
+Reports the compression ratio and CPU time of each codec, and, when MinIO is
+reachable, the wall time to upload the file and to read it back through
+MinioClient.get_file_content.
+
+Usage:
+    python benchmarks/bench_compression.py [rows] [--no-minio]
+"""
+import sys
+import os
+import io
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.compression import CODECS, compress_stream, decompress, resolve_codec
+from bench_document_builder import make_procurement_frame
+
+
+def cpu_and_wall(func):
+    cpu, wall = time.process_time(), time.perf_counter()
+    result = func()
+    return result, time.process_time() - cpu, time.perf_counter() - wall
+
+
+def bench_codec(codec, data):
+    stored, compress_cpu, _ = cpu_and_wall(lambda: b"".join(compress_stream(io.BytesIO(data), codec)) if codec != "none" else data)
+    restored, decompress_cpu, _ = cpu_and_wall(lambda: decompress(stored, codec))
+    assert restored == data
+    return {"stored": len(stored), "compress_cpu": compress_cpu, "decompress_cpu": decompress_cpu}
+
+
+def bench_transfer(client, codec, data):
+    object_name = f"bench-compression-{codec}.csv"
+    try:
+        _, _, upload = cpu_and_wall(lambda: client.upload_file(object_name, data, len(data), compression=codec))
+        content, _, download = cpu_and_wall(lambda: client.get_file_content(object_name))
+        assert content == data
+        return upload, download
+    finally:
+        client.client.remove_object(client.bucket, object_name)
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    rows = int(args[0]) if args else 200_000
+    data = make_procurement_frame(rows).to_csv(index=False).encode()
+
+    client = None
+    if "--no-minio" not in sys.argv:
+        try:
+            from backend.database import get_minio_client
+            client = get_minio_client()
+        except Exception as e:
+            print(f"MinIO unavailable, skipping transfer timings: {e}")
+
+    print("=" * 78)
+    print(f"Compression benchmark ({rows:,} rows, {len(data) / 1024 / 1024:.1f} MB CSV)")
+    print("=" * 78)
+    print(f"{'codec':<6} {'stored MB':>10} {'ratio':>7} {'compress cpu':>13} {'decompress cpu':>15} {'upload':>8} {'download':>9}")
+
+    for codec in CODECS:
+        if resolve_codec(codec) != codec:
+            print(f"{codec:<6} skipped (zstandard is not installed)")
+            continue
+        result = bench_codec(codec, data)
+        upload = download = "-"
+        if client is not None:
+            upload, download = (f"{seconds:.2f}s" for seconds in bench_transfer(client, codec, data))
+        print(
+            f"{codec:<6} {result['stored'] / 1024 / 1024:10.2f} {len(data) / result['stored']:6.1f}x "
+            f"{result['compress_cpu']:12.2f}s {result['decompress_cpu']:14.2f}s {upload:>8} {download:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark: vector-only vs hybrid (vector + BM25 keyword) retrieval.
+
+Always reports the keyword index build rate and search latency over a
+synthetic PO export. When ChromaDB and Ollama are reachable, also runs PO ID
+lookups ("status of PO-...") against the indexed data and reports latency and
+how often a row with that PO ID is in the top k, with and without fusion.
+
+Usage:
+    python benchmarks/bench_hybrid_retrieval.py [rows] [--no-live]
+"""
+import sys
+import os
+import re
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.ingestion import build_documents
+from backend.keyword_index import KeywordIndex
+from bench_document_builder import make_procurement_frame
+
+TOP_K = 5
+_POID = re.compile(r"PO: (\S+)")
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def report(label, latencies, hits=None):
+    line = (
+        f"{label:<16} p50 {percentile(latencies, 0.5) * 1000:8.2f} ms   "
+        f"p95 {percentile(latencies, 0.95) * 1000:8.2f} ms"
+    )
+    if hits is not None:
+        line += f"   ID hit rate {sum(hits) / len(hits):6.1%}"
+    print(line)
+
+
+def bench_keyword_index(rows):
+    documents = build_documents(make_procurement_frame(rows), "bench.csv")
+    with tempfile.TemporaryDirectory() as directory:
+        index = KeywordIndex(os.path.join(directory, "keywords.sqlite3"))
+        start = time.perf_counter()
+        index.add(documents)
+        build = time.perf_counter() - start
+        print(f"index build      {build:8.2f}s   {rows / build:12,.0f} docs/sec")
+
+        latencies, hits = [], []
+        for doc in documents[::max(1, rows // 200)]:
+            poid = _POID.search(doc.text).group(1)
+            start = time.perf_counter()
+            results = index.search(f"status of {poid}", TOP_K)
+            latencies.append(time.perf_counter() - start)
+            hits.append(any(node_id == doc.id_ for node_id, _ in results))
+        report("keyword search", latencies, hits)
+
+
+def bench_live(samples=50):
+    from backend.agents import get_index, candidate_depth, fuse_keyword_results
+    from backend.database import get_chroma_collection
+    from backend.keyword_index import get_keyword_index
+
+    if get_keyword_index() is None:
+        print("Hybrid retrieval is disabled (HYBRID_RETRIEVAL_ENABLED=false), skipping live comparison")
+        return
+    stored = get_chroma_collection().get(limit=samples * 4, include=["documents"])
+    targets = [match.group(1) for text in stored["documents"] if (match := _POID.search(text or ""))][:samples]
+    if not targets:
+        print("No indexed PO rows, skipping live comparison")
+        return
+
+    dense_retriever = get_index().as_retriever(similarity_top_k=TOP_K)
+    deep_retriever = get_index().as_retriever(similarity_top_k=candidate_depth(TOP_K))
+    results = {"vector": ([], []), "hybrid": ([], [])}
+    for poid in targets:
+        query = f"status of {poid}"
+        start = time.perf_counter()
+        dense = dense_retriever.retrieve(query)
+        results["vector"][0].append(time.perf_counter() - start)
+        results["vector"][1].append(any(f"PO: {poid} " in result.node.get_content() for result in dense))
+
+        start = time.perf_counter()
+        fused = fuse_keyword_results(query, deep_retriever.retrieve(query), TOP_K)
+        results["hybrid"][0].append(time.perf_counter() - start)
+        results["hybrid"][1].append(any(f"PO: {poid} " in result.node.get_content() for result in fused))
+
+    print(f"live lookups ({len(targets)} PO IDs, top {TOP_K})")
+    for label, (latencies, hits) in results.items():
+        report(label, latencies, hits)
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    rows = int(args[0]) if args else 100_000
+
+    print("=" * 78)
+    print(f"Hybrid retrieval benchmark ({rows:,} synthetic rows)")
+    print("=" * 78)
+    bench_keyword_index(rows)
+
+    if "--no-live" not in sys.argv:
+        try:
+            bench_live()
+        except Exception as e:
+            print(f"ChromaDB/Ollama unavailable, skipping live comparison: {e}")
+
+
+if __name__ == "__main__":
+    main()
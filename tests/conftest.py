@@ -175,6 +175,73 @@ def mock_llm_response():
     return MockLLM()
 
 
+@pytest.fixture
+def stub_embedding_server():
+    """
+    Local stand-in for Ollama's /api/embed endpoint so embedding code can be
+    tested offline. Returns deterministic vectors derived from each input text.
+    
+    The yielded object exposes `base_url`, `requests` (texts per call),
+    and `delay` / `fail_next` knobs to simulate a slow or failing server.
+    """
+    import json
+    import threading
+    import time
+    import hashlib
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class StubState:
+        delay = 0.0
+        fail_next = 0
+        requests = []
+    
+    state = StubState()
+    lock = threading.Lock()
+    
+    def vector_for(text):
+        digest = hashlib.sha256(text.encode()).digest()
+        return [b / 255.0 for b in digest[:8]]
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            with lock:
+                state.requests.append(texts)
+                fail = state.fail_next > 0
+                if fail:
+                    state.fail_next -= 1
+            time.sleep(state.delay)
+            if fail:
+                self.send_response(500)
+                self.end_headers()
+                self.wfile.write(b'{"error": "stub failure"}')
+                return
+            payload = json.dumps({
+                "model": body.get("model"),
+                "embeddings": [vector_for(t) for t in texts]
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    state.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    state.vector_for = staticmethod(vector_for)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    
+    yield state
+    
+    server.shutdown()
+    server.server_close()
+
+
 # ============================================================================
 # Test Data Paths
 # ============================================================================
@@ -2,6 +2,7 @@
 Unit tests for agent classes.
 Tests agent initialization, prompt formatting, and base functionality.
 """
+from collections import OrderedDict
 import pytest
 from backend.agents import (
     Agent,
@@ -15,6 +16,14 @@ from backend.agents import (
 )
 
 
+@pytest.fixture(autouse=True)
+def no_local_indexes(monkeypatch):
+    """Retrieval tests use fake vector stores; keyword fusion and exact lookups are enabled per test"""
+    from backend.config import Config
+    monkeypatch.setattr(Config, "HYBRID_RETRIEVAL_ENABLED", False)
+    monkeypatch.setattr(Config, "KEY_INDEX_ENABLED", False)
+
+
 @pytest.mark.unit
 class TestBaseAgent:
     """Test base Agent class"""
@@ -140,3 +149,685 @@ class TestAgentMethods:
         
         if hasattr(agent, '_generate_insight'):
             assert callable(agent._generate_insight)
+
+
+class FakeIndex:
+    """Counts query engines built from the shared index"""
+    def __init__(self):
+        self.built = []
+
+    def as_query_engine(self, **kwargs):
+        self.built.append(kwargs)
+        return object()
+
+
+@pytest.fixture
+def fake_index(monkeypatch):
+    import backend.agents as agents
+    index = FakeIndex()
+    monkeypatch.setattr(agents, "_index_cache", index)
+    monkeypatch.setattr(agents, "_query_engine_cache", OrderedDict())
+    return index
+
+
+@pytest.mark.unit
+class TestQueryEngineCache:
+    """Test that query engines are built once and reused"""
+
+    def test_engine_reused(self, fake_index):
+        """Test that the same key returns the same engine"""
+        from backend.agents import get_query_engine
+        first = get_query_engine("Spend Analysis Agent", "{context_str} {query_str}")
+        second = get_query_engine("Spend Analysis Agent", "{context_str} {query_str}")
+
+        assert first is second
+        assert len(fake_index.built) == 1
+
+    def test_key_includes_top_k_and_mode(self, fake_index):
+        """Test that different retrieval settings get their own engine"""
+        from backend.agents import get_query_engine
+        get_query_engine("mcp", similarity_top_k=5)
+        get_query_engine("mcp", similarity_top_k=10)
+        get_query_engine("mcp", similarity_top_k=10, response_mode="tree_summarize")
+
+        assert [kwargs["similarity_top_k"] for kwargs in fake_index.built] == [5, 10, 10]
+        assert "text_qa_template" not in fake_index.built[0]
+
+    def test_least_recently_used_engine_evicted(self, fake_index, monkeypatch):
+        """Test that the cache keeps only the most recently used engines"""
+        import backend.agents as agents
+        from backend.agents import get_query_engine
+        monkeypatch.setattr(agents, "_MAX_CACHED_QUERY_ENGINES", 2)
+        get_query_engine("mcp", filters={"source": "a.csv"})
+        get_query_engine("mcp", filters={"source": "b.csv"})
+        get_query_engine("mcp", filters={"source": "a.csv"})
+        get_query_engine("mcp", filters={"source": "c.csv"})
+
+        assert len(agents._query_engine_cache) == 2
+        get_query_engine("mcp", filters={"source": "a.csv"})
+        assert len(fake_index.built) == 3
+        get_query_engine("mcp", filters={"source": "b.csv"})
+        assert len(fake_index.built) == 4
+
+    def test_changed_prompt_rebuilds(self, fake_index):
+        """Test that an agent whose prompt changed does not reuse a stale engine"""
+        from backend.agents import get_query_engine
+        first = get_query_engine("General Assistant", "v1 {context_str} {query_str}")
+        second = get_query_engine("General Assistant", "v2 {context_str} {query_str}")
+
+        assert first is not second
+
+    def test_concurrent_callers_share_engine(self, fake_index):
+        """Test that concurrent first calls build a single engine"""
+        import threading
+        from backend.agents import get_query_engine
+        engines = []
+        threads = [
+            threading.Thread(target=lambda: engines.append(get_query_engine("Risk Monitoring Agent", "{query_str}")))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len({id(engine) for engine in engines}) == 1
+        assert len(fake_index.built) == 1
+
+
+@pytest.mark.unit
+class TestSharedRetrieval:
+    """Test retrieving context for several agents in one step"""
+
+    def test_one_embedding_batch_and_one_search(self, monkeypatch):
+        """Test that all queries are embedded and searched together"""
+        import math
+        import backend.agents as agents
+        from llama_index.core.schema import TextNode
+        from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+        calls = {"embed": [], "search": []}
+
+        class FakeEmbedModel:
+            def _format_query(self, query):
+                return query
+
+            def get_general_text_embeddings(self, texts):
+                calls["embed"].append(texts)
+                return [[float(i)] for i, _ in enumerate(texts)]
+
+        class FakeCollection:
+            def query(self, query_embeddings, n_results):
+                calls["search"].append(query_embeddings)
+                node = TextNode(text="row", id_="n1")
+                metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=False)
+                return {
+                    "documents": [["row"] for _ in query_embeddings],
+                    "metadatas": [[metadata] for _ in query_embeddings],
+                    "distances": [[embedding[0]] for embedding in query_embeddings],
+                }
+
+        monkeypatch.setattr(agents, "get_embed_model", lambda: FakeEmbedModel())
+        monkeypatch.setattr(agents, "get_chroma_collection", lambda: FakeCollection())
+        retrieved = agents.retrieve_many(["spend", "risk", "spend"], similarity_top_k=4)
+
+        assert calls["embed"] == [["spend", "risk"]]
+        assert len(calls["search"]) == 1
+        assert retrieved["risk"][0].node.node_id == "n1"
+        assert retrieved["risk"][0].score == pytest.approx(math.exp(-1.0))
+
+    def test_complete_analysis_embeds_once_across_groups(self, monkeypatch):
+        """Test that agents retrieving with different levels share one embedding batch"""
+        import backend.agents as agents
+
+        calls = {"embed": [], "search": []}
+
+        class FakeEmbedModel:
+            def _format_query(self, query):
+                return query
+
+            def get_general_text_embeddings(self, texts):
+                calls["embed"].append(texts)
+                return [[0.0] for _ in texts]
+
+        class FakeCollection:
+            def query(self, query_embeddings, n_results, where=None):
+                calls["search"].append(where)
+                return {key: [[] for _ in query_embeddings] for key in ("documents", "metadatas", "distances")}
+
+        class SupplierAgent:
+            doc_levels = ("supplier",)
+
+            def use_retrieved(self, query, nodes):
+                self.nodes = nodes
+
+            def run(self, query):
+                return self.nodes
+
+        class RowAgent(SupplierAgent):
+            doc_levels = None
+
+        monkeypatch.setattr(agents, "get_embed_model", lambda: FakeEmbedModel())
+        monkeypatch.setattr(agents, "get_chroma_collection", lambda: FakeCollection())
+        dict(agents.run_complete_analysis({"a": ("q1", SupplierAgent), "b": ("q2", RowAgent)}))
+
+        assert calls["embed"] == [["q1", "q2"]]
+        # Summary search, its fallback to all documents, and the row search
+        assert len(calls["search"]) == 3
+
+    def test_complete_analysis_uses_shared_nodes(self, monkeypatch):
+        """Test that each agent answers from the shared retrieval"""
+        import backend.agents as agents
+
+        class FakeAgent:
+            def __init__(self):
+                self.retrieved = {}
+
+            def use_retrieved(self, query, nodes):
+                self.retrieved[query] = nodes
+
+            def run(self, query):
+                if query == "fail":
+                    raise RuntimeError("boom")
+                return f"{query}:{self.retrieved[query]}"
+
+        monkeypatch.setattr(
+            agents, "retrieve_many", lambda queries, doc_levels=None, filters=None, embeddings=None: {query: [query.upper()] for query in queries}
+        )
+        monkeypatch.setattr(agents, "embed_queries", lambda queries: [[0.0] for _ in queries])
+        results = dict(agents.run_complete_analysis({"a": ("spend", FakeAgent), "b": ("fail", FakeAgent)}))
+
+        assert results["a"] == "spend:['SPEND']"
+        assert results["b"] == "Error: boom"
+
+
+@pytest.mark.unit
+class TestStreaming:
+    """Test streaming agent answers token by token"""
+
+    def test_stream_yields_tokens(self, monkeypatch):
+        """Test that stream() returns the response tokens and records time to first token"""
+        import backend.agents as agents
+
+        class StreamingResponse:
+            response_gen = iter(["Top ", "", "suppliers"])
+
+        class FakeEngine:
+            def query(self, query):
+                return StreamingResponse()
+
+        built = []
+
+        def fake_get_query_engine(name, prompt, **kwargs):
+            built.append(kwargs["streaming"])
+            return FakeEngine()
+
+        monkeypatch.setattr(agents, "get_query_engine", fake_get_query_engine)
+        agent = SupplierIntelligenceAgent()
+        tokens = list(agent.stream("top suppliers"))
+
+        assert tokens == ["Top ", "suppliers"]
+        assert built == [True]
+        assert agent.last_timings["first_token"] is not None
+
+    def test_run_not_streaming_after_stream(self, monkeypatch):
+        """Test that run() after stream() returns a plain string"""
+        import backend.agents as agents
+
+        class FakeEngine:
+            def query(self, query):
+                return "full answer"
+
+        monkeypatch.setattr(agents, "get_query_engine", lambda name, prompt, **kwargs: FakeEngine())
+        agent = SpendAnalysisAgent()
+        list(agent.stream("spend"))
+
+        assert agent.run("spend") == "full answer"
+
+    def test_run_while_stream_pending(self, monkeypatch):
+        """Test that a stream in progress does not make other runs of the agent stream"""
+        import backend.agents as agents
+
+        class FakeEngine:
+            def __init__(self, streaming):
+                self.streaming = streaming
+
+            def query(self, query):
+                if self.streaming:
+                    class StreamingResponse:
+                        response_gen = iter(["streamed"])
+                    return StreamingResponse()
+                return "full answer"
+
+        monkeypatch.setattr(agents, "get_query_engine", lambda name, prompt, **kwargs: FakeEngine(kwargs["streaming"]))
+        agent = SpendAnalysisAgent()
+        tokens = agent.stream("spend")
+
+        assert agent.run("spend") == "full answer"
+        assert list(tokens) == ["streamed"]
+
+    def test_closing_stream_closes_llm_stream(self, monkeypatch):
+        """Test that abandoning a stream part way closes the LLM's token stream"""
+        import backend.agents as agents
+        closed = []
+
+        def llm_tokens():
+            try:
+                yield "Top "
+                yield "suppliers"
+            finally:
+                closed.append(True)
+
+        class StreamingResponse:
+            response_gen = llm_tokens()
+
+        class FakeEngine:
+            def query(self, query):
+                return StreamingResponse()
+
+        monkeypatch.setattr(agents, "get_query_engine", lambda name, prompt, **kwargs: FakeEngine())
+        tokens = SupplierIntelligenceAgent().stream("top suppliers")
+        assert next(tokens) == "Top "
+        tokens.close()
+
+        assert closed == [True]
+
+
+@pytest.mark.unit
+class TestFactSheetPrompts:
+    """Test that agents get their precomputed fact sheet sections"""
+
+    def test_fact_sheet_in_prompt(self, monkeypatch):
+        """Test that the agent's sections are requested and added to its prompt"""
+        import backend.agents as agents
+
+        class FakeEngine:
+            def query(self, query):
+                return "answer"
+
+        requested, prompts = [], []
+        monkeypatch.setattr(agents, "get_fact_sheet", lambda sections, filters=None: requested.append(sections) or "Total spend $400.00")
+        monkeypatch.setattr(
+            agents, "get_query_engine", lambda name, prompt, **kwargs: prompts.append(prompt) or FakeEngine()
+        )
+        SpendAnalysisAgent().run("spend by category")
+
+        assert requested == [("overview", "spend")]
+        assert "Total spend $400.00" in prompts[0]
+        assert prompts[0].index("Total spend") < prompts[0].index("{context_str}")
+
+    def test_fact_sheet_follows_scope(self, monkeypatch):
+        """Test that a scoped agent's figures cover the same file and rows as its retrieval"""
+        import backend.agents as agents
+
+        class FakeEngine:
+            def query(self, query):
+                return "answer"
+
+        requested, prompts = [], []
+        monkeypatch.setattr(agents, "get_fact_sheet", lambda sections, filters=None: requested.append(filters) or "High 2")
+        monkeypatch.setattr(
+            agents, "get_query_engine", lambda name, prompt, **kwargs: prompts.append(prompt) or FakeEngine()
+        )
+        agent = RiskMonitoringAgent()
+        agent.set_scope({"source": "po.csv"})
+        agent.run("risks")
+
+        assert requested == [{"risk_level": ["High", "Medium"], "source": "po.csv"}]
+        assert "the data where risk_level in High, Medium; source = po.csv" in prompts[0]
+        assert "full data set" not in prompts[0]
+
+    def test_no_fact_sheet(self, monkeypatch):
+        """Test that the prompt is unchanged when no facts are available"""
+        import backend.agents as agents
+
+        class FakeEngine:
+            def query(self, query):
+                return "answer"
+
+        prompts = []
+        monkeypatch.setattr(agents, "get_fact_sheet", lambda sections, filters=None: "")
+        monkeypatch.setattr(
+            agents, "get_query_engine", lambda name, prompt, **kwargs: prompts.append(prompt) or FakeEngine()
+        )
+        RiskMonitoringAgent().run("risks")
+
+        assert "Key figures" not in prompts[0]
+
+
+@pytest.mark.unit
+class TestSummaryLevels:
+    """Test that agents prefer summary documents of their levels"""
+
+    def test_retriever_falls_back_without_summaries(self):
+        """Test that rows are retrieved when no summaries of the levels are indexed"""
+        from backend.agents import LevelPreferringRetriever
+        from llama_index.core.schema import NodeWithScore, TextNode
+
+        summary, row = NodeWithScore(node=TextNode(text="summary")), NodeWithScore(node=TextNode(text="row"))
+
+        class FakeRetriever:
+            def __init__(self, nodes):
+                self.nodes = nodes
+
+            def retrieve(self, query_bundle):
+                return self.nodes
+
+        class FakeIndex:
+            def __init__(self, summaries):
+                self.summaries = summaries
+
+            def as_retriever(self, similarity_top_k, filters=None):
+                if filters is not None:
+                    assert filters.filters[0].key == "doc_level"
+                    return FakeRetriever(self.summaries)
+                return FakeRetriever([row])
+
+        assert LevelPreferringRetriever(FakeIndex([summary]), 4, ("supplier",)).retrieve("q") == [summary]
+        assert LevelPreferringRetriever(FakeIndex([]), 4, ("supplier",)).retrieve("q") == [row]
+
+    def test_retrieve_many_filters_by_level(self, monkeypatch):
+        """Test that shared retrieval filters by level and falls back per query"""
+        import backend.agents as agents
+        from llama_index.core.schema import TextNode
+        from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+        calls = []
+
+        class FakeEmbedModel:
+            def _format_query(self, query):
+                return query
+
+            def get_general_text_embeddings(self, texts):
+                return [[float(i)] for i, _ in enumerate(texts)]
+
+        class FakeCollection:
+            def query(self, query_embeddings, n_results, where=None):
+                calls.append(where)
+                metadata = node_to_metadata_dict(TextNode(text="doc", id_="n1"), remove_text=True, flat_metadata=False)
+                # Only the first query has summaries of the requested levels
+                found = [where is None or embedding == [0.0] for embedding in query_embeddings]
+                return {
+                    "documents": [["doc"] if hit else [] for hit in found],
+                    "metadatas": [[metadata] if hit else [] for hit in found],
+                    "distances": [[0.0] if hit else [] for hit in found],
+                }
+
+        monkeypatch.setattr(agents, "get_embed_model", lambda: FakeEmbedModel())
+        monkeypatch.setattr(agents, "get_chroma_collection", lambda: FakeCollection())
+        retrieved = agents.retrieve_many(["spend", "risk"], doc_levels=("category", "month"))
+
+        assert calls == [{"doc_level": {"$in": ["category", "month"]}}, None]
+        assert len(retrieved["spend"]) == 1 and len(retrieved["risk"]) == 1
+
+    def test_complete_analysis_groups_by_level(self, monkeypatch):
+        """Test that shared retrieval runs once per set of levels"""
+        import backend.agents as agents
+
+        class SupplierAgent:
+            doc_levels = ("supplier",)
+
+            def use_retrieved(self, query, nodes):
+                self.nodes = nodes
+
+            def run(self, query):
+                return self.nodes
+
+        class RowAgent(SupplierAgent):
+            doc_levels = None
+
+        calls = []
+
+        def fake_retrieve_many(queries, doc_levels=None, filters=None, embeddings=None):
+            calls.append((sorted(queries), doc_levels))
+            return {query: [doc_levels] for query in queries}
+
+        monkeypatch.setattr(agents, "retrieve_many", fake_retrieve_many)
+        monkeypatch.setattr(agents, "embed_queries", lambda queries: [[0.0] for _ in queries])
+        results = dict(agents.run_complete_analysis(
+            {"a": ("q1", SupplierAgent), "b": ("q2", SupplierAgent), "c": ("q3", RowAgent)}
+        ))
+
+        assert sorted(calls, key=str) == sorted([(["q1", "q2"], ("supplier",)), (["q3"], None)], key=str)
+        assert results == {"a": [("supplier",)], "b": [("supplier",)], "c": [None]}
+
+
+@pytest.mark.unit
+class TestHybridRetrieval:
+    """Test fusing vector results with keyword matches"""
+
+    def test_keyword_match_fused_into_results(self, monkeypatch, tmp_path):
+        """Test that a row found only by its ID is fetched from Chroma and ranked first"""
+        import backend.agents as agents
+        from backend.keyword_index import KeywordIndex
+        from llama_index.core import Document
+        from llama_index.core.schema import NodeWithScore, TextNode
+        from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+        keyword_index = KeywordIndex(str(tmp_path / "keywords.sqlite3"))
+        keyword_index.add([
+            Document(id_="po-193", text="PO: PO-2024-0193 | Supplier: Acme", metadata={"source": "po.csv"}),
+            Document(id_="other", text="PO: PO-2024-0001 | Supplier: Beta", metadata={"source": "po.csv"}),
+        ])
+
+        texts = {"po-193": "PO: PO-2024-0193 | Supplier: Acme", "other": "PO: PO-2024-0001 | Supplier: Beta"}
+
+        class FakeCollection:
+            def get(self, ids, include):
+                assert "po-193" in ids
+                metadatas = [
+                    node_to_metadata_dict(TextNode(text="", id_=node_id), remove_text=True, flat_metadata=False)
+                    for node_id in ids
+                ]
+                return {"ids": ids, "documents": [texts[node_id] for node_id in ids], "metadatas": metadatas}
+
+        monkeypatch.setattr(agents, "get_keyword_index", lambda: keyword_index)
+        monkeypatch.setattr(agents, "get_chroma_collection", lambda: FakeCollection())
+        dense = [NodeWithScore(node=TextNode(text="other", id_=f"dense-{i}"), score=0.9) for i in range(3)]
+
+        fused = agents.fuse_keyword_results("status of PO-2024-0193", dense, 2)
+
+        assert [result.node.node_id for result in fused] == ["po-193", "dense-0"]
+        assert fused[0].node.get_content() == "PO: PO-2024-0193 | Supplier: Acme"
+
+    def test_filtered_keyword_matches_keep_top_k(self, monkeypatch, tmp_path):
+        """Test that keyword matches failing the filters give their slots to dense results"""
+        import backend.agents as agents
+        from backend.keyword_index import KeywordIndex
+        from llama_index.core import Document
+        from llama_index.core.schema import NodeWithScore, TextNode
+
+        keyword_index = KeywordIndex(str(tmp_path / "keywords.sqlite3"))
+        keyword_index.add([
+            Document(id_=f"low-{i}", text=f"Supplier: Acme | Risk: Low | row {i}", metadata={"source": "po.csv"})
+            for i in range(5)
+        ])
+
+        class FakeCollection:
+            def get(self, ids, include, where=None):
+                # Chroma applies the where clause: none of the keyword matches is high risk
+                assert where == {"risk_level": {"$in": ["High", "Medium"]}}
+                return {"ids": [], "documents": [], "metadatas": []}
+
+        monkeypatch.setattr(agents, "get_keyword_index", lambda: keyword_index)
+        monkeypatch.setattr(agents, "get_chroma_collection", lambda: FakeCollection())
+        dense = [NodeWithScore(node=TextNode(text="high", id_=f"high-{i}"), score=0.9) for i in range(4)]
+
+        fused = agents.fuse_keyword_results("Acme", dense, 3, filters={"risk_level": ["High", "Medium"]})
+
+        assert [result.node.node_id for result in fused] == ["high-0", "high-1", "high-2"]
+
+    def test_dense_results_without_keyword_matches(self, monkeypatch, tmp_path):
+        """Test that dense results pass through when nothing matches or the index is disabled"""
+        import backend.agents as agents
+        from backend.keyword_index import KeywordIndex
+        from llama_index.core.schema import NodeWithScore, TextNode
+
+        dense = [NodeWithScore(node=TextNode(text="row", id_=f"n{i}"), score=0.9) for i in range(3)]
+        assert agents.fuse_keyword_results("spend trends", dense, 2) == dense[:2]
+
+        keyword_index = KeywordIndex(str(tmp_path / "keywords.sqlite3"))
+        monkeypatch.setattr(agents, "get_keyword_index", lambda: keyword_index)
+        assert agents.fuse_keyword_results("spend trends", dense, 2) == dense[:2]
+
+
+@pytest.mark.unit
+class TestExactLookup:
+    """Test answering questions that name an ID from its rows"""
+
+    def test_named_id_skips_retrieval(self, monkeypatch):
+        """Test that the rows of a mentioned PO are the context and no vector search runs"""
+        import pandas as pd
+        import backend.agents as agents
+
+        monkeypatch.setattr(agents, "mentioned_keys", lambda query: [("po", "po-7")])
+        monkeypatch.setattr(agents, "find_rows", lambda field, key, source=None, limit=None: (1, [
+            ("po.csv", pd.DataFrame({"POID": ["PO-7"], "PODate": pd.to_datetime(["2024-01-10"])}, index=[41]))
+        ]))
+        monkeypatch.setattr(agents, "get_fact_sheet", lambda sections, filters=None: "")
+        synthesized = []
+
+        class FakeEngine:
+            def synthesize(self, query_bundle, nodes):
+                synthesized.append(nodes)
+                return "PO-7 answer"
+
+            def query(self, query):
+                raise AssertionError("vector search should be skipped")
+
+        monkeypatch.setattr(agents, "get_query_engine", lambda name, prompt, **kwargs: FakeEngine())
+
+        class POQuestionAgent(POAutomationAgent):
+            exact_lookup = True
+
+        assert POQuestionAgent().run("What is the status of PO-7?") == "PO-7 answer"
+        node = synthesized[0][0].node
+        assert "PO: PO-7 | Date: 2024-01-10" in node.get_content()
+        assert (node.metadata["source"], node.metadata["row_index"]) == ("po.csv", 41)
+
+    def test_analysis_prompts_retrieve(self, monkeypatch):
+        """Test that agents running fixed analysis prompts never answer from looked-up rows"""
+        import backend.agents as agents
+
+        def fail_lookup(query, **kwargs):
+            raise AssertionError("analysis prompts should not be looked up")
+
+        class FakeEngine:
+            def query(self, query):
+                return "retrieved answer"
+
+        monkeypatch.setattr(agents, "exact_nodes", fail_lookup)
+        monkeypatch.setattr(agents, "get_fact_sheet", lambda sections, filters=None: "")
+        monkeypatch.setattr(agents, "get_query_engine", lambda name, prompt, **kwargs: FakeEngine())
+
+        assert POAutomationAgent().run("Analyze Purchase Orders for delays in 2024.") == "retrieved answer"
+
+    def test_disabled_index_retrieves(self):
+        """Test that nothing is looked up when the key index is disabled"""
+        import backend.agents as agents
+        assert agents.exact_nodes("Which suppliers are high risk?") == []
+
+
+@pytest.mark.unit
+class TestMetadataFilters:
+    """Test filtering retrieval on document metadata"""
+
+    def test_where_clauses(self):
+        """Test Chroma where clauses for single values, lists and summary levels"""
+        from backend.agents import chroma_where
+        assert chroma_where(None) is None
+        assert chroma_where({"source": "po.csv"}) == {"source": "po.csv"}
+        assert chroma_where({"risk_level": ["High", "Medium"]}, ("supplier",)) == {"$and": [
+            {"risk_level": {"$in": ["High", "Medium"]}}, {"doc_level": {"$in": ["supplier"]}}
+        ]}
+
+    def test_merge_overrides_and_validates(self):
+        """Test that later filters override earlier ones and unknown fields are rejected"""
+        from backend.agents import merge_filters
+        assert merge_filters({"risk_level": ["High"]}, {"risk_level": "Low", "source": "po.csv"}) == {
+            "risk_level": "Low", "source": "po.csv"
+        }
+        assert merge_filters({"source": None}, None) is None
+        with pytest.raises(ValueError):
+            merge_filters({"amount": 5})
+
+    def test_risk_agent_scoped_retrieval(self, monkeypatch):
+        """Test that the risk agent retrieves High/Medium documents of the scoped file only"""
+        import backend.agents as agents
+        used = []
+
+        class FakeEngine:
+            def query(self, query):
+                return "answer"
+
+        def fake_get_query_engine(name, prompt, **kwargs):
+            used.append(kwargs["filters"])
+            return FakeEngine()
+
+        monkeypatch.setattr(agents, "get_query_engine", fake_get_query_engine)
+        monkeypatch.setattr(agents, "get_fact_sheet", lambda sections, filters=None: "")
+        agent = RiskMonitoringAgent()
+        agent.run("risks")
+        agent.set_scope({"source": "po.csv"})
+        agent.run("risks")
+
+        assert used == [
+            {"risk_level": ["High", "Medium"]},
+            {"risk_level": ["High", "Medium"], "source": "po.csv"},
+        ]
+
+    def test_retrieve_many_filters_and_falls_back(self, monkeypatch):
+        """Test that filters apply to both the summary search and the fallback"""
+        import backend.agents as agents
+
+        calls = []
+
+        class FakeEmbedModel:
+            def _format_query(self, query):
+                return query
+
+            def get_general_text_embeddings(self, texts):
+                return [[0.0] for _ in texts]
+
+        class FakeCollection:
+            def query(self, query_embeddings, n_results, where=None):
+                calls.append(where)
+                return {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+        monkeypatch.setattr(agents, "get_embed_model", lambda: FakeEmbedModel())
+        monkeypatch.setattr(agents, "get_chroma_collection", lambda: FakeCollection())
+        agents.retrieve_many(["risk"], doc_levels=("supplier",), filters={"source": "po.csv"})
+
+        assert calls == [
+            {"$and": [{"source": "po.csv"}, {"doc_level": {"$in": ["supplier"]}}]},
+            {"source": "po.csv"},
+        ]
+
+    def test_complete_analysis_groups_by_filters(self, monkeypatch):
+        """Test that agents with different filters get separate shared retrievals, all scoped"""
+        import backend.agents as agents
+
+        class RowAgent:
+            def use_retrieved(self, query, nodes):
+                self.nodes = nodes
+
+            def set_scope(self, filters):
+                self.scope = filters
+
+            def run(self, query):
+                return (self.nodes, self.scope)
+
+        class HighRiskAgent(RowAgent):
+            filters = {"risk_level": ["High"]}
+
+        def fake_retrieve_many(queries, doc_levels=None, filters=None, embeddings=None):
+            return {query: filters for query in queries}
+
+        monkeypatch.setattr(agents, "retrieve_many", fake_retrieve_many)
+        monkeypatch.setattr(agents, "embed_queries", lambda queries: [[0.0] for _ in queries])
+        results = dict(agents.run_complete_analysis(
+            {"a": ("q1", RowAgent), "b": ("q2", HighRiskAgent)}, filters={"source": "po.csv"}
+        ))
+
+        assert results["a"] == ({"source": "po.csv"}, {"source": "po.csv"})
+        assert results["b"] == ({"risk_level": ["High"], "source": "po.csv"}, {"source": "po.csv"})
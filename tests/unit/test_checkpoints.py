@@ -0,0 +1,86 @@
+"""
+Unit tests for ingestion checkpoints.
+Tests job state transitions and resume bookkeeping.
+"""
+import pytest
+from backend.checkpoints import CheckpointStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CheckpointStore(path=str(tmp_path / "state.sqlite3"))
+
+
+@pytest.mark.unit
+class TestCheckpointStore:
+    """Test the local ingestion state store"""
+
+    def test_new_job_has_no_committed_chunks(self, store):
+        """Test that a first run starts from scratch"""
+        assert store.start("po.csv", chunk_rows=100) == {}
+        assert store.get_job("po.csv")["status"] == "running"
+
+    def test_failed_job_resumes_committed_chunks(self, store):
+        """Test that a retry sees the chunks committed before the failure"""
+        store.start("po.csv", chunk_rows=100)
+        store.commit_chunk("po.csv", 1, "d1", rows=100)
+        store.commit_chunk("po.csv", 2, "d2", rows=200)
+        store.fail("po.csv", "Embedding timed out")
+
+        job = store.get_job("po.csv")
+        assert job["status"] == "failed"
+        assert job["committed_chunk"] == 2
+        assert job["committed_rows"] == 200
+
+        assert store.start("po.csv", chunk_rows=100) == {1: "d1", 2: "d2"}
+
+    def test_changed_chunk_size_restarts(self, store):
+        """Test that checkpoints are discarded when chunking changes"""
+        store.start("po.csv", chunk_rows=100)
+        store.commit_chunk("po.csv", 1, "d1", rows=100)
+        store.fail("po.csv", "boom")
+
+        assert store.start("po.csv", chunk_rows=50) == {}
+        assert store.get_job("po.csv")["committed_chunk"] == 0
+
+    def test_completed_job_restarts_and_is_not_listed(self, store):
+        """Test that finished jobs start over and drop out of the incomplete list"""
+        store.start("done.csv", chunk_rows=100)
+        store.commit_chunk("done.csv", 1, "d1", rows=100)
+        store.finish("done.csv")
+        store.start("broken.csv", chunk_rows=100)
+        store.fail("broken.csv", "boom")
+
+        assert [job["source"] for job in store.incomplete_jobs()] == ["broken.csv"]
+        assert store.start("done.csv", chunk_rows=100) == {}
+
+    def test_state_persists_across_instances(self, tmp_path):
+        """Test that checkpoints survive a process restart"""
+        path = str(tmp_path / "state.sqlite3")
+        first = CheckpointStore(path=path)
+        first.start("po.csv", chunk_rows=100)
+        first.commit_chunk("po.csv", 1, "d1", rows=100)
+
+        second = CheckpointStore(path=path)
+        assert second.incomplete_jobs()[0]["source"] == "po.csv"
+        assert second.start("po.csv", chunk_rows=100) == {1: "d1"}
+
+    def test_forget_removes_job(self, store):
+        """Test that deleting a file drops its job"""
+        store.start("po.csv", chunk_rows=100)
+        store.forget("po.csv")
+
+        assert store.get_job("po.csv") is None
+
+    def test_data_version_changes_with_ingestion(self, store):
+        """Test that the data version changes when files are ingested or removed"""
+        versions = [store.data_version()]
+        store.start("po.csv", chunk_rows=100)
+        versions.append(store.data_version())
+        store.finish("po.csv")
+        versions.append(store.data_version())
+        store.forget("po.csv")
+        versions.append(store.data_version())
+
+        assert len(set(versions[:3])) == 3
+        assert versions[3] != versions[2]
@@ -0,0 +1,198 @@
+"""
+Unit tests for the typed Parquet copy of uploaded CSVs.
+Tests dtype normalisation and chunked Parquet writing.
+"""
+import io
+import pytest
+import pandas as pd
+from backend.columnar import (
+    ParquetCopyWriter, typed_frame, numeric_columns, parquet_object_name, manifest_metadata, parse_manifest_metadata,
+    read_parquet_rows
+)
+from backend.config import Config
+
+
+@pytest.mark.unit
+class TestTypedFrame:
+    """Test dtype normalisation"""
+
+    def test_dates_and_categories(self):
+        """Test that date and categorical columns get proper dtypes"""
+        df = pd.DataFrame({
+            'PODate': ['2024-01-15', '2024-02-01'],
+            'ContractEndDate': ['2025-01-01', 'not a date'],
+            'SupplierRiskLevel': ['High', 'Low'],
+            'SupplierName': ['Acme', 'Beta'],
+            'TotalAmount': [100.0, 200.0],
+        })
+        typed = typed_frame(df)
+
+        assert typed['PODate'].dtype == 'datetime64[ns]'
+        # One unparseable value keeps the column's raw strings rather than writing NaT
+        assert typed['ContractEndDate'].tolist() == ['2025-01-01', 'not a date']
+        assert isinstance(typed['SupplierRiskLevel'].dtype, pd.CategoricalDtype)
+        assert typed['SupplierName'].dtype == object
+        assert df['PODate'].dtype == object  # input left untouched
+
+    def test_mixed_date_formats(self):
+        """Test that each value is parsed with the first format that fits it"""
+        df = pd.DataFrame({'ContractEndDate': ['01/02/2025', '25/12/2025', '2025-03-01', '2025-04-01 10:00:00', None]})
+        typed = typed_frame(df)
+
+        assert typed['ContractEndDate'].dt.strftime('%Y-%m-%d').tolist()[:4] == [
+            '2025-01-02', '2025-12-25', '2025-03-01', '2025-04-01'
+        ]
+        assert pd.isna(typed['ContractEndDate'].iloc[4])
+
+    def test_numeric_text_columns(self):
+        """Test that text columns of numbers become numbers and other text is kept"""
+        df = numeric_columns(pd.DataFrame({
+            'TotalAmount': ['100.50', None], 'OnTimeDelivery%': ['95', '90'],
+            'SupplierID': ['S001', '2'], 'Unit': ['1', '2'], 'PODate': ['20240115', None]
+        }))
+
+        assert df['TotalAmount'].tolist()[0] == 100.5
+        assert df['OnTimeDelivery%'].dtype == 'int64'
+        assert df['SupplierID'].tolist() == ['S001', '2']
+        assert df['Unit'].tolist() == ['1', '2']
+        assert df['PODate'].tolist()[0] == '20240115'
+
+    def test_parquet_copy_is_hidden_under_prefix(self):
+        """Test that the copy's object name lives under the reserved prefix"""
+        assert parquet_object_name('po.csv').startswith(Config.MINIO_PARQUET_PREFIX)
+
+
+@pytest.mark.unit
+class TestParquetCopyWriter:
+    """Test chunked Parquet writing"""
+
+    def write_chunks(self, chunks, **kwargs):
+        sink = io.BytesIO()
+        writer = ParquetCopyWriter(sink, **kwargs)
+        for chunk in chunks:
+            writer.write(chunk)
+        writer.close()
+        sink.seek(0)
+        return writer, sink
+
+    def test_chunks_share_one_schema(self):
+        """Test that chunks inferred differently are written with the first chunk's schema"""
+        first = pd.DataFrame({'Quantity': [1, 2], 'ItemCategory': ['IT', 'HR'], 'PODate': ['2024-01-01', '2024-01-02']})
+        second = pd.DataFrame({'Quantity': [3, None], 'ItemCategory': ['Facilities', 'IT'], 'PODate': ['2024-01-03', None]})
+        writer, sink = self.write_chunks([first, second])
+
+        df = pd.read_parquet(sink)
+        assert writer.rows == 4
+        assert df['ItemCategory'].astype(str).tolist() == ['IT', 'HR', 'Facilities', 'IT']
+        assert df['PODate'].dtype == 'datetime64[ns]'
+        assert df['Quantity'].iloc[2] == 3 and pd.isna(df['Quantity'].iloc[3])
+
+    @pytest.mark.parametrize('row_group_rows', [100_000, 2])
+    def test_types_widen_across_chunks(self, row_group_rows):
+        """Test that column types drifting between chunks are unified, before or after a row group is written"""
+        first = pd.DataFrame({
+            'Notes': [None, None], 'Quantity': [1, 2], 'ContractEndDate': ['2025-01-01', '2025-02-01'],
+            'SupplierRiskLevel': [None, None],
+        })
+        second = pd.DataFrame({
+            'Notes': ['hello', None], 'Quantity': [2.5, None], 'ContractEndDate': ['soon', None],
+            'SupplierRiskLevel': ['High', 'Low'],
+        })
+        writer, sink = self.write_chunks([first, second], row_group_rows=row_group_rows)
+
+        df = pd.read_parquet(sink)
+        assert writer.rows == 4
+        assert df['Notes'].tolist()[:3] == [None, None, 'hello']
+        assert df['Quantity'].tolist()[:3] == [1.0, 2.0, 2.5] and pd.isna(df['Quantity'].iloc[3])
+        assert df['ContractEndDate'].tolist()[:3] == ['2025-01-01', '2025-02-01', 'soon']
+        assert df['SupplierRiskLevel'].astype(str).tolist()[2:] == ['High', 'Low']
+        assert dict(writer.columns)['Quantity'] == 'float64'
+
+    def test_chunks_grouped_into_row_groups(self):
+        """Test that small chunks are combined into larger row groups"""
+        import pyarrow.parquet as pq
+        chunks = [pd.DataFrame({'TotalAmount': [float(i)] * 10}) for i in range(10)]
+        _, sink = self.write_chunks(chunks, row_group_rows=40)
+
+        metadata = pq.ParquetFile(sink).metadata
+        assert metadata.num_rows == 100
+        assert metadata.num_row_groups == 3
+
+    def test_column_projection(self):
+        """Test that only requested columns are read back"""
+        df = pd.DataFrame({'SupplierName': ['Acme'], 'TotalAmount': [1.0], 'Notes': ['x' * 100]})
+        _, sink = self.write_chunks([df])
+
+        assert pd.read_parquet(sink, columns=['TotalAmount']).columns.tolist() == ['TotalAmount']
+
+
+class FakeObjectStore:
+    """Serves one object's bytes by range, like MinIO's stat_object/get_object"""
+    def __init__(self, data):
+        self.data = data
+        self.bytes_served = 0
+
+    def stat_object(self, bucket, object_name):
+        return type('Stat', (), {'size': len(self.data)})()
+
+    def get_object(self, bucket, object_name, offset=0, length=None):
+        chunk = self.data[offset:offset + length]
+        self.bytes_served += len(chunk)
+        return type('Response', (), {
+            'read': lambda self: chunk, 'close': lambda self: None, 'release_conn': lambda self: None
+        })()
+
+
+@pytest.mark.unit
+class TestReadParquetRows:
+    """Test reading single rows by offset"""
+
+    def test_rows_read_by_offset(self):
+        """Test that rows come back indexed by offset, reading only their row groups"""
+        import os
+        chunks = [
+            pd.DataFrame({'POID': [f'PO-{i}' for i in range(start, start + 1000)], 'Notes': [os.urandom(64).hex() for _ in range(1000)]})
+            for start in range(0, 10000, 1000)
+        ]
+        sink = io.BytesIO()
+        writer = ParquetCopyWriter(sink, row_group_rows=1000)
+        for chunk in chunks:
+            writer.write(chunk)
+        writer.close()
+        store = FakeObjectStore(sink.getvalue())
+
+        df = read_parquet_rows(store, 'bucket', 'po.csv', [5120, 7, 5100])
+
+        assert df.index.tolist() == [7, 5100, 5120]
+        assert df['POID'].tolist() == ['PO-7', 'PO-5100', 'PO-5120']
+        assert store.bytes_served < len(store.data) / 2
+
+@pytest.mark.unit
+class TestManifestMetadata:
+    """Test row count and schema stored as object metadata"""
+
+    def test_round_trip_through_stat_headers(self):
+        """Test that metadata survives the x-amz-meta- prefix and header casing"""
+        metadata = manifest_metadata(1234, [['POID', 'object'], ['PODate', 'datetime64[ns]']])
+        headers = {f"X-Amz-Meta-{key.title()}": value for key, value in metadata.items()}
+
+        parsed = parse_manifest_metadata(headers)
+        assert parsed == {'row_count': 1234, 'columns': [['POID', 'object'], ['PODate', 'datetime64[ns]']]}
+
+    def test_wide_schema_left_out(self):
+        """Test that schemas too large for object metadata are omitted"""
+        columns = [[f'Column{i}', 'float64'] for i in range(200)]
+        parsed = parse_manifest_metadata(manifest_metadata(10, columns))
+
+        assert parsed == {'row_count': 10, 'columns': None}
+
+    def test_missing_metadata(self):
+        """Test that objects without a manifest report unknown values"""
+        assert parse_manifest_metadata(None) == {'row_count': None, 'columns': None}
+
+    def test_writer_records_typed_schema(self):
+        """Test that the writer exposes the schema of the typed frame"""
+        writer = ParquetCopyWriter(io.BytesIO())
+        writer.write(pd.DataFrame({'PODate': ['2024-01-01'], 'TotalAmount': [1.5]}))
+
+        assert writer.columns == [['PODate', 'datetime64[ns]'], ['TotalAmount', 'float64']]
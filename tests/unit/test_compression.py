@@ -0,0 +1,88 @@
+"""
+Unit tests for compressed object storage.
+Tests codec selection and round-trips through the streaming compressor.
+"""
+import io
+import gzip
+import pytest
+from backend import compression
+from backend.compression import compress_stream, decompress, decompress_stream, object_encoding, resolve_codec
+
+CSV = b"POID,SupplierName,TotalAmount\n" + b"".join(b"PO-%07d,Supplier %d,%d.50\n" % (i, i % 50, i) for i in range(20000))
+
+
+@pytest.mark.unit
+class TestResolveCodec:
+    """Test choosing the codec for new uploads"""
+
+    def test_defaults_to_config(self, monkeypatch):
+        """Test that the configured codec is used when none is given"""
+        monkeypatch.setattr(compression.Config, "MINIO_COMPRESSION", "GZIP")
+        assert resolve_codec() == "gzip"
+        assert resolve_codec("none") == "none"
+
+    def test_unknown_codec(self):
+        """Test that an unknown codec is rejected"""
+        with pytest.raises(ValueError):
+            resolve_codec("brotli")
+
+    def test_zstd_falls_back_to_gzip(self, monkeypatch):
+        """Test that zstd without the zstandard package uses gzip"""
+        monkeypatch.setattr(compression, "_zstandard", lambda: None)
+        assert resolve_codec("zstd") == "gzip"
+
+
+@pytest.mark.unit
+class TestRoundTrip:
+    """Test compressing a stream and decompressing the stored object"""
+
+    def test_gzip(self):
+        """Test that gzip output is a standard gzip file that shrinks CSV"""
+        stored = b"".join(compress_stream(io.BytesIO(CSV), "gzip"))
+
+        assert len(stored) < len(CSV) / 3
+        assert gzip.decompress(stored) == CSV
+        assert decompress(stored, "gzip") == CSV
+
+    def test_zstd(self):
+        """Test that zstd output round-trips"""
+        pytest.importorskip("zstandard")
+        stored = b"".join(compress_stream(io.BytesIO(CSV), "zstd"))
+
+        assert decompress(stored, "zstd") == CSV
+
+    def test_uncompressed_objects_unchanged(self):
+        """Test that objects without an encoding are returned as stored"""
+        assert decompress(CSV, object_encoding({"Content-Type": "text/csv"})) == CSV
+
+    def test_encoding_header_case_insensitive(self):
+        """Test that the codec is read from response headers in any case"""
+        assert object_encoding({"X-Amz-Meta-Content-Encoding": "gzip"}) == "gzip"
+
+
+@pytest.mark.unit
+class TestDecompressStream:
+    """Test reading a stored object back through the streaming decompressor"""
+
+    @pytest.mark.parametrize("codec", ["gzip", "zstd"])
+    def test_reads_original_bytes(self, codec):
+        """Test that small reads return the original bytes"""
+        if codec == "zstd":
+            pytest.importorskip("zstandard")
+        stored = b"".join(compress_stream(io.BytesIO(CSV), codec))
+        reader = decompress_stream(io.BytesIO(stored), codec)
+
+        blocks = iter(lambda: reader.read(1000), b"")
+        assert b"".join(blocks) == CSV
+
+    def test_closes_underlying_stream(self):
+        """Test that closing the reader closes the stored object's stream"""
+        source = io.BytesIO(b"".join(compress_stream(io.BytesIO(CSV), "gzip")))
+        decompress_stream(source, "gzip").close()
+
+        assert source.closed
+
+    def test_uncompressed_stream_unchanged(self):
+        """Test that objects without an encoding are read as stored"""
+        source = io.BytesIO(CSV)
+        assert decompress_stream(source, "none") is source
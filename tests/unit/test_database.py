@@ -0,0 +1,181 @@
+"""
+Unit tests for the shared MinIO client.
+Tests that the client and its bucket check are set up once per process.
+"""
+import threading
+import pytest
+import backend.database as database
+
+
+class FakeMinio:
+    """Records constructor and bucket_exists calls instead of talking to MinIO"""
+    instances = []
+    bucket_checks = 0
+
+    def __init__(self, endpoint, **kwargs):
+        self.http_client = kwargs.get("http_client")
+        FakeMinio.instances.append(self)
+
+    def bucket_exists(self, bucket):
+        FakeMinio.bucket_checks += 1
+        return True
+
+
+@pytest.fixture
+def fake_minio(monkeypatch):
+    FakeMinio.instances = []
+    FakeMinio.bucket_checks = 0
+    monkeypatch.setattr("minio.Minio", FakeMinio)
+    monkeypatch.setattr(database, "_minio_client_cache", None)
+    monkeypatch.setattr(database, "_ensured_buckets", set())
+    return FakeMinio
+
+
+@pytest.mark.unit
+class TestSharedMinioClient:
+    """Test the process-wide MinIO client"""
+
+    def test_same_instance_across_threads(self, fake_minio):
+        """Test that concurrent callers share one client"""
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(database.get_minio_client())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len({id(client) for client in clients}) == 1
+        assert len(fake_minio.instances) == 1
+
+    def test_bucket_checked_once(self, fake_minio):
+        """Test that the bucket round-trip is not repeated per instance"""
+        database.get_minio_client()
+        database.get_minio_client()
+        database.MinioClient()
+
+        assert fake_minio.bucket_checks == 1
+
+    def test_pooled_http_client(self, fake_minio):
+        """Test that the client uses a keep-alive pool sized from config"""
+        client = database.get_minio_client()
+
+        pool = client.client.http_client
+        assert pool.connection_pool_kw["maxsize"] == database.Config.MINIO_POOL_SIZE
+
+
+@pytest.mark.unit
+class TestStreamingUpload:
+    """Test that uploads are streamed to put_object as parallel multipart parts"""
+
+    @pytest.fixture
+    def uploads(self, fake_minio, monkeypatch):
+        calls = []
+
+        def put_object(self, bucket, object_name, data, length, **kwargs):
+            if kwargs.get("progress"):
+                kwargs["progress"].set_meta(object_name, length)
+            body = b""
+            while True:
+                part = data.read(4)
+                if not part:
+                    break
+                assert isinstance(part, bytes)
+                body += part
+                if kwargs.get("progress"):
+                    kwargs["progress"].update(len(part))
+            calls.append({"name": object_name, "body": body, "length": length, **kwargs})
+
+        monkeypatch.setattr(FakeMinio, "put_object", put_object, raising=False)
+        return calls
+
+    def test_iterable_is_streamed(self, uploads):
+        """Test that an iterator of chunks is uploaded with unknown length"""
+        database.get_minio_client().upload_file("big.csv", iter([b"a,b\n", b"", b"1,2\n3,4\n"]))
+
+        assert uploads[0]["body"] == b"a,b\n1,2\n3,4\n"
+        assert uploads[0]["length"] == -1
+
+    def test_part_size_and_concurrency(self, uploads, monkeypatch):
+        """Test that part size and parallelism default to config and can be overridden"""
+        monkeypatch.setattr(database.Config, "MINIO_PART_SIZE_MB", 8)
+        monkeypatch.setattr(database.Config, "MINIO_UPLOAD_CONCURRENCY", 3)
+        client = database.get_minio_client()
+        client.upload_file("a.csv", b"data")
+        client.upload_file("b.csv", b"data", part_size=5 * 1024 * 1024, parallel_uploads=6)
+
+        assert (uploads[0]["part_size"], uploads[0]["num_parallel_uploads"]) == (8 * 1024 * 1024, 3)
+        assert (uploads[1]["part_size"], uploads[1]["num_parallel_uploads"]) == (5 * 1024 * 1024, 6)
+
+    def test_progress_reported(self, uploads):
+        """Test that progress reports cumulative bytes against the known total"""
+        reports = []
+        database.get_minio_client().upload_file(
+            "a.csv", b"0123456789", length=10, progress_callback=lambda done, total: reports.append((done, total))
+        )
+
+        assert reports[-1] == (10, 10)
+
+
+@pytest.mark.unit
+class TestCompressedStorage:
+    """Test that compressed uploads read back as the original bytes"""
+
+    def test_gzip_round_trip(self, fake_minio, monkeypatch):
+        """Test that the codec is recorded in metadata and undone on read"""
+        stored = {}
+
+        class Response:
+            def __init__(self, body, headers):
+                self.body, self.headers = body, headers
+
+            def read(self, size=-1):
+                body, self.body = (self.body, b"") if size < 0 else (self.body[:size], self.body[size:])
+                return body
+
+            def close(self):
+                pass
+
+        def put_object(self, bucket, object_name, data, length, metadata=None, **kwargs):
+            # The codec key already carries the header prefix, so it comes back as-is
+            stored[object_name] = (data.read(), dict(metadata or {}))
+
+        def get_object(self, bucket, object_name):
+            return Response(*stored[object_name])
+
+        monkeypatch.setattr(FakeMinio, "put_object", put_object, raising=False)
+        monkeypatch.setattr(FakeMinio, "get_object", get_object, raising=False)
+        client = database.get_minio_client()
+        content = b"a,b\n" + b"1,2\n" * 1000
+        client.upload_file("zipped.csv", content, compression="gzip")
+        client.upload_file("plain.csv", content, compression="none")
+
+        assert stored["zipped.csv"][1]["x-amz-meta-content-encoding"] == "gzip"
+        assert len(stored["zipped.csv"][0]) < len(content)
+        assert client.get_file_content("zipped.csv") == content
+        assert client.get_file_content("plain.csv") == content
+        with client.open_file("zipped.csv") as stream:
+            assert stream.read() == content
+
+
+@pytest.mark.unit
+class TestDeleteFile:
+    """Test deleting a stored file"""
+
+    def test_cached_frames_dropped(self, fake_minio, monkeypatch):
+        """Test that deleting a file drops its cached DataFrames"""
+        import pandas as pd
+        from backend.frame_cache import DataFrameCache
+        removed = []
+        monkeypatch.setattr(
+            FakeMinio, "remove_object", lambda self, bucket, name: removed.append(name), raising=False
+        )
+        cache = DataFrameCache()
+        monkeypatch.setattr("backend.frame_cache._dataframe_cache", cache)
+        cache.put("po.csv", "etag-1", pd.DataFrame({"a": [1]}))
+        cache.put("other.csv", "etag-2", pd.DataFrame({"a": [1]}))
+
+        assert database.get_minio_client().delete_file("po.csv")
+        assert removed[0] == "po.csv"
+        assert cache.get("po.csv", "etag-1") is None
+        assert cache.get("other.csv", "etag-2") is not None
+
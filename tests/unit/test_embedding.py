@@ -0,0 +1,160 @@
+"""
+Unit tests for the batched embedding stage.
+Runs against a local stub of Ollama's embed endpoint (no Ollama required).
+"""
+import pytest
+from llama_index.embeddings.ollama import OllamaEmbedding
+from backend.embedding import BatchedEmbedder, EmbeddingCache
+
+
+def make_embedder(server, **kwargs):
+    embed_model = OllamaEmbedding(model_name="stub-embed", base_url=server.base_url, embed_batch_size=100)
+    return BatchedEmbedder(embed_model=embed_model, retry_delay=0.01, **kwargs)
+
+
+@pytest.mark.unit
+class TestBatchedEmbedder:
+    """Test batching, ordering and throughput reporting"""
+    
+    def test_embeddings_returned_in_input_order(self, stub_embedding_server):
+        """Test that concurrent batches are reassembled in order"""
+        texts = [f"row {i}" for i in range(25)]
+        embedder = make_embedder(stub_embedding_server, batch_size=4, max_concurrency=3)
+        
+        embeddings = embedder.embed(texts)
+        
+        assert embeddings == [stub_embedding_server.vector_for(t) for t in texts]
+    
+    def test_requests_respect_batch_size(self, stub_embedding_server):
+        """Test that each request carries at most batch_size texts"""
+        embedder = make_embedder(stub_embedding_server, batch_size=4, max_concurrency=2)
+        
+        embedder.embed([f"row {i}" for i in range(10)])
+        
+        sizes = sorted(len(r) for r in stub_embedding_server.requests)
+        assert sizes == [2, 4, 4]
+    
+    def test_progress_reports_throughput(self, stub_embedding_server):
+        """Test that progress is reported with docs/sec and tokens/sec"""
+        reports = []
+        embedder = make_embedder(stub_embedding_server, batch_size=5, max_concurrency=2)
+        
+        embedder.embed([f"text number {i}" for i in range(20)], progress_callback=lambda *args: reports.append(args))
+        
+        assert len(reports) == 4
+        done, total, docs_per_sec, tokens_per_sec = reports[-1]
+        assert (done, total) == (20, 20)
+        assert docs_per_sec > 0
+        assert tokens_per_sec > 0
+    
+    def test_empty_input(self, stub_embedding_server):
+        """Test that no requests are made for empty input"""
+        embedder = make_embedder(stub_embedding_server)
+        
+        assert embedder.embed([]) == []
+        assert stub_embedding_server.requests == []
+
+
+@pytest.mark.unit
+class TestAdaptiveBackoff:
+    """Test retry and concurrency backoff behaviour"""
+    
+    def test_failed_batch_is_retried(self, stub_embedding_server):
+        """Test that a transient server error is retried and halves concurrency"""
+        stub_embedding_server.fail_next = 1
+        embedder = make_embedder(stub_embedding_server, batch_size=10, max_concurrency=4)
+        
+        embeddings = embedder.embed([f"row {i}" for i in range(10)])
+        
+        assert len(embeddings) == 10
+        assert len(stub_embedding_server.requests) == 2
+    
+    def test_gives_up_after_max_retries(self, stub_embedding_server):
+        """Test that persistent failures are raised to the caller"""
+        stub_embedding_server.fail_next = 10
+        embedder = make_embedder(stub_embedding_server, batch_size=10, max_retries=1)
+        
+        with pytest.raises(Exception):
+            embedder.embed(["row"])
+    
+    def test_slowdown_reduces_concurrency(self, stub_embedding_server):
+        """Test that a sudden latency increase shrinks the in-flight limit"""
+        embedder = make_embedder(stub_embedding_server, batch_size=2, max_concurrency=4)
+        embedder.embed([f"warmup {i}" for i in range(8)])
+        assert embedder.concurrency_limit == 4
+        
+        stub_embedding_server.delay = 0.5
+        embedder.embed(["slow a", "slow b"])
+        
+        assert embedder.concurrency_limit < 4
+
+
+@pytest.mark.unit
+class TestEmbeddingCache:
+    """Test the persistent content-addressed embedding cache"""
+    
+    def test_round_trip_and_persistence(self, tmp_path):
+        """Test that embeddings survive reopening the cache file"""
+        path = str(tmp_path / "embeddings.sqlite3")
+        cache = EmbeddingCache(path=path, model_name="m1")
+        cache.put_many(["a", "b"], [[0.5, 0.25], [1.0, 2.0]])
+        
+        reopened = EmbeddingCache(path=path, model_name="m1")
+        
+        assert reopened.get_many(["a", "b", "c"]) == {"a": [0.5, 0.25], "b": [1.0, 2.0]}
+    
+    def test_key_includes_model(self, tmp_path):
+        """Test that a different embedding model does not reuse vectors"""
+        path = str(tmp_path / "embeddings.sqlite3")
+        EmbeddingCache(path=path, model_name="m1").put_many(["a"], [[1.0]])
+        
+        assert EmbeddingCache(path=path, model_name="m2").get_many(["a"]) == {}
+    
+    def test_lru_eviction(self, tmp_path):
+        """Test that least recently used entries are evicted over the size limit"""
+        # Each 2-dim float32 vector is 8 bytes; allow three entries
+        cache = EmbeddingCache(path=str(tmp_path / "e.sqlite3"), model_name="m", max_bytes=24)
+        cache.put_many(["a", "b", "c"], [[1.0, 1.0]] * 3)
+        cache.get_many(["a"])  # "b" becomes least recently used
+        
+        cache.put_many(["d"], [[2.0, 2.0]])
+        
+        assert len(cache) == 3
+        assert set(cache.get_many(["a", "b", "c", "d"])) == {"a", "c", "d"}
+    
+    def test_embedder_only_embeds_new_texts(self, stub_embedding_server, tmp_path):
+        """Test that re-embedding mostly unchanged input only sends new texts"""
+        cache = EmbeddingCache(path=str(tmp_path / "e.sqlite3"), model_name="stub-embed")
+        first = [f"row {i}" for i in range(20)]
+        make_embedder(stub_embedding_server, batch_size=8, cache=cache).embed(first)
+        stub_embedding_server.requests.clear()
+        
+        second = first[:19] + ["row changed"]
+        reports = []
+        embeddings = make_embedder(stub_embedding_server, batch_size=8, cache=cache).embed(
+            second, progress_callback=lambda *args: reports.append(args)
+        )
+        
+        assert stub_embedding_server.requests == [["row changed"]]
+        assert embeddings[-1] == stub_embedding_server.vector_for("row changed")
+        assert embeddings[0] == pytest.approx(stub_embedding_server.vector_for("row 0"), rel=1e-6)
+        assert reports[-1][:2] == (20, 20)
+
+    def test_same_rows_in_another_file_hit_cache(self, stub_embedding_server, tmp_path):
+        """Test that re-ingesting the same rows under another file name embeds nothing new"""
+        import pandas as pd
+        from llama_index.core.schema import MetadataMode
+        from backend.ingestion import build_documents
+        cache = EmbeddingCache(path=str(tmp_path / "e.sqlite3"), model_name="stub-embed")
+        df = pd.DataFrame({'POID': ['PO-1', 'PO-2'], 'SupplierName': ['Acme', 'Beta']})
+
+        def embed_file(file_name, frame):
+            texts = [doc.get_content(metadata_mode=MetadataMode.EMBED) for doc in build_documents(frame, file_name)]
+            make_embedder(stub_embedding_server, cache=cache).embed(texts)
+
+        embed_file("po_january.csv", df)
+        stub_embedding_server.requests.clear()
+        embed_file("po_january_copy.csv", df)
+        embed_file("po_reordered.csv", df.iloc[::-1].reset_index(drop=True))
+
+        assert stub_embedding_server.requests == []
@@ -0,0 +1,177 @@
+"""
+Unit tests for the facts engine.
+Tests aggregate correctness, fact sheet rendering and caching by file version.
+"""
+import pytest
+import pandas as pd
+import backend.facts as facts_module
+from backend.facts import compute_facts, render_fact_sheet, get_fact_sheet
+
+
+def procurement_frame():
+    return pd.DataFrame({
+        'POID': ['PO-1', 'PO-1', 'PO-2', 'PO-3', 'PO-4'],
+        'PODate': ['2024-01-10', '2024-01-10', '2024-02-05', '2024-02-20', '2025-01-03'],
+        'SupplierName': ['Acme', 'Acme', 'Beta', 'Gamma', 'Beta'],
+        'ItemCategory': ['IT', 'IT', 'Office', 'IT', 'Office'],
+        'TotalAmount': [100.0, 50.0, 30.0, 200.0, 20.0],
+        'OnTimeDelivery%': [90, 80, 60, 100, 70],
+        'QualityScore': [9.0, 8.0, 7.0, 9.5, 6.0],
+        'SupplierRiskLevel': ['Low', 'Medium', 'High', 'Low', 'Low'],
+        'ContractID': ['C-1', 'C-1', 'C-2', 'C-3', 'C-2'],
+        'ContractEndDate': ['2025-01-20', '2025-01-20', '2024-12-01', '2025-06-01', '2025-03-01'],
+        'ComplianceStatus': ['Compliant', 'Non-Compliant', 'Compliant', 'Compliant', 'Non-Compliant'],
+    })
+
+
+@pytest.mark.unit
+class TestComputeFacts:
+    """Test aggregate facts over a DataFrame"""
+
+    def test_spend_aggregates(self):
+        """Test totals by category, month and year"""
+        facts = compute_facts(procurement_frame(), today='2025-01-10')
+
+        assert facts['overview'] == {
+            'rows': 5, 'total_spend': 400.0, 'purchase_orders': 4, 'suppliers': 3,
+            'first_po': '2024-01-10', 'last_po': '2025-01-03',
+        }
+        assert [(row['category'], row['spend'], row['orders']) for row in facts['spend_by_category']] == [
+            ('IT', 350.0, 3), ('Office', 50.0, 2)
+        ]
+        assert [(row['period'], row['spend']) for row in facts['spend_by_month']] == [
+            ('2024-01', 150.0), ('2024-02', 230.0), ('2025-01', 20.0)
+        ]
+        assert [(row['period'], row['spend']) for row in facts['spend_by_year']] == [('2024', 380.0), ('2025', 20.0)]
+
+    def test_supplier_scorecards_and_risk(self):
+        """Test per-supplier means and worst risk level"""
+        facts = compute_facts(procurement_frame(), today='2025-01-10')
+
+        gamma, acme, beta = facts['top_suppliers']
+        assert (gamma['supplier'], gamma['spend']) == ('Gamma', 200.0)
+        assert acme['on_time'] == pytest.approx(85.0)
+        assert (acme['orders'], acme['risk']) == (2, 'Medium')
+        assert beta['risk'] == 'High'
+        assert facts['least_on_time_suppliers'][0]['supplier'] == 'Beta'
+        assert facts['risk']['rows_by_level'] == {'Low': 3, 'Medium': 1, 'High': 1}
+        assert facts['risk']['suppliers_by_level'] == {'Medium': 1, 'High': 1, 'Low': 1}
+        assert [card['supplier'] for card in facts['risk']['high_risk_suppliers']] == ['Beta']
+
+    def test_contracts_and_compliance(self):
+        """Test contract expiry windows and compliance counts"""
+        facts = compute_facts(procurement_frame(), today='2025-01-10')
+
+        contracts = facts['contracts']
+        # C-2 is renewed to its latest end date
+        assert (contracts['contracts'], contracts['expired']) == (3, 0)
+        assert (contracts['expiring_30_days'], contracts['expiring_90_days']) == (1, 2)
+        assert [row['contract'] for row in contracts['next_expiring']] == ['C-1', 'C-2', 'C-3']
+        assert facts['compliance']['rows_by_status'] == {'Compliant': 3, 'Non-Compliant': 2}
+        assert facts['compliance']['non_compliant_spend'] == 70.0
+
+    def test_missing_columns_drop_sections(self):
+        """Test that only sections with their columns present are computed"""
+        facts = compute_facts(procurement_frame()[['SupplierName', 'TotalAmount']])
+
+        assert set(facts) == {'overview', 'top_suppliers', 'as_of'}
+        assert 'Spend by category' not in render_fact_sheet(facts)
+
+    def test_top_n_limits_lists(self):
+        """Test that long lists are cut to top_n entries"""
+        facts = compute_facts(procurement_frame(), top_n=1)
+
+        assert len(facts['top_suppliers']) == 1
+        assert len(facts['spend_by_category']) == 1
+
+
+@pytest.mark.unit
+class TestFactSheet:
+    """Test fact sheet rendering"""
+
+    def test_render_selected_sections(self):
+        """Test that only the requested sections are rendered"""
+        facts = compute_facts(procurement_frame(), today='2025-01-10')
+        sheet = render_fact_sheet(facts, ('overview', 'contracts'))
+
+        assert 'total spend $400.00' in sheet
+        assert 'C-1 (Acme): ends 2025-01-20, 10 days left' in sheet
+        assert 'Spend by category' not in sheet
+
+
+class FakeMinio:
+    """Serves one file whose ETag the test can change"""
+    def __init__(self, df):
+        self.df = df
+        self.etag = 'etag-1'
+        self.reads = 0
+
+    def list_files_info(self):
+        return [{'name': 'po.csv', 'etag': self.etag}]
+
+    def read_dataframe(self, name, columns=None):
+        self.reads += 1
+        return self.df
+
+
+@pytest.fixture
+def fake_minio(monkeypatch):
+    import backend.database as database
+    from backend.frame_cache import DataFrameCache
+    import backend.frame_cache as frame_cache
+    client = FakeMinio(procurement_frame())
+    monkeypatch.setattr(database, 'get_minio_client', lambda: client)
+    monkeypatch.setattr(frame_cache, '_dataframe_cache', DataFrameCache(max_bytes=10**7))
+    monkeypatch.setattr(facts_module, '_facts_cache', None)
+    return client
+
+
+@pytest.mark.unit
+class TestStoredFacts:
+    """Test facts over the stored files"""
+
+    def test_cached_until_file_changes(self, fake_minio):
+        """Test that facts are recomputed only for a new file version"""
+        first = facts_module.get_facts()
+        assert facts_module.get_facts() is first
+
+        fake_minio.etag = 'etag-2'
+        fake_minio.df = procurement_frame().head(2)
+
+        assert facts_module.get_facts()['overview']['rows'] == 2
+        assert fake_minio.reads == 2
+
+    def test_filtered_facts(self, fake_minio, monkeypatch):
+        """Test that filters select files and rows, and each set of filters is cached separately"""
+        other = procurement_frame().assign(TotalAmount=1.0)
+        fake_minio.list_files_info = lambda: [{'name': 'po.csv', 'etag': 'etag-1'}, {'name': 'other.csv', 'etag': 'etag-1'}]
+        fake_minio.read_dataframe = lambda name, columns=None: other if name == 'other.csv' else procurement_frame()
+
+        assert facts_module.get_facts()['overview']['total_spend'] == 405.0
+        assert facts_module.get_facts({'source': 'po.csv'})['overview']['total_spend'] == 400.0
+        risky = facts_module.get_facts({'source': 'po.csv', 'risk_level': ['High', 'Medium']})
+        assert risky['overview']['rows'] == 2
+        assert risky['risk']['rows_by_level'] == {'Medium': 1, 'High': 1}
+        assert facts_module.get_facts({'source': 'po.csv', 'risk_level': ['High', 'Medium']}) is risky
+        assert facts_module.get_facts({'supplier_name': 'Nobody'}) is None
+        assert facts_module.get_facts({'source': 'missing.csv'}) is None
+
+    def test_fact_sheet_empty_when_unavailable(self, monkeypatch):
+        """Test that a storage error yields no fact sheet instead of failing the agent"""
+        import backend.database as database
+
+        def unavailable():
+            raise ConnectionError('storage down')
+
+        monkeypatch.setattr(database, 'get_minio_client', unavailable)
+        monkeypatch.setattr(facts_module, '_facts_cache', None)
+
+        assert get_fact_sheet(('overview',)) == ''
+
+    def test_fact_sheet_disabled(self, fake_minio, monkeypatch):
+        """Test that AGENT_FACTS_ENABLED=false turns fact sheets off"""
+        from backend.config import Config
+        monkeypatch.setattr(Config, 'AGENT_FACTS_ENABLED', False)
+
+        assert get_fact_sheet(('overview',)) == ''
+        assert fake_minio.reads == 0
@@ -0,0 +1,104 @@
+"""
+Unit tests for the in-process DataFrame cache.
+Tests ETag keying, column subsets and LRU eviction under a memory budget.
+"""
+import pytest
+import pandas as pd
+from backend.frame_cache import DataFrameCache
+
+
+def frame(rows=100):
+    return pd.DataFrame({'SupplierName': ['Acme'] * rows, 'TotalAmount': [1.0] * rows})
+
+
+@pytest.mark.unit
+class TestDataFrameCache:
+    """Test DataFrame caching by object ETag"""
+
+    def test_hit_for_same_etag(self):
+        """Test that a cached frame is returned for the same version"""
+        cache = DataFrameCache(max_bytes=10**7)
+        df = frame()
+        cache.put('po.csv', 'etag-1', df)
+
+        assert cache.get('po.csv', 'etag-1') is df
+        assert cache.hits == 1
+
+    def test_changed_etag_misses_and_replaces(self):
+        """Test that a new object version is not served from the old entry"""
+        cache = DataFrameCache(max_bytes=10**7)
+        cache.put('po.csv', 'etag-1', frame())
+
+        assert cache.get('po.csv', 'etag-2') is None
+        cache.put('po.csv', 'etag-2', frame())
+        assert len(cache) == 1
+        assert cache.misses == 1
+
+    def test_full_frame_serves_column_subset(self):
+        """Test that a frame with every column answers narrower requests"""
+        cache = DataFrameCache(max_bytes=10**7)
+        cache.put('po.csv', 'etag-1', frame())
+
+        subset = cache.get('po.csv', 'etag-1', columns=['TotalAmount', 'Missing'])
+        assert subset.columns.tolist() == ['TotalAmount']
+
+    def test_column_subset_does_not_serve_full_frame(self):
+        """Test that a narrow entry is not returned for a wider request"""
+        cache = DataFrameCache(max_bytes=10**7)
+        cache.put('po.csv', 'etag-1', frame()[['TotalAmount']], columns=['TotalAmount'])
+
+        assert cache.get('po.csv', 'etag-1', columns=['TotalAmount']) is not None
+        assert cache.get('po.csv', 'etag-1') is None
+
+    def test_lru_eviction_under_budget(self):
+        """Test that the least recently used frame is evicted first"""
+        size = int(frame().memory_usage(deep=True).sum())
+        cache = DataFrameCache(max_bytes=size * 2)
+        cache.put('a.csv', 'e', frame())
+        cache.put('b.csv', 'e', frame())
+        cache.get('a.csv', 'e')
+        cache.put('c.csv', 'e', frame())
+
+        assert cache.get('b.csv', 'e') is None
+        assert cache.get('a.csv', 'e') is not None
+        assert cache.size_bytes <= size * 2
+
+    def test_oversized_frame_not_cached(self):
+        """Test that a frame larger than the budget is skipped"""
+        cache = DataFrameCache(max_bytes=10)
+        cache.put('po.csv', 'etag-1', frame())
+
+        assert len(cache) == 0
+
+
+@pytest.mark.unit
+class TestReadCachedDataframe:
+    """Test loading stored files through the process-wide cache"""
+
+    def test_reads_once_per_version(self, monkeypatch):
+        """Test that a file is parsed once per ETag and missing files give None"""
+        import backend.database
+        import backend.frame_cache as frame_cache
+
+        class FakeMinioClient:
+            etag = 'etag-1'
+            reads = 0
+
+            def get_etag(self, object_name):
+                return self.etag if object_name == 'po.csv' else None
+
+            def read_dataframe(self, object_name, columns=None):
+                self.reads += 1
+                return frame()
+
+        client = FakeMinioClient()
+        monkeypatch.setattr(backend.database, 'get_minio_client', lambda: client)
+        monkeypatch.setattr(frame_cache, '_dataframe_cache', DataFrameCache(max_bytes=10**7))
+
+        first = frame_cache.read_cached_dataframe('po.csv')
+        assert frame_cache.read_cached_dataframe('po.csv') is first
+        client.etag = 'etag-2'
+        frame_cache.read_cached_dataframe('po.csv')
+
+        assert client.reads == 2
+        assert frame_cache.read_cached_dataframe('missing.csv') is None
@@ -5,7 +5,7 @@ Tests CSV validation, parsing, and error handling.
 import pytest
 import pandas as pd
 import io
-from backend.ingestion import DataPreprocessingAgent
+from backend.ingestion import DataPreprocessingAgent, build_documents, document_id, read_csv_chunks
 
 
 @pytest.mark.unit
@@ -117,3 +117,141 @@ class TestDataPreprocessingAgent:
             
             assert len(chunks) > 1
             assert all(len(chunk) <= 150 for chunk in chunks)  # Allow some overflow
+
+
+@pytest.mark.unit
+class TestDocumentBuilder:
+    """Test column-wise document building"""
+    
+    def test_document_text_matches_row_format(self):
+        """Test that each document renders the row like the original f-string"""
+        df = pd.DataFrame([{
+            'SupplierName': 'Acme', 'SupplierID': 'S001', 'ItemName': 'Laptop',
+            'ItemCategory': 'IT', 'POID': 'PO-001', 'PODate': '2024-01-15',
+            'TotalAmount': 1500.0, 'Unit': 'pcs', 'UnitPrice': 750.0,
+            'OnTimeDelivery%': 95, 'QualityScore': 8.5, 'SupplierRiskLevel': 'Low',
+            'RiskDescription': 'None', 'ContractID': 'C-1', 'ContractEndDate': '2025-01-01',
+            'ComplianceStatus': 'Compliant'
+        }])
+        
+        docs = build_documents(df, "test.csv")
+        
+        assert len(docs) == 1
+        assert docs[0].text == (
+            "Supplier: Acme (ID: S001)\n"
+            "Item: Laptop (Category: IT)\n"
+            "PO: PO-001 | Date: 2024-01-15\n"
+            "Cost: 1500.0 pcs | Price: 750.0\n"
+            "Performance: Delivery 95%, Quality 8.5\n"
+            "Risk: Low - None\n"
+            "Contract: C-1 (Expires: 2025-01-01)\n"
+            "Compliance: Compliant"
+        )
+    
+    def test_missing_columns_use_defaults(self, sample_csv_data):
+        """Test that absent columns fall back to their defaults"""
+        df = pd.read_csv(io.BytesIO(sample_csv_data))
+        
+        docs = build_documents(df, "test.csv")
+        
+        assert len(docs) == len(df)
+        assert docs[0].text.startswith("Supplier: Acme Corporation (ID: N/A)")
+        assert "Cost: 0  | Price: 0" in docs[0].text
+        assert "Risk: Low - None" in docs[0].text
+    
+    def test_metadata_and_missing_values(self):
+        """Test metadata fields and NaN rendering"""
+        df = pd.DataFrame({
+            'SupplierName': ['Acme', None],
+            'SupplierID': ['S001', 'S002'],
+            'ItemCategory': ['IT', 'HR'],
+            'SupplierRiskLevel': ['High', 'Low']
+        })
+        
+        docs = build_documents(df, "test.csv")
+        
+        assert docs[1].metadata == {
+            "supplier_id": "S002",
+            "supplier_name": "None",
+            "item_category": "HR",
+            "risk_level": "Low",
+            "source": "test.csv",
+            "row_index": 1
+        }
+        assert docs[1].text.startswith("Supplier: None (ID: S002)")
+
+    def test_document_ids_are_deterministic(self, sample_csv_data):
+        """Test that rebuilding the same file yields the same IDs"""
+        df = pd.read_csv(io.BytesIO(sample_csv_data))
+        
+        first = [doc.id_ for doc in build_documents(df, "test.csv")]
+        second = [doc.id_ for doc in build_documents(df, "test.csv")]
+        
+        assert first == second
+        assert len(set(first)) == len(first)
+    
+    def test_document_id_changes_with_content_and_source(self):
+        """Test that IDs depend on source file, row key and row content"""
+        base = document_id("a.csv", "PO-1#0", "text")
+        
+        assert document_id("a.csv", "PO-1#0", "text") == base
+        assert document_id("b.csv", "PO-1#0", "text") != base
+        assert document_id("a.csv", "PO-2#0", "text") != base
+        assert document_id("a.csv", "PO-1#0", "edited") != base
+    
+    def test_ids_keyed_by_poid_not_position(self):
+        """Test that inserting a row does not change IDs of the other rows"""
+        df = pd.DataFrame({'POID': ['PO-1', 'PO-2'], 'SupplierName': ['Acme', 'Beta']})
+        shifted = pd.DataFrame({'POID': ['PO-0', 'PO-1', 'PO-2'], 'SupplierName': ['New', 'Acme', 'Beta']})
+        
+        ids = [doc.id_ for doc in build_documents(df, "f.csv")]
+        shifted_ids = [doc.id_ for doc in build_documents(shifted, "f.csv")]
+        
+        assert shifted_ids[1:] == ids
+    
+    def test_repeated_poid_lines_get_distinct_ids(self):
+        """Test that identical lines of the same PO are kept apart"""
+        df = pd.DataFrame({'POID': ['PO-1', 'PO-1'], 'SupplierName': ['Acme', 'Acme']})
+        
+        docs = build_documents(df, "f.csv")
+        
+        assert docs[0].id_ != docs[1].id_
+    
+    def test_row_index_not_embedded(self):
+        """Test that row position and source file are excluded from the embedded text"""
+        from llama_index.core.schema import MetadataMode
+        df = pd.DataFrame({'POID': ['PO-1'], 'SupplierName': ['Acme']})
+        
+        embed_text = build_documents(df, "f.csv")[0].get_content(metadata_mode=MetadataMode.EMBED)
+        
+        assert "row_index" not in embed_text
+        assert "f.csv" not in embed_text
+        assert "supplier_name: Acme" in embed_text
+    
+    def test_chunked_build_matches_whole_file(self):
+        """Test that building documents chunk by chunk yields the same IDs"""
+        csv = b"POID,SupplierName\nPO-1,Acme\nPO-2,Beta\nPO-1,Acme\nPO-3,Gamma\nPO-1,Acme\n"
+        whole = build_documents(pd.read_csv(io.BytesIO(csv)), "f.csv")
+        
+        poid_counts = {}
+        chunked = []
+        for chunk in pd.read_csv(io.BytesIO(csv), chunksize=2):
+            chunked.extend(build_documents(chunk, "f.csv", poid_counts))
+        
+        assert [doc.id_ for doc in chunked] == [doc.id_ for doc in whole]
+        assert [doc.metadata["row_index"] for doc in chunked] == [0, 1, 2, 3, 4]
+
+    def test_text_does_not_depend_on_chunk_size(self):
+        """Test that a column with gaps renders the same whatever the chunk boundaries"""
+        csv = b"POID,OnTimeDelivery%,TotalAmount\nPO-1,95,100.50\nPO-2,90,200\nPO-3,,300\nPO-4,85,\n"
+
+        def texts(chunk_rows):
+            poid_counts = {}
+            return [
+                doc.text for chunk in read_csv_chunks(io.BytesIO(csv), chunk_rows)
+                for doc in build_documents(chunk, "f.csv", poid_counts)
+            ]
+
+        assert texts(2) == texts(3) == texts(10)
+        assert "Delivery 95%" in texts(2)[0]
+        assert "Cost: 100.50" in texts(2)[0]
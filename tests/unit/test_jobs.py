@@ -0,0 +1,148 @@
+"""
+Unit tests for the background ingestion job queue.
+Tests submission, status polling, concurrency cap and failure reporting.
+"""
+import io
+import threading
+import time
+import pytest
+from backend.jobs import IngestionJobQueue
+
+
+class FakeAgent:
+    """Stands in for DataPreprocessingAgent; blocks until released"""
+    release = threading.Event()
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def process_csv(self, content, file_name, progress_callback=None, chunk_rows=None, upload=True):
+        with FakeAgent.lock:
+            FakeAgent.running += 1
+            FakeAgent.max_running = max(FakeAgent.max_running, FakeAgent.running)
+        progress_callback(0.5, "Halfway")
+        FakeAgent.release.wait(5)
+        with FakeAgent.lock:
+            FakeAgent.running -= 1
+        if content == b"bad":
+            return False, "Invalid CSV format"
+        return True, f"Processed {file_name}"
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    FakeAgent.release = threading.Event()
+    FakeAgent.running = FakeAgent.max_running = 0
+    monkeypatch.setattr("backend.ingestion.DataPreprocessingAgent", FakeAgent)
+    return FakeAgent
+
+
+def wait_for(queue, job_id, statuses, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} never reached {statuses}: {job}")
+
+
+@pytest.mark.unit
+class TestIngestionJobQueue:
+    """Test background ingestion jobs"""
+
+    def test_submit_returns_immediately_and_reports_progress(self, fake_agent):
+        """Test that a job runs in the background and exposes progress"""
+        queue = IngestionJobQueue(max_workers=1)
+        job_id = queue.submit("po.csv", content=b"data")
+
+        job = wait_for(queue, job_id, ("running",))
+        deadline = time.time() + 5
+        while queue.get(job_id)["message"] != "Halfway" and time.time() < deadline:
+            time.sleep(0.01)
+        assert queue.get(job_id)["progress"] == 0.5
+
+        fake_agent.release.set()
+        job = wait_for(queue, job_id, ("succeeded",))
+        assert job["message"] == "Processed po.csv"
+        assert job["progress"] == 1.0
+        assert job["finished_at"] >= job["started_at"]
+
+    def test_concurrency_cap(self, fake_agent):
+        """Test that no more than max_workers jobs run at once"""
+        queue = IngestionJobQueue(max_workers=2)
+        job_ids = [queue.submit(f"po_{i}.csv", content=b"data") for i in range(4)]
+
+        wait_for(queue, job_ids[1], ("running",))
+        assert queue.queue_depth() == 2
+
+        fake_agent.release.set()
+        for job_id in job_ids:
+            wait_for(queue, job_id, ("succeeded",))
+        assert fake_agent.max_running == 2
+
+    def test_failed_job_keeps_message(self, fake_agent):
+        """Test that a failed ingestion is reported with its error"""
+        fake_agent.release.set()
+        queue = IngestionJobQueue(max_workers=1)
+        job_id = queue.submit("bad.csv", content=b"bad")
+
+        job = wait_for(queue, job_id, ("failed",))
+        assert job["message"] == "Invalid CSV format"
+
+    def test_duplicate_submission_reuses_active_job(self, fake_agent):
+        """Test that a file being ingested is not queued twice"""
+        queue = IngestionJobQueue(max_workers=1)
+        first = queue.submit("po.csv", content=b"data")
+        assert queue.submit("po.csv", content=b"data") == first
+
+        fake_agent.release.set()
+        wait_for(queue, first, ("succeeded",))
+        assert queue.submit("po.csv", content=b"data") != first
+        wait_for(queue, queue.list_jobs()[0]["id"], ("succeeded",))
+
+    def test_file_content_closed_when_done(self, fake_agent, tmp_path):
+        """Test that a spooled upload is closed once its job finishes, or when it is not queued"""
+        fake_agent.release.set()
+        queue = IngestionJobQueue(max_workers=1)
+        spool = open(tmp_path / "upload.csv", "w+b")
+        job_id = queue.submit("po.csv", content=spool)
+
+        wait_for(queue, job_id, ("succeeded",))
+        assert spool.closed
+
+        fake_agent.release.clear()
+        first = queue.submit("other.csv", content=b"data")
+        duplicate = open(tmp_path / "duplicate.csv", "w+b")
+        assert queue.submit("other.csv", content=duplicate) == first
+        assert duplicate.closed
+        fake_agent.release.set()
+        wait_for(queue, first, ("succeeded",))
+
+    def test_reingest_streams_stored_file(self, fake_agent, monkeypatch):
+        """Test that re-ingesting without content streams the stored copy and closes it"""
+        stored = io.BytesIO(b"data")
+        opened = []
+
+        class StoredAgent(FakeAgent):
+            class minio_client:
+                @staticmethod
+                def open_file(file_name):
+                    opened.append(file_name)
+                    return stored
+
+            def process_csv(self, content, file_name, progress_callback=None, chunk_rows=None, upload=True):
+                assert content is stored and not upload
+                return True, f"Processed {file_name}"
+
+        monkeypatch.setattr("backend.ingestion.DataPreprocessingAgent", StoredAgent)
+        queue = IngestionJobQueue(max_workers=1)
+        job_id = queue.submit("po.csv")
+
+        wait_for(queue, job_id, ("succeeded",))
+        assert opened == ["po.csv"]
+        assert stored.closed
+
+    def test_unknown_job(self):
+        """Test that polling an unknown job ID returns None"""
+        assert IngestionJobQueue(max_workers=1).get("missing") is None
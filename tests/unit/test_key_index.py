@@ -0,0 +1,122 @@
+"""
+Unit tests for the exact-lookup key index.
+Tests lookups, generations replacing a file's keys, and ID detection in text.
+"""
+import pytest
+import pandas as pd
+from backend.key_index import KeyIndex, plain_frame
+
+
+def chunk(start, poids, suppliers, contracts):
+    return pd.DataFrame({
+        'POID': poids,
+        'SupplierID': [supplier[0] for supplier in suppliers],
+        'SupplierName': [supplier[1] for supplier in suppliers],
+        'ContractID': contracts,
+    }, index=range(start, start + len(poids)))
+
+
+@pytest.fixture
+def key_index(tmp_path):
+    index = KeyIndex(str(tmp_path / "keys.sqlite3"))
+    index.begin('po.csv')
+    index.add('po.csv', chunk(0, ['PO-1', 'PO-2'], [('S1', 'Acme Corp'), ('S2', 'Beta')], ['C-1', None]))
+    index.add('po.csv', chunk(2, ['PO-3', 'PO-1'], [('S1', 'Acme Corp'), ('S1', 'Acme Corp')], ['C-1', 'C-2']))
+    index.commit('po.csv')
+    return index
+
+
+@pytest.mark.unit
+class TestLookup:
+    """Test exact lookups"""
+
+    def test_offsets_across_chunks(self, key_index):
+        """Test that keys map to row offsets in the file, across chunks"""
+        assert key_index.lookup('po', 'PO-1') == {'po.csv': [0, 3]}
+        assert key_index.lookup('supplier_id', 'S1') == {'po.csv': [0, 2, 3]}
+        assert key_index.lookup('contract', 'C-1') == {'po.csv': [0, 2]}
+
+    def test_case_insensitive_names(self, key_index):
+        """Test that lookups ignore case and surrounding whitespace"""
+        assert key_index.lookup('supplier_name', '  acme CORP ') == {'po.csv': [0, 2, 3]}
+        assert key_index.lookup('po', 'po-2') == {'po.csv': [1]}
+
+    def test_missing_key_and_source_scope(self, key_index):
+        """Test unknown keys, blank cells and per-file scoping"""
+        assert key_index.lookup('po', 'PO-9') == {}
+        assert key_index.lookup('contract', 'nan') == {}
+        assert key_index.lookup('po', 'PO-1', source='other.csv') == {}
+
+
+@pytest.mark.unit
+class TestGenerations:
+    """Test that a file's keys change only when its ingestion completes"""
+
+    def test_pending_keys_invisible_until_commit(self, key_index):
+        """Test that a re-ingestion in progress leaves the current keys in place"""
+        key_index.begin('po.csv')
+        key_index.add('po.csv', chunk(0, ['PO-7'], [('S9', 'Gamma')], ['C-9']))
+
+        assert key_index.lookup('po', 'PO-7') == {}
+        assert key_index.lookup('po', 'PO-1') == {'po.csv': [0, 3]}
+
+        key_index.commit('po.csv')
+        assert key_index.lookup('po', 'PO-7') == {'po.csv': [0]}
+        assert key_index.lookup('po', 'PO-1') == {}
+
+    def test_failed_run_discarded(self, key_index):
+        """Test that keys left by a failed run are dropped by the next one"""
+        key_index.begin('po.csv')
+        key_index.add('po.csv', chunk(0, ['PO-7'], [('S9', 'Gamma')], ['C-9']))
+        key_index.begin('po.csv')
+        key_index.commit('po.csv')
+
+        assert key_index.lookup('po', 'PO-7') == {}
+        assert len(key_index) == 0
+
+    def test_delete_source(self, key_index):
+        """Test that deleting a file drops all of its keys"""
+        key_index.delete_source('po.csv')
+        assert len(key_index) == 0
+
+
+@pytest.mark.unit
+class TestDetect:
+    """Test spotting indexed IDs in free text"""
+
+    def test_ids_in_mention_order(self, key_index):
+        """Test that indexed IDs are found in the order they are mentioned"""
+        assert key_index.detect('Is contract c-2 linked to PO-3?') == [('contract', 'c-2'), ('po', 'po-3')]
+
+    def test_counts_and_years_are_not_ids(self, tmp_path):
+        """Test that short or all-digit IDs are only found next to a word naming their field"""
+        index = KeyIndex(str(tmp_path / "numeric.sqlite3"))
+        index.begin('po.csv')
+        index.add('po.csv', chunk(0, ['5', '2024'], [('10', 'Acme Corp'), ('11', 'Beta')], ['C-1', '2025']))
+        index.commit('po.csv')
+
+        assert index.detect('Top 5 suppliers by spend in 2024') == []
+        assert index.detect('Contracts ending in 2025 with 10 suppliers') == []
+        assert index.detect('Status of PO 5 from supplier 10?') == [('po', '5'), ('supplier_id', '10')]
+
+    def test_no_ids(self, key_index):
+        """Test that text without indexed IDs finds nothing, and names are not matched"""
+        assert key_index.detect('What did we spend with Beta on PO-99?') == []
+        assert key_index.detect('?!') == []
+
+
+@pytest.mark.unit
+class TestPlainFrame:
+    """Test rendering typed rows as text"""
+
+    def test_dates_back_to_csv_form(self):
+        """Test that dates and categories render like the CSV values"""
+        df = pd.DataFrame({
+            'PODate': pd.to_datetime(['2024-01-10', None]),
+            'ItemCategory': pd.Series(['IT', 'HR'], dtype='category'),
+        })
+        plain = plain_frame(df)
+
+        assert plain['PODate'].tolist()[0] == '2024-01-10'
+        assert pd.isna(plain['PODate'].tolist()[1])
+        assert plain['ItemCategory'].dtype == object
@@ -0,0 +1,93 @@
+"""
+Unit tests for the keyword index.
+Tests exact ID matching, upserts and deletes, level filters and rank fusion.
+"""
+import pytest
+from llama_index.core import Document
+from backend.keyword_index import KeywordIndex, reciprocal_rank_fusion
+
+
+def document(node_id, text, source="po.csv", doc_level=None):
+    metadata = {"source": source}
+    if doc_level:
+        metadata["doc_level"] = doc_level
+    return Document(id_=node_id, text=text, metadata=metadata)
+
+
+@pytest.fixture
+def keyword_index(tmp_path):
+    index = KeywordIndex(str(tmp_path / "keywords.sqlite3"))
+    index.add([
+        document("r1", "Supplier: Acme (ID: SUP-001)\nPO: PO-2024-0193 | Date: 2024-01-10"),
+        document("r2", "Supplier: Acme (ID: SUP-001)\nPO: PO-2024-0194 | Date: 2024-01-11"),
+        document("r3", "Supplier: Beta (ID: SUP-002)\nPO: PO-2024-0195", source="other.csv"),
+        document("s1", "Supplier summary: Acme (ID: SUP-001)", doc_level="supplier"),
+    ])
+    return index
+
+
+@pytest.mark.unit
+class TestKeywordSearch:
+    """Test BM25 search over indexed documents"""
+
+    def test_id_matches_exactly(self, keyword_index):
+        """Test that a hyphenated ID is one term and finds only its row"""
+        assert [node_id for node_id, _ in keyword_index.search("status of PO-2024-0193")] == ["r1"]
+
+    def test_rarer_terms_rank_higher(self, keyword_index):
+        """Test that scores are best first and favour documents matching more terms"""
+        results = keyword_index.search("Acme PO-2024-0194")
+
+        assert results[0][0] == "r2"
+        assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+    def test_common_terms_alone_do_not_match(self, keyword_index):
+        """Test that documents sharing only near-ubiquitous terms with the query are dropped"""
+        assert [node_id for node_id, _ in keyword_index.search("Supplier PO-2024-0193")] == ["r1"]
+
+    def test_doc_levels_filter(self, keyword_index):
+        """Test that doc_levels restricts matches to those levels, with "row" for row documents"""
+        assert [node_id for node_id, _ in keyword_index.search("SUP-001", doc_levels=("supplier",))] == ["s1"]
+        assert {node_id for node_id, _ in keyword_index.search("SUP-001", doc_levels=("row",))} == {"r1", "r2"}
+
+    def test_sources_filter(self, keyword_index):
+        """Test that sources restricts matches to those files"""
+        assert [node_id for node_id, _ in keyword_index.search("Supplier", sources="other.csv")] == ["r3"]
+        assert keyword_index.search("PO-2024-0193", sources=["other.csv"]) == []
+
+    def test_query_syntax_not_interpreted(self, keyword_index):
+        """Test that quotes, operators and punctuation are searched as plain terms"""
+        assert keyword_index.search('"PO-2024-0193" OR NEAR(') == [("r1", keyword_index.search("PO-2024-0193")[0][1])]
+        assert keyword_index.search("?! ...") == []
+
+
+@pytest.mark.unit
+class TestKeywordIndexUpdates:
+    """Test keeping the index in step with the vector store"""
+
+    def test_add_replaces_same_id(self, keyword_index):
+        """Test that re-adding a node ID replaces its text"""
+        keyword_index.add([document("r1", "PO: PO-2024-0999")])
+
+        assert keyword_index.search("PO-2024-0193") == []
+        assert len(keyword_index) == 4
+
+    def test_delete_and_existing_ids(self, keyword_index):
+        """Test deleting by node ID and by source file"""
+        keyword_index.delete(["r1"])
+        assert keyword_index.existing_ids(["r1", "r2", "missing"]) == {"r2"}
+
+        keyword_index.delete_source("po.csv")
+        assert keyword_index.existing_ids(["r2", "r3", "s1"]) == {"r3"}
+
+
+@pytest.mark.unit
+class TestReciprocalRankFusion:
+    """Test fusing ranked lists"""
+
+    def test_ids_in_both_lists_rank_first(self):
+        """Test that agreement between rankings outweighs a single top rank"""
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60)
+
+        assert [node_id for node_id, _ in fused] == ["b", "a", "d", "c"]
+        assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
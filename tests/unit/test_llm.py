@@ -85,3 +85,103 @@ class TestLLMConfiguration:
         
         assert hasattr(embed_model, 'model_name')
         assert embed_model.model_name == Config.EMBEDDING_MODEL
+
+
+@pytest.mark.unit
+class TestLLMScheduler:
+    """Test the process-wide LLM concurrency limiter"""
+
+    def test_concurrency_cap(self):
+        """Test that no more than max_concurrency calls run at once"""
+        import threading
+        import time
+        from backend.llm import LLMScheduler
+
+        scheduler = LLMScheduler(max_concurrency=2)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def call():
+            with scheduler.slot("normal"):
+                with lock:
+                    running.append(1)
+                    peak.append(len(running))
+                time.sleep(0.05)
+                with lock:
+                    running.pop()
+
+        threads = [threading.Thread(target=call) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert max(peak) == 2
+        assert scheduler.stats()["priorities"]["normal"]["calls"] == 6
+
+    def test_interactive_served_before_batch(self):
+        """Test that a queued interactive call overtakes earlier batch calls"""
+        import threading
+        import time
+        from backend.llm import LLMScheduler
+
+        scheduler = LLMScheduler(max_concurrency=1)
+        order = []
+        scheduler.acquire("batch")
+
+        def call(name, priority):
+            with scheduler.slot(priority):
+                order.append(name)
+
+        threads = [threading.Thread(target=call, args=(f"batch{i}", "batch")) for i in range(3)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        chat = threading.Thread(target=call, args=("chat", "interactive"))
+        chat.start()
+        time.sleep(0.02)
+
+        assert scheduler.stats()["queue_depth"] == 4
+        scheduler.release()
+        for thread in threads + [chat]:
+            thread.join()
+
+        assert order == ["chat", "batch0", "batch1", "batch2"]
+        assert scheduler.stats()["priorities"]["interactive"]["wait_max"] > 0
+
+    def test_priority_context(self):
+        """Test that llm_priority sets the default priority for calls in the block"""
+        from backend.llm import LLMScheduler, llm_priority
+
+        scheduler = LLMScheduler(max_concurrency=1)
+        with llm_priority("interactive"):
+            with scheduler.slot():
+                pass
+
+        assert scheduler.stats()["priorities"]["interactive"]["calls"] == 1
+        with pytest.raises(ValueError):
+            with llm_priority("urgent"):
+                pass
+
+    def test_closed_stream_releases_slot(self, monkeypatch):
+        """Test that a stream closed before it is exhausted gives its slot back"""
+        import backend.llm as llm
+        from llama_index.core.llms import ChatMessage, ChatResponse
+        from llama_index.llms.ollama import Ollama
+
+        def fake_stream_chat(self, messages, **kwargs):
+            for delta in ("a", "b"):
+                yield ChatResponse(message=ChatMessage(role="assistant", content=delta), delta=delta)
+
+        scheduler = llm.LLMScheduler(max_concurrency=1)
+        monkeypatch.setattr(llm, "_llm_scheduler", scheduler)
+        monkeypatch.setattr(llm, "get_response_cache", lambda: None)
+        monkeypatch.setattr(Ollama, "stream_chat", fake_stream_chat)
+
+        stream = llm.CachedOllama(model="test").stream_chat([ChatMessage(role="user", content="hi")])
+        assert next(stream).delta == "a"
+        assert scheduler.stats()["running"] == 1
+        stream.close()
+
+        assert scheduler.stats()["running"] == 0
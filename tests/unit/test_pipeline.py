@@ -0,0 +1,136 @@
+"""
+Unit tests for the staged ingestion pipeline.
+Tests queue hand-off, back-pressure, cancellation and progress delivery.
+"""
+import threading
+import time
+import pytest
+import pandas as pd
+from backend.pipeline import Pipeline, QueueReader
+
+
+@pytest.mark.unit
+class TestPipeline:
+    """Test stage threads connected by bounded queues"""
+
+    def test_items_flow_through_stages_in_order(self):
+        """Test that every item reaches the last stage in order"""
+        pipeline = Pipeline(poll_interval=0.01)
+        first, second = pipeline.queue(), pipeline.queue()
+        results = []
+
+        def produce():
+            for i in range(20):
+                pipeline.put(first, i)
+            pipeline.close(first)
+
+        def square():
+            for item in pipeline.iterate(first):
+                pipeline.put(second, item * item)
+            pipeline.close(second)
+
+        def collect():
+            results.extend(pipeline.iterate(second))
+
+        for name, stage in (("produce", produce), ("square", square), ("collect", collect)):
+            pipeline.spawn(name, stage)
+
+        assert pipeline.wait() is None
+        assert results == [i * i for i in range(20)]
+        assert set(pipeline.timings) == {"produce", "square", "collect"}
+
+    def test_bounded_queue_applies_back_pressure(self):
+        """Test that a slow consumer limits how far the producer runs ahead"""
+        pipeline = Pipeline(queue_size=2, poll_interval=0.01)
+        q = pipeline.queue()
+        produced = []
+        max_ahead = []
+
+        def produce():
+            for i in range(10):
+                pipeline.put(q, i)
+                produced.append(i)
+            pipeline.close(q)
+
+        def consume():
+            for consumed, _ in enumerate(pipeline.iterate(q), start=1):
+                max_ahead.append(len(produced) - consumed)
+                time.sleep(0.01)
+
+        pipeline.spawn("produce", produce)
+        pipeline.spawn("consume", consume)
+
+        assert pipeline.wait() is None
+        assert max(max_ahead) <= 3
+
+    def test_failing_stage_cancels_others(self):
+        """Test that a failure stops blocked stages and is reported"""
+        pipeline = Pipeline(poll_interval=0.01)
+        q = pipeline.queue()
+        finished = threading.Event()
+
+        def produce():
+            # Would block forever on the full queue without cancellation
+            for i in range(1000):
+                pipeline.put(q, i)
+            finished.set()
+
+        def consume():
+            pipeline.get(q)
+            raise ValueError("boom")
+
+        pipeline.spawn("produce", produce)
+        pipeline.spawn("consume", consume)
+        failure = pipeline.wait()
+
+        assert failure is not None
+        stage, error = failure
+        assert stage == "consume"
+        assert isinstance(error, ValueError)
+        assert pipeline.cancelled.is_set()
+        assert not finished.is_set()
+
+    def test_progress_delivered_in_caller_thread(self):
+        """Test that progress callbacks run in the thread calling wait()"""
+        pipeline = Pipeline(poll_interval=0.01)
+        calls = []
+
+        def work():
+            for i in range(3):
+                pipeline.report(i / 3, f"step {i}")
+
+        pipeline.spawn("work", work)
+        pipeline.wait(lambda fraction, text: calls.append((fraction, text, threading.current_thread())))
+
+        assert [text for _, text, _ in calls] == ["step 0", "step 1", "step 2"]
+        assert all(thread is threading.current_thread() for _, _, thread in calls)
+
+
+@pytest.mark.unit
+class TestQueueReader:
+    """Test the file object fed from a pipeline queue"""
+
+    def test_csv_parses_from_queued_blocks(self):
+        """Test that pandas reads a CSV split across arbitrary blocks"""
+        data = b"a,b\n" + b"".join(f"{i},{i * 2}\n".encode() for i in range(100))
+        pipeline = Pipeline(queue_size=4, poll_interval=0.01)
+        q = pipeline.queue()
+        frames = []
+
+        def feed():
+            for i in range(0, len(data), 7):
+                pipeline.put(q, data[i:i + 7])
+            pipeline.close(q)
+
+        def parse():
+            raw, reader = QueueReader.buffered(pipeline, q, buffer_size=16)
+            frames.extend(pd.read_csv(reader, chunksize=30))
+            assert raw.bytes_read == len(data)
+
+        pipeline.spawn("feed", feed)
+        pipeline.spawn("parse", parse)
+
+        assert pipeline.wait() is None
+        df = pd.concat(frames)
+        assert len(frames) == 4
+        assert df["b"].tolist() == [i * 2 for i in range(100)]
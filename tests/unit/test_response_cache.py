@@ -0,0 +1,144 @@
+"""
+Unit tests for the persistent LLM response cache.
+Tests keys, TTL expiry, size eviction and the bypass flag.
+"""
+import pytest
+from llama_index.core.llms import ChatMessage, ChatResponse
+import backend.llm as llm
+import backend.response_cache as response_cache
+from backend.response_cache import ResponseCache, bypass_response_cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(path=str(tmp_path / "responses.sqlite3"), ttl_seconds=3600, max_bytes=10 * 1024 * 1024)
+
+
+@pytest.mark.unit
+class TestResponseCache:
+    """Test the SQLite response store"""
+
+    def test_round_trip_and_counters(self, cache):
+        """Test that a stored response is returned and hits/misses are counted"""
+        key = cache.key("llama3.2:3b", {"temperature": 0.1}, [("user", "prompt")])
+        assert cache.get(key) is None
+        cache.put(key, {"role": "assistant", "content": "answer"})
+
+        assert cache.get(key) == {"role": "assistant", "content": "answer"}
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_key_covers_model_params_and_prompt(self, cache):
+        """Test that any change to model, parameters or prompt changes the key"""
+        base = cache.key("m", {"temperature": 0.1}, [("user", "context A")])
+
+        assert base == cache.key("m", {"temperature": 0.1}, [("user", "context A")])
+        assert base != cache.key("other", {"temperature": 0.1}, [("user", "context A")])
+        assert base != cache.key("m", {"temperature": 0.7}, [("user", "context A")])
+        assert base != cache.key("m", {"temperature": 0.1}, [("user", "context B")])
+
+    def test_expired_entries_ignored(self, tmp_path):
+        """Test that entries older than the TTL are not returned"""
+        cache = ResponseCache(path=str(tmp_path / "ttl.sqlite3"), ttl_seconds=-1, max_bytes=1024 * 1024)
+        cache.put("k", {"role": "assistant", "content": "old"})
+
+        assert cache.get("k") is None
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Test that the oldest entries are evicted over the size budget"""
+        cache = ResponseCache(path=str(tmp_path / "lru.sqlite3"), ttl_seconds=3600, max_bytes=250)
+        for i in range(5):
+            cache.put(f"k{i}", {"role": "assistant", "content": "x" * 80})
+
+        assert len(cache) < 5
+        assert cache.get("k4") is not None
+        assert cache.get("k0") is None
+
+
+@pytest.mark.unit
+class TestCachedOllama:
+    """Test that the LLM answers repeated prompts from the cache"""
+
+    @pytest.fixture
+    def fake_llm(self, cache, monkeypatch):
+        calls = []
+
+        def chat(self, messages, **kwargs):
+            calls.append(messages)
+            return ChatResponse(message=ChatMessage(role="assistant", content=f"answer {len(calls)}"))
+
+        monkeypatch.setattr(llm.Ollama, "chat", chat)
+        monkeypatch.setattr(llm, "get_response_cache", lambda: cache)
+        return llm.CachedOllama(model="llama3.2:3b"), calls
+
+    def test_repeated_prompt_cached(self, fake_llm):
+        """Test that the same prompt is generated once"""
+        model, calls = fake_llm
+        first = model.chat([ChatMessage(role="user", content="spend?")])
+        second = model.chat([ChatMessage(role="user", content="spend?")])
+        model.chat([ChatMessage(role="user", content="risk?")])
+
+        assert first.message.content == second.message.content == "answer 1"
+        assert len(calls) == 2
+
+    def test_bypass(self, fake_llm):
+        """Test that bypassed calls always reach the model"""
+        model, calls = fake_llm
+        model.chat([ChatMessage(role="user", content="spend?")])
+        with bypass_response_cache():
+            response = model.chat([ChatMessage(role="user", content="spend?")])
+
+        assert response.message.content == "answer 2"
+        assert not response_cache.response_cache_bypassed()
+
+    def test_bypass_reaches_worker_threads(self):
+        """Test that calls run in worker threads from a bypassing task are bypassed too"""
+        import anyio
+
+        async def bypassed_in_thread():
+            with bypass_response_cache():
+                return await anyio.to_thread.run_sync(response_cache.response_cache_bypassed)
+
+        assert anyio.run(bypassed_in_thread)
+
+
+@pytest.mark.unit
+class TestCachedOllamaStreaming:
+    """Test that streamed answers are cached once complete"""
+
+    def test_stream_cached_after_completion(self, cache, monkeypatch):
+        """Test that a repeated streamed prompt is served from the cache in one chunk"""
+        calls = []
+
+        def stream_chat(self, messages, **kwargs):
+            calls.append(messages)
+            text = ""
+            for token in ["Top ", "risk"]:
+                text += token
+                yield ChatResponse(message=ChatMessage(role="assistant", content=text), delta=token)
+
+        monkeypatch.setattr(llm.Ollama, "stream_chat", stream_chat)
+        monkeypatch.setattr(llm, "get_response_cache", lambda: cache)
+        model = llm.CachedOllama(model="llama3.2:3b")
+        messages = [ChatMessage(role="user", content="risks?")]
+
+        first = [response.delta for response in model.stream_chat(messages)]
+        second = [response.delta for response in model.stream_chat(messages)]
+
+        assert first == ["Top ", "risk"]
+        assert second == ["Top risk"]
+        assert len(calls) == 1
+
+    def test_abandoned_stream_not_cached(self, cache, monkeypatch):
+        """Test that a stream that is not read to the end is not stored"""
+        def stream_chat(self, messages, **kwargs):
+            yield ChatResponse(message=ChatMessage(role="assistant", content="Top"), delta="Top")
+            yield ChatResponse(message=ChatMessage(role="assistant", content="Top risk"), delta=" risk")
+
+        monkeypatch.setattr(llm.Ollama, "stream_chat", stream_chat)
+        monkeypatch.setattr(llm, "get_response_cache", lambda: cache)
+        model = llm.CachedOllama(model="llama3.2:3b")
+        stream = model.stream_chat([ChatMessage(role="user", content="risks?")])
+        next(stream)
+        stream.close()
+
+        assert len(cache) == 0
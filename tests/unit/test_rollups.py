@@ -0,0 +1,117 @@
+"""
+Unit tests for rollup summary documents.
+Tests chunk-merged aggregates, summary text and metadata, and deterministic IDs.
+"""
+import pytest
+import pandas as pd
+from backend.rollups import RollupAccumulator, ROLLUP_LEVELS
+
+
+def procurement_frame():
+    return pd.DataFrame({
+        'POID': ['PO-1', 'PO-2', 'PO-3', 'PO-4'],
+        'PODate': ['2024-01-10', '2024-01-20', '2024-02-05', 'not a date'],
+        'SupplierID': ['S1', 'S1', 'S2', 'S2'],
+        'SupplierName': ['Acme', 'Acme', 'Beta', 'Beta'],
+        'ItemCategory': ['IT', 'Office', 'IT', 'IT'],
+        'TotalAmount': [100.0, 50.0, 30.0, 20.0],
+        'OnTimeDelivery%': [90, 80, None, 70],
+        'QualityScore': [9.0, 8.0, 7.0, 6.0],
+        'SupplierRiskLevel': ['Low', 'Medium', 'High', 'High'],
+        'ContractID': ['C-1', 'C-1', 'C-2', None],
+        'ContractEndDate': ['2025-06-30', '2025-06-30', '2025-03-01', '2025-03-01'],
+        'ComplianceStatus': ['Compliant', 'Non-Compliant', 'Compliant', 'Compliant'],
+    })
+
+
+def by_level(documents, level):
+    return {doc.metadata[f'{level}_name' if level == 'supplier' else {
+        'category': 'item_category', 'contract': 'contract_id', 'month': 'month'}[level]]: doc
+        for doc in documents if doc.metadata['doc_level'] == level}
+
+
+@pytest.mark.unit
+class TestRollupAccumulator:
+    """Test per-group aggregates merged across chunks"""
+
+    def test_chunks_merge_to_whole_file_totals(self):
+        """Test that chunk-by-chunk totals equal totals over the whole file"""
+        df = procurement_frame()
+        chunked = RollupAccumulator()
+        chunked.add(df.iloc[:1])
+        chunked.add(df.iloc[1:3])
+        chunked.add(df.iloc[3:])
+        whole = RollupAccumulator()
+        whole.add(df)
+
+        for level in ROLLUP_LEVELS:
+            pd.testing.assert_frame_equal(chunked.totals(level).sort_index(), whole.totals(level).sort_index())
+        assert chunked.total_spend == 200.0
+
+    def test_group_totals(self):
+        """Test spend, counts and averages per group; rows without a key are left out"""
+        accumulator = RollupAccumulator()
+        accumulator.add(procurement_frame())
+
+        suppliers = accumulator.totals('supplier')
+        assert suppliers.loc['Acme', 'spend'] == 150.0
+        assert suppliers.loc['Beta', 'on_time_n'] == 1
+        assert accumulator.totals('contract').index.tolist() == ['C-1', 'C-2']
+        assert accumulator.totals('month').index.tolist() == ['2024-01', '2024-02']
+
+    def test_missing_key_column_skips_level(self):
+        """Test that a level is skipped when its key column is absent"""
+        accumulator = RollupAccumulator()
+        accumulator.add(procurement_frame().drop(columns=['ContractID']))
+
+        assert accumulator.totals('contract') is None
+        assert {doc.metadata['doc_level'] for doc in accumulator.documents('po.csv')} == {'supplier', 'category', 'month'}
+
+
+@pytest.mark.unit
+class TestSummaryDocuments:
+    """Test the summary documents built from the aggregates"""
+
+    def test_text_and_metadata(self):
+        """Test summary text and level metadata"""
+        accumulator = RollupAccumulator()
+        accumulator.add(procurement_frame())
+        documents = accumulator.documents('po.csv')
+
+        acme = by_level(documents, 'supplier')['Acme']
+        assert acme.text.startswith('Supplier summary: Acme (ID: S1)\nOrders: 2 | Total spend: 150.00')
+        assert 'average on-time delivery 85.0%' in acme.text
+        assert 'Risk mix: High 0, Medium 1, Low 1' in acme.text
+        assert 'Compliance: 1 of 2 rows non-compliant' in acme.text
+        assert acme.metadata == {
+            'doc_level': 'supplier', 'source': 'po.csv', 'row_index': -1, 'supplier_id': 'S1', 'supplier_name': 'Acme',
+            'risk_level': 'Medium'
+        }
+        assert by_level(documents, 'supplier')['Beta'].metadata['risk_level'] == 'High'
+        assert '(75% of all spend)' in by_level(documents, 'category')['IT'].text
+        assert 'Expires: 2025-06-30' in by_level(documents, 'contract')['C-1'].text
+
+    def test_level_not_embedded(self):
+        """Test that row_index and doc_level do not change the embedded text"""
+        from llama_index.core.schema import MetadataMode
+        accumulator = RollupAccumulator()
+        accumulator.add(procurement_frame())
+        document = accumulator.documents('po.csv')[0]
+
+        embedded = document.get_content(metadata_mode=MetadataMode.EMBED)
+        assert 'doc_level' not in embedded
+        assert 'row_index' not in embedded
+
+    def test_ids_are_deterministic(self):
+        """Test that unchanged groups keep their IDs and changed groups get new ones"""
+        first = RollupAccumulator()
+        first.add(procurement_frame())
+        changed = procurement_frame()
+        changed.loc[0, 'TotalAmount'] = 110.0
+        second = RollupAccumulator()
+        second.add(changed)
+
+        first_ids = {doc.metadata['doc_level'] + doc.text.split('\n')[0]: doc.id_ for doc in first.documents('po.csv')}
+        second_ids = {doc.metadata['doc_level'] + doc.text.split('\n')[0]: doc.id_ for doc in second.documents('po.csv')}
+        assert first_ids['supplierSupplier summary: Beta (ID: S2)'] == second_ids['supplierSupplier summary: Beta (ID: S2)']
+        assert first_ids['supplierSupplier summary: Acme (ID: S1)'] != second_ids['supplierSupplier summary: Acme (ID: S1)']
@@ -0,0 +1,111 @@
+"""
+Unit tests for the semantic answer cache.
+Tests similarity matching, data versions, eviction and counters.
+"""
+import pytest
+import backend.semantic_cache as semantic_cache
+from backend.semantic_cache import SemanticCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SemanticCache(path=str(tmp_path / "semantic.sqlite3"), threshold=0.9, max_entries=100)
+
+
+@pytest.mark.unit
+class TestSemanticCache:
+    """Test lookups by query embedding"""
+
+    def test_near_duplicate_hits(self, cache):
+        """Test that a query within the threshold gets the cached answer"""
+        cache.store("chat", "top risky suppliers", [1.0, 0.0, 0.1], "v1", "Supplier A")
+        match = cache.lookup("chat", [0.98, 0.05, 0.12], "v1")
+
+        assert match[0] == "Supplier A"
+        assert match[2] == "top risky suppliers"
+        assert match[1] >= 0.9
+
+    def test_dissimilar_query_misses(self, cache):
+        """Test that a query outside the threshold is a miss"""
+        cache.store("chat", "top risky suppliers", [1.0, 0.0, 0.0], "v1", "Supplier A")
+
+        assert cache.lookup("chat", [0.0, 1.0, 0.0], "v1") is None
+
+    def test_scoped_by_namespace_and_data_version(self, cache):
+        """Test that answers are not shared across namespaces or data versions"""
+        cache.store("chat", "q", [1.0, 0.0], "v1", "old answer")
+
+        assert cache.lookup("query:5", [1.0, 0.0], "v1") is None
+        assert cache.lookup("chat", [1.0, 0.0], "v2") is None
+
+    def test_new_data_version_drops_old_answers(self, cache):
+        """Test that storing on a new data version purges stale answers"""
+        cache.store("chat", "q", [1.0, 0.0], "v1", "old")
+        cache.store("chat", "q", [1.0, 0.0], "v2", "new")
+
+        assert cache.stats()["entries"] == 1
+        assert cache.lookup("chat", [1.0, 0.0], "v2")[0] == "new"
+
+    def test_max_entries(self, tmp_path):
+        """Test that the least recently used answers are evicted"""
+        cache = SemanticCache(path=str(tmp_path / "small.sqlite3"), threshold=0.9, max_entries=2)
+        for i in range(4):
+            cache.store("chat", f"q{i}", [float(i == j) for j in range(4)], "v1", f"a{i}")
+
+        assert cache.stats()["entries"] == 2
+
+    def test_counters(self, cache):
+        """Test that hits, misses and hit rate are reported"""
+        cache.store("chat", "q", [1.0, 0.0], "v1", "a")
+        cache.lookup("chat", [1.0, 0.0], "v1")
+        cache.lookup("chat", [0.0, 1.0], "v1")
+
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+@pytest.mark.unit
+class TestCachedAnswer:
+    """Test answering through the cache"""
+
+    @pytest.fixture
+    def setup(self, cache, monkeypatch):
+        class FakeEmbedModel:
+            def get_query_embedding(self, query):
+                return [1.0, 0.0] if "risk" in query else [0.0, 1.0]
+
+        version = {"value": "v1"}
+        monkeypatch.setattr(semantic_cache, "get_semantic_cache", lambda: cache)
+        monkeypatch.setattr(semantic_cache, "current_data_version", lambda: version["value"])
+        monkeypatch.setattr("backend.llm.get_embed_model", lambda: FakeEmbedModel())
+        return version
+
+    def test_llm_skipped_on_hit(self, setup):
+        """Test that a near-duplicate question does not call the answer function again"""
+        calls = []
+
+        def answer():
+            calls.append(1)
+            return f"answer {len(calls)}"
+
+        first = semantic_cache.cached_answer("chat", "top risky suppliers", answer)
+        second = semantic_cache.cached_answer("chat", "which suppliers are high risk", answer)
+
+        assert first == second == "answer 1"
+        assert len(calls) == 1
+
+    def test_data_change_invalidates(self, setup):
+        """Test that new data makes the question answered again"""
+        semantic_cache.cached_answer("chat", "risk", lambda: "before")
+        setup["value"] = "v2"
+
+        assert semantic_cache.cached_answer("chat", "risk", lambda: "after") == "after"
+
+    def test_errors_not_cached(self, setup):
+        """Test that a failing answer is raised and not stored"""
+        def fail():
+            raise RuntimeError("ollama down")
+
+        with pytest.raises(RuntimeError):
+            semantic_cache.cached_answer("chat", "risk", fail)
+        assert semantic_cache.cached_answer("chat", "risk", lambda: "ok") == "ok"
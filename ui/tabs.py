@@ -1,11 +1,37 @@
+from contextlib import nullcontext
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from backend.columnar import parse_dates
+from backend.response_cache import bypass_response_cache
 from backend.agents import (
     SupplierIntelligenceAgent, SpendAnalysisAgent, RiskMonitoringAgent,
     ContractIntelligenceAgent, POAutomationAgent, CompliancePolicyAgent
 )
 
+def scoped_agent(agent_class):
+    """Creates an agent that only retrieves from the loaded file."""
+    agent = agent_class()
+    if st.session_state.get("data_file"):
+        agent.set_scope({"source": st.session_state.data_file})
+    return agent
+
+def stream_insight(agent, query, status, fresh=False):
+    """
+    Renders the agent's answer token by token as it is generated and returns the
+    full text. status is shown while the context is retrieved. With fresh (for
+    re-analyze actions), the answer is generated again rather than read from the
+    LLM response cache.
+    """
+    placeholder = st.empty()
+    with placeholder.container(), (bypass_response_cache() if fresh else nullcontext()):
+        with st.spinner(status):
+            tokens = agent.stream(query)
+        text = st.write_stream(tokens)
+    # The caller renders the finished report
+    placeholder.empty()
+    return text
+
 def render_executive_summary(df):
     st.header("Executive Summary")
     
@@ -119,14 +145,14 @@ def render_executive_summary(df):
     btn_label = "Regenerate Executive Briefing" if st.session_state.exec_summary_report else "Generate Executive Briefing"
     if st.button(btn_label):
         with st.spinner("Analyzing data..."):
-            spend_agent = SpendAnalysisAgent()
-            risk_agent = RiskMonitoringAgent()
-            
-            spend_insight = spend_agent.run("Summarize key spend highlights for executives.")
-            risk_insight = risk_agent.run("Highlight critical risks for executives.")
-            
-            report = f"### Financial Overview\n{spend_insight}\n\n### Risk Overview\n{risk_insight}"
-            st.session_state.exec_summary_report = report
+            spend_agent = scoped_agent(SpendAnalysisAgent)
+            risk_agent = scoped_agent(RiskMonitoringAgent)
+        
+        spend_insight = stream_insight(spend_agent, "Summarize key spend highlights for executives.", "Analyzing spend...", fresh=bool(st.session_state.exec_summary_report))
+        risk_insight = stream_insight(risk_agent, "Highlight critical risks for executives.", "Analyzing risks...", fresh=bool(st.session_state.exec_summary_report))
+        
+        report = f"### Financial Overview\n{spend_insight}\n\n### Risk Overview\n{risk_insight}"
+        st.session_state.exec_summary_report = report
     
     if st.session_state.exec_summary_report:
         st.markdown(st.session_state.exec_summary_report)
@@ -158,12 +184,12 @@ def render_dashboard(df):
         
         with col_f2:
             if 'PODate' in df.columns:
-                # Ensure datetimes are valid
-                df['PODate'] = pd.to_datetime(df['PODate'])
-                filtered_df['PODate'] = pd.to_datetime(filtered_df['PODate'])
+                # Ensure datetimes are valid; df may be shared, so it is not modified
+                po_dates = parse_dates(df['PODate'])
+                filtered_df['PODate'] = parse_dates(filtered_df['PODate'])
                 
-                min_date = df['PODate'].min().date()
-                max_date = df['PODate'].max().date()
+                min_date = po_dates.min().date()
+                max_date = po_dates.max().date()
                 
                 date_range = st.date_input("Select Date Range", value=(min_date, max_date), min_value=min_date, max_value=max_date)
                 
@@ -269,16 +295,15 @@ def render_supplier_intelligence(df):
 
     with insight_col:
         st.subheader("AI Analysis")
-        agent = SupplierIntelligenceAgent()
+        agent = scoped_agent(SupplierIntelligenceAgent)
         
         if "supplier_report" not in st.session_state:
             st.session_state.supplier_report = None
 
         btn_label = "Re-analyze Suppliers" if st.session_state.supplier_report else "Evaluate Suppliers"
         if st.button(btn_label, use_container_width=True, type="primary"):
-            with st.spinner("🧠 Analyzing supplier performance..."):
-                insight = agent.run("Provide a detailed analysis of top suppliers and their performance.")
-                st.session_state.supplier_report = insight
+            insight = stream_insight(agent, "Provide a detailed analysis of top suppliers and their performance.", "🧠 Analyzing supplier performance...", fresh=bool(st.session_state.supplier_report))
+            st.session_state.supplier_report = insight
                 
         if st.session_state.supplier_report:
             st.info(st.session_state.supplier_report)
@@ -300,8 +325,8 @@ def render_spend_analysis(df):
     if not df.empty and 'TotalAmount' in df.columns:
         total_spend = df['TotalAmount'].sum()
         avg_po = df['TotalAmount'].mean()
-        top_category_name = df.groupby('ItemCategory')['TotalAmount'].sum().idxmax() if 'ItemCategory' in df.columns else "N/A"
-        top_category_val = df.groupby('ItemCategory')['TotalAmount'].sum().max() if 'ItemCategory' in df.columns else 0
+        top_category_name = df.groupby('ItemCategory', observed=True)['TotalAmount'].sum().idxmax() if 'ItemCategory' in df.columns else "N/A"
+        top_category_val = df.groupby('ItemCategory', observed=True)['TotalAmount'].sum().max() if 'ItemCategory' in df.columns else 0
         
         kpi1, kpi2, kpi3 = st.columns(3)
         with kpi1:
@@ -320,7 +345,7 @@ def render_spend_analysis(df):
         st.subheader("Category Spend Hierarchy")
         if 'ItemCategory' in df.columns and 'TotalAmount' in df.columns:
             # Treemap for hierarchical view
-            treemap_df = df.groupby(['ItemCategory', 'SupplierName'])['TotalAmount'].sum().reset_index()
+            treemap_df = df.groupby(['ItemCategory', 'SupplierName'], observed=True)['TotalAmount'].sum().reset_index()
             fig = px.treemap(
                 treemap_df, 
                 path=[px.Constant("All Categories"), 'ItemCategory', 'SupplierName'], 
@@ -348,16 +373,15 @@ def render_spend_analysis(df):
     
     with insight_col:
         st.subheader("AI Analysis")
-        agent = SpendAnalysisAgent()
+        agent = scoped_agent(SpendAnalysisAgent)
         
         if "spend_report" not in st.session_state:
             st.session_state.spend_report = None
 
         btn_label = "Re-analyze Spend" if st.session_state.spend_report else "Generate Analysis"
         if st.button(btn_label, use_container_width=True, type="primary"):
-            with st.spinner("🤖 AI is analyzing spend anomalies..."):
-                insight = agent.run("Analyze spend patterns, identifying anomalies and opportunities.")
-                st.session_state.spend_report = insight
+            insight = stream_insight(agent, "Analyze spend patterns, identifying anomalies and opportunities.", "🤖 AI is analyzing spend anomalies...", fresh=bool(st.session_state.spend_report))
+            st.session_state.spend_report = insight
 
         if st.session_state.spend_report:
             st.info(st.session_state.spend_report)
@@ -410,16 +434,15 @@ def render_risk_monitoring(df):
 
     with insight_col:
         st.subheader("AI Analysis")
-        agent = RiskMonitoringAgent()
+        agent = scoped_agent(RiskMonitoringAgent)
         
         if "risk_report" not in st.session_state:
             st.session_state.risk_report = None
 
         btn_label = "Re-analyze Risks" if st.session_state.risk_report else "Generate Risk Assessment"
         if st.button(btn_label, use_container_width=True, type="primary"):
-            with st.spinner("🕵️ AI is scanning for threats..."):
-                insight = agent.run("Identify high-risk suppliers and potential supply chain disruptions.")
-                st.session_state.risk_report = insight
+            insight = stream_insight(agent, "Identify high-risk suppliers and potential supply chain disruptions.", "🕵️ AI is scanning for threats...", fresh=bool(st.session_state.risk_report))
+            st.session_state.risk_report = insight
                 
         if st.session_state.risk_report:
             st.warning(st.session_state.risk_report)
@@ -451,16 +474,15 @@ def render_contract_intelligence(df):
 
     with insight_col:
         st.subheader("AI Analysis")
-        agent = ContractIntelligenceAgent()
+        agent = scoped_agent(ContractIntelligenceAgent)
         
         if "contract_report" not in st.session_state:
             st.session_state.contract_report = None
 
         btn_label = "Re-analyze Contracts" if st.session_state.contract_report else "Review Contracts"
         if st.button(btn_label, use_container_width=True, type="primary"):
-            with st.spinner("📜 AI is reviewing legal documents..."):
-                insight = agent.run("Review contracts for expiry and compliance risks.")
-                st.session_state.contract_report = insight
+            insight = stream_insight(agent, "Review contracts for expiry and compliance risks.", "📜 AI is reviewing legal documents...", fresh=bool(st.session_state.contract_report))
+            st.session_state.contract_report = insight
                 
         if st.session_state.contract_report:
             st.info(st.session_state.contract_report)
@@ -502,16 +524,15 @@ def render_po_automation(df):
             
     with insight_col:
         st.subheader("AI Analysis")
-        agent = POAutomationAgent()
+        agent = scoped_agent(POAutomationAgent)
         
         if "po_report" not in st.session_state:
             st.session_state.po_report = None
 
         btn_label = "Re-analyze POs" if st.session_state.po_report else "Audit POs"
         if st.button(btn_label, use_container_width=True, type="primary"):
-            with st.spinner("⚙️ Optimizing PO processes..."):
-                insight = agent.run("Analyze Purchase Orders for delays and price discrepancies.")
-                st.session_state.po_report = insight
+            insight = stream_insight(agent, "Analyze Purchase Orders for delays and price discrepancies.", "⚙️ Optimizing PO processes...", fresh=bool(st.session_state.po_report))
+            st.session_state.po_report = insight
                 
         if st.session_state.po_report:
             st.info(st.session_state.po_report)
@@ -538,16 +559,15 @@ def render_compliance_policy(df):
             
     with insight_col:
         st.subheader("AI Audit")
-        agent = CompliancePolicyAgent()
+        agent = scoped_agent(CompliancePolicyAgent)
         
         if "compliance_report" not in st.session_state:
             st.session_state.compliance_report = None
 
         btn_label = "Re-check Compliance" if st.session_state.compliance_report else "Run Compliance Audit"
         if st.button(btn_label, use_container_width=True, type="primary"):
-            with st.spinner("⚖️ Auditing compliance records..."):
-                insight = agent.run("Check for policy violations and budget adherence.")
-                st.session_state.compliance_report = insight
+            insight = stream_insight(agent, "Check for policy violations and budget adherence.", "⚖️ Auditing compliance records...", fresh=bool(st.session_state.compliance_report))
+            st.session_state.compliance_report = insight
                 
         if st.session_state.compliance_report:
             st.write(st.session_state.compliance_report)